@@ -2,56 +2,178 @@
 # ==============================================================================
 # 0. IMPORTACIONES
 # ==============================================================================
+import hashlib
+import hmac
 import os
 import sys
+import time
+import click
 from datetime import datetime
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory
+from types import SimpleNamespace
+from urllib.parse import urlencode
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash, session, send_from_directory, make_response, abort, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, FileField, BooleanField, SelectField
 from wtforms.validators import DataRequired, Length, EqualTo, Optional
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.http import is_resource_modified
+from sqlalchemy import delete, func, insert, inspect, select, text, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import load_only
+from sqlalchemy.schema import CreateColumn
+from cache import PageCache
+from pagination import InvalidCursor, paginate
+from html_text import count_words, html_to_text, make_excerpt
+from images import ImageProcessor, build_derivatives, derivative_files, derivatives_available
+from storage import content_digest, content_filename, find_orphans, immutable_etag, is_content_addressed, remove_file, store_upload
+from assets import StaticAssets, cache_forever, revalidate
+from compression import Compressor, brotli_available, precompress_file
+from contact_queue import ContactQueue, QueueFull
+from metrics import RequestMetrics
+from publish import RENDER_HEADER, StaticPublisher
+from identity import IdentityCache
+from popularity import ViewCounter, is_bot
+from feeds import MAX_SITEMAP_CHUNK, SITEMAP_CHUNK_SIZE, atom_feed, sitemap_index, sitemap_urlset
+from archive import (FORMATS, Checkpoint, Progress, RowWriter, batched, column_kinds, decode_row, detect_format,
+                     extract_images_tar, open_archive, read_rows, write_images_tar)
+from db_tuning import install_sqlite_tuning, sqlite_engine_options, sqlite_settings_from_env
+from search import (SEARCH_TABLE, clear_index, create_search_table, index_article, index_articles, optimize_index,
+                    remove_article, search_articles)
+from startup import StartupReport, freeze_heap, precompile_templates, start_worker
 
 # ==============================================================================
 # 1. CONFIGURACIÓN DE LA APLICACIÓN
 # ==============================================================================
-app = Flask(__name__)
-# Usar una variable de entorno para la SECRET_KEY en producción
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'clave-secreta-para-desarrollo-local')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# Aumentar el tamaño máximo de archivo a 16MB
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-
-
-# --- Configuración de Directorios para Render (CORREGIDA Y DEFINITIVA) ---
-# Esta lógica asegura que los datos persistan en Render y funcionen localmente.
-if os.environ.get('RENDER'):
-    # En el servidor de Render, usamos el disco persistente definido en render.yaml
-    data_dir = '/var/data/project_data'
-else:
+def data_directory():
+    """Carpeta de la base de datos, las imágenes subidas y los archivos compartidos por los workers."""
+    # --- Configuración de Directorios para Render (CORREGIDA Y DEFINITIVA) ---
+    # Esta lógica asegura que los datos persistan en Render y funcionen localmente.
+    if os.environ.get('DATA_DIR'):
+        # Permite apuntar a otra carpeta (benchmarks, pruebas con bases desechables)
+        return os.environ['DATA_DIR']
+    if os.environ.get('RENDER'):
+        # En el servidor de Render, usamos el disco persistente definido en render.yaml
+        return '/var/data/project_data'
     # Para pruebas en tu computador, usa una carpeta local llamada 'instance'
-    data_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance')
+    return os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance')
 
-upload_path = os.path.join(data_dir, 'uploads')
-db_path = os.path.join(data_dir, 'site.db')
+def load_config(app):
+    """Lee la configuración de las variables de entorno. No toca el disco ni la base de datos."""
+    # Usar una variable de entorno para la SECRET_KEY en producción
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'clave-secreta-para-desarrollo-local')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Aumentar el tamaño máximo de archivo a 16MB
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
-# Crear los directorios si no existen para evitar errores al iniciar
-os.makedirs(upload_path, exist_ok=True)
+    data_dir = data_directory()
+    app.config['DATA_DIR'] = data_dir
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(data_dir, 'site.db')}"
+    app.config['UPLOAD_FOLDER'] = os.path.join(data_dir, 'uploads')
 
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-app.config['UPLOAD_FOLDER'] = upload_path
+    # --- SQLite con varios workers de gunicorn (WAL, busy_timeout, pool) ---
+    # Los valores se leen de SQLITE_JOURNAL_MODE, SQLITE_BUSY_TIMEOUT_MS, etc. (ver db_tuning.py)
+    app.config['SQLITE_TUNING'] = sqlite_settings_from_env()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options(app.config['SQLITE_TUNING'])
+
+    # --- Caché de páginas públicas ---
+    # PAGE_CACHE_DIR activa el backend en disco para que todos los workers de
+    # gunicorn compartan las páginas renderizadas (por ejemplo, /var/data/project_data/cache).
+    app.config['PAGE_CACHE_ENABLED'] = os.environ.get('PAGE_CACHE_ENABLED', '1') != '0'
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 300))
+    app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 512))
+    app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR') or None
+    # Límites del backend en disco: al superarlos se borran las páginas más antiguas
+    app.config['PAGE_CACHE_DISK_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_DISK_MAX_ENTRIES', 5000))
+    app.config['PAGE_CACHE_DISK_MAX_BYTES'] = int(os.environ.get('PAGE_CACHE_DISK_MAX_MB', 256)) * 1024 * 1024
+    # Marcadores de invalidación: cada worker tiene su propio LRU en memoria y
+    # así descarta en la petición siguiente lo que otro worker invalidó.
+    app.config['PAGE_CACHE_VERSION_DIR'] = (os.environ.get('PAGE_CACHE_VERSION_DIR')
+                                            or os.path.join(data_dir, 'page-versions'))
+
+    # --- Compresión gzip/brotli (ver compression.py) ---
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+
+    # --- Derivados de imágenes (miniaturas, WebP) ---
+    app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))
+
+    # --- Búsqueda (SQLite FTS5) ---
+    app.config['SEARCH_ENABLED'] = True  # Se desactiva solo si SQLite no trae FTS5
+    app.config['SEARCH_PAGE_SIZE'] = int(os.environ.get('SEARCH_PAGE_SIZE', 10))
+    app.config['SEARCH_MAX_PAGES'] = 50
+
+    # --- Cola del formulario de contacto (escritura por lotes en segundo plano) ---
+    # El spool en disco conserva los mensajes encolados si el worker se reinicia.
+    app.config['CONTACT_QUEUE_SIZE'] = int(os.environ.get('CONTACT_QUEUE_SIZE', 1000))
+    app.config['CONTACT_BATCH_SIZE'] = int(os.environ.get('CONTACT_BATCH_SIZE', 100))
+    app.config['CONTACT_FLUSH_MS'] = int(os.environ.get('CONTACT_FLUSH_MS', 500))
+    app.config['CONTACT_ENQUEUE_TIMEOUT_MS'] = int(os.environ.get('CONTACT_ENQUEUE_TIMEOUT_MS', 200))
+    app.config['CONTACT_SPOOL_DIR'] = os.environ.get('CONTACT_SPOOL_DIR') or os.path.join(data_dir, 'spool')
+
+    # --- Métricas por petición (/admin/metrics) ---
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+    app.config['METRICS_SLOW_MS'] = int(os.environ.get('METRICS_SLOW_MS', 500))
+    # Con METRICS_TOKEN, Prometheus puede leer el export sin sesión de administrador
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN') or None
+
+    # --- Publicación estática de las páginas públicas (ver publish.py) ---
+    app.config['PUBLISH_DIR'] = os.environ.get('PUBLISH_DIR') or None
+    app.config['PUBLISH_WORKERS'] = int(os.environ.get('PUBLISH_WORKERS', os.cpu_count() or 1))
+    app.config['PUBLISH_SERVE'] = os.environ.get('PUBLISH_SERVE', '1') != '0'
+
+    # --- Caché de identidad (user_loader sin consulta por petición) ---
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+    # Archivo compartido por los workers: al editar o borrar un usuario todos vacían su caché
+    app.config['IDENTITY_VERSION_FILE'] = os.path.join(data_dir, 'identity.version')
+
+    # --- Contadores de visitas y "lo más leído" (ver popularity.py) ---
+    app.config['VIEWS_ENABLED'] = os.environ.get('VIEWS_ENABLED', '1') != '0'
+    app.config['VIEWS_FLUSH_SECONDS'] = int(os.environ.get('VIEWS_FLUSH_SECONDS', 10))
+    app.config['VIEWS_RANKING_SECONDS'] = int(os.environ.get('VIEWS_RANKING_SECONDS', 60))
+    app.config['VIEWS_HALF_LIFE_HOURS'] = float(os.environ.get('VIEWS_HALF_LIFE_HOURS', 24))
+    app.config['VIEWS_TOP_N'] = int(os.environ.get('VIEWS_TOP_N', 5))
+
+    # --- Feeds Atom ---
+    app.config['FEED_SIZE'] = int(os.environ.get('FEED_SIZE', 20))
+
+    # --- Paginación ---
+    app.config['NEWS_PAGE_SIZE'] = int(os.environ.get('NEWS_PAGE_SIZE', 12))
+    app.config['ADMIN_PAGE_SIZE'] = int(os.environ.get('ADMIN_PAGE_SIZE', 25))
+
+    # --- Arranque (ver warm_up y wsgi.py) ---
+    app.config['WARMUP_PRIME_PAGES'] = os.environ.get('WARMUP_PRIME_PAGES', '1') != '0'
 
 # ==============================================================================
 # 2. EXTENSIONES Y MODELOS DE BASE DE DATOS
 # ==============================================================================
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
+# Las extensiones se crean sin aplicación; create_app() (sección 7) las enlaza con init_app
+db = SQLAlchemy()
+request_metrics = RequestMetrics()
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 login_manager.login_message = "Debes iniciar sesión para acceder a esta página."
 login_manager.login_message_category = "info"
+page_cache = PageCache()
+image_processor = ImageProcessor()
+static_assets = StaticAssets()
+compressor = Compressor()
+static_publisher = StaticPublisher()
+
+# Rutas, hooks y comandos de consola; create_app() lo registra en la aplicación
+main = Blueprint('main', __name__, cli_group=None)
+
+# Mapeo de URLs de categoría a los nombres internos guardados en la base de datos
+CATEGORIES = {
+    'region': 'LA REGION',
+    'politica': 'POLITICA',
+    'opinion': 'OPINION',
+    'ciencia-tecnologia': 'CIENCIA Y TECNOLOGIA'
+}
+CATEGORY_SLUGS = {name: slug for slug, name in CATEGORIES.items()}
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -73,6 +195,48 @@ class NewsArticle(db.Model):
     author = db.Column(db.String(100), default="Equipo Desconocido")
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     image_filename = db.Column(db.String(100), nullable=True)
+    # Derivados de la imagen generados en segundo plano (ver images.py)
+    image_variants = db.Column(db.JSON(none_as_null=True), nullable=True)
+    # Extracto en texto plano y número de palabras, calculados al guardar
+    excerpt = db.Column(db.String(300), nullable=True)
+    word_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Columnas que necesitan las tarjetas de los listados (sin el HTML completo)
+    LISTING_COLUMNS = ('id', 'title', 'category', 'author', 'date_posted', 'image_filename', 'image_variants', 'excerpt')
+
+    # Índice compuesto para las consultas por categoría ordenadas por fecha
+    # (portada y páginas de categoría).
+    __table_args__ = (
+        db.Index('ix_news_article_category_date', category, date_posted.desc()),
+        db.Index('ix_news_article_date', date_posted.desc()),
+    )
+
+    def refresh_excerpt(self):
+        """Recalcula el extracto en texto plano y el conteo de palabras a partir del HTML."""
+        plain_text = html_to_text(self.content)
+        self.excerpt = make_excerpt(plain_text, 300)
+        self.word_count = count_words(plain_text)
+
+    @property
+    def has_local_image(self):
+        """True si la imagen está en la carpeta de uploads (y no es una URL externa)."""
+        return bool(self.image_filename) and not self.image_filename.startswith(('http://', 'https://'))
+
+    @property
+    def reading_minutes(self):
+        return max(1, round((self.word_count or 0) / 200))
+
+def listing_options():
+    """Opción de carga para listados: trae solo las columnas de las tarjetas, nunca `content`."""
+    return load_only(*[getattr(NewsArticle, name) for name in NewsArticle.LISTING_COLUMNS])
+
+class UploadedFile(db.Model):
+    """Archivo subido guardado por su hash (ver storage.py) y cuántas noticias lo usan."""
+    digest = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(100), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class ContactMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,9 +246,116 @@ class ContactMessage(db.Model):
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-@login_manager.user_loader
+def save_contact_messages(messages):
+    """Guarda un lote de mensajes de la cola de contacto en una sola transacción."""
+    db.session.execute(insert(ContactMessage), messages)
+    db.session.commit()
+
+contact_queue = ContactQueue(write_batch=save_contact_messages)
+
+class ArticleViewCount(db.Model):
+    """Visitas totales de una noticia (las escribe ViewCounter por lotes)."""
+    news_id = db.Column(db.Integer, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    last_viewed = db.Column(db.DateTime, nullable=True)
+
+class ArticleViewHour(db.Model):
+    """Visitas por noticia y hora de los últimos días: la base del ranking de lo más leído."""
+    news_id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)  # horas desde 1970, UTC
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_article_view_hour_hour', hour),)
+
+def save_view_counts(rows, prune_before):
+    """Suma un lote de visitas por hora y los totales con UPSERT, en una transacción."""
+    hours = sqlite_insert(ArticleViewHour.__table__)
+    db.session.execute(hours.on_conflict_do_update(
+        index_elements=['news_id', 'hour'], set_={'views': hours.table.c.views + hours.excluded.views}), rows)
+    totals = {}
+    for row in rows:
+        totals[row['news_id']] = totals.get(row['news_id'], 0) + row['views']
+    now = datetime.utcnow()
+    counts = sqlite_insert(ArticleViewCount.__table__)
+    db.session.execute(counts.on_conflict_do_update(
+        index_elements=['news_id'],
+        set_={'views': counts.table.c.views + counts.excluded.views, 'last_viewed': counts.excluded.last_viewed}),
+        [{'news_id': news_id, 'views': views, 'last_viewed': now} for news_id, views in totals.items()])
+    db.session.execute(delete(ArticleViewHour).where(ArticleViewHour.hour < prune_before))
+    db.session.commit()
+
+def rank_news_by_views(weights, limit):
+    """Top `limit` de cada categoría por visitas ponderadas ({hora: peso}), en una consulta."""
+    params = {'limit': limit}
+    pairs = []
+    for index, (hour, weight) in enumerate(weights.items()):
+        pairs.append(f'(:h{index}, :w{index})')
+        params[f'h{index}'], params[f'w{index}'] = hour, weight
+    sql = (
+        f"WITH weights(hour, weight) AS (VALUES {', '.join(pairs)}), "
+        "scores AS ("
+        "  SELECT v.news_id, SUM(v.views * w.weight) AS score"
+        f"  FROM {ArticleViewHour.__tablename__} AS v JOIN weights AS w ON w.hour = v.hour"
+        "  GROUP BY v.news_id), "
+        "ranked AS ("
+        "  SELECT a.id, a.title, a.category, s.score,"
+        "         ROW_NUMBER() OVER (PARTITION BY a.category ORDER BY s.score DESC, a.id DESC) AS position"
+        "  FROM scores AS s JOIN news_article AS a ON a.id = s.news_id) "
+        "SELECT id, title, category, score FROM ranked WHERE position <= :limit ORDER BY category, position"
+    )
+    ranking = {name: [] for name in CATEGORIES.values()}
+    for row in db.session.execute(text(sql), params).mappings():
+        ranking.setdefault(row['category'], []).append(dict(row))
+    return ranking
+
+def invalidate_most_read_pages(categories):
+    """Cambió lo más leído: se regeneran la portada (top general) y las categorías afectadas."""
+    namespaces = ['index'] if None in categories else []
+    namespaces += [f'category:{CATEGORY_SLUGS[c]}' for c in categories if c in CATEGORY_SLUGS]
+    page_cache.invalidate(*namespaces)
+    if static_publisher.enabled:
+        paths = ['/'] if None in categories else []
+        paths += [f'/category/{CATEGORY_SLUGS[c]}' for c in categories if c in CATEGORY_SLUGS]
+        static_publisher.publish(paths)
+
+view_counter = ViewCounter(save=save_view_counts, rank=rank_news_by_views, on_change=invalidate_most_read_pages)
+
+@main.after_app_request
+def count_news_view(response):
+    """Cuenta la lectura de una noticia, también si salió de la caché o del sitio publicado."""
+    if (request.endpoint == 'main.news_detail' and request.method == 'GET' and response.status_code in (200, 304)
+            and not request.headers.get(RENDER_HEADER) and not is_bot(request.user_agent.string)):
+        view_counter.record(request.view_args['news_id'])
+    return response
+
+# Contadores de otros subsistemas en el export de Prometheus (valores de este worker)
+request_metrics.register_gauge('app_page_cache_hit_ratio', 'Tasa de aciertos de la caché de páginas.',
+                               lambda: page_cache.stats()['hit_ratio'])
+request_metrics.register_gauge('app_identity_cache_hit_ratio', 'Tasa de aciertos de la caché de usuarios.',
+                               lambda: identity_cache.stats()['hit_ratio'])
+request_metrics.register_gauge('app_contact_queue_depth', 'Mensajes de contacto pendientes de guardar.',
+                               lambda: contact_queue.stats()['depth'])
+request_metrics.register_gauge('app_contact_queue_rejected', 'Mensajes de contacto rechazados por cola llena.',
+                               lambda: contact_queue.stats()['rejected'])
+request_metrics.register_gauge('app_contact_flush_seconds_max', 'Escritura más lenta de un lote de mensajes.',
+                               lambda: contact_queue.stats()['max_flush_ms'] / 1000)
+request_metrics.register_gauge('app_views_pending', 'Visitas a noticias contadas en memoria y aún no guardadas.',
+                               lambda: view_counter.stats()['pending'])
+request_metrics.register_gauge('app_views_flush_seconds_max', 'Escritura más lenta de un lote de visitas.',
+                               lambda: view_counter.stats()['max_flush_ms'] / 1000)
+request_metrics.register_gauge('app_startup_seconds', 'Tiempo de arranque hasta quedar listo para servir.',
+                               lambda: startup_seconds(current_app))
+
+def startup_seconds(app):
+    """Segundos que tardó warm_up() en dejar lista la aplicación (None si no se llamó)."""
+    report = app.extensions.get('startup_report')
+    return report.ready_ms / 1000 if report is not None else None
+
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """Carga el usuario de la base de datos; IdentityCache guarda una instantánea por worker."""
+    return db.session.get(User, user_id)
+
+identity_cache = IdentityCache(load=load_user)
 
 # ==============================================================================
 # 3. FORMULARIOS (WTForms)
@@ -126,128 +397,560 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated or not current_user.is_admin:
             flash('Acceso no autorizado. Se requieren permisos de administrador.', 'danger')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
+def homepage_feed(per_category=4):
+    """Devuelve las últimas `per_category` noticias de cada categoría en una sola consulta.
+
+    El resultado viene agrupado para la plantilla: {categoría: [noticias]}.
+    Cada rama del UNION ALL es una búsqueda en ix_news_article_category_date.
+    """
+    latest = [
+        select(NewsArticle.id)
+        .where(NewsArticle.category == name)
+        .order_by(NewsArticle.date_posted.desc(), NewsArticle.id.desc())
+        .limit(per_category)
+        .subquery()
+        for name in CATEGORIES.values()
+    ]
+    ids = union_all(*[select(subquery.c.id) for subquery in latest])
+    query = (
+        select(NewsArticle)
+        .options(listing_options())
+        .where(NewsArticle.id.in_(ids))
+        .order_by(NewsArticle.category, NewsArticle.date_posted.desc(), NewsArticle.id.desc())
+    )
+    feed = {name: [] for name in CATEGORIES.values()}
+    for article in db.session.scalars(query):
+        feed[article.category].append(article)
+    return feed
+
+def paginate_news(query, page_size, endpoint, **values):
+    """Pagina noticias por cursor usando los parámetros ?after= / ?before= de la URL.
+
+    Devuelve la página y un diccionario con las URLs 'next' y 'prev' (o None).
+    """
+    try:
+        page = paginate(query, NewsArticle.date_posted, NewsArticle.id, page_size,
+                        after=request.args.get('after'), before=request.args.get('before'))
+    except InvalidCursor:
+        abort(400)
+    links = {
+        'next': url_for(endpoint, after=page.next_cursor, **values) if page.next_cursor else None,
+        'prev': url_for(endpoint, before=page.prev_cursor, **values) if page.prev_cursor else None,
+    }
+    return page, links
+
+def with_link_header(response, links):
+    """Añade la cabecera HTTP Link con rel="next"/"prev" a la respuesta."""
+    response = make_response(response)
+    parts = [f'<{url}>; rel="{rel}"' for rel, url in links.items() if url]
+    if parts:
+        response.headers['Link'] = ', '.join(parts)
+    return response
+
+def save_uploaded_image(file):
+    """Guarda la imagen por su hash y le suma una referencia.
+
+    Devuelve el nombre relativo que se guarda en NewsArticle.image_filename.
+    """
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    filename, digest, size, created = store_upload(file, current_app.config['UPLOAD_FOLDER'], extension)
+    stored = db.session.get(UploadedFile, digest)
+    if stored is None:
+        stored = UploadedFile(digest=digest, filename=filename, size=size, ref_count=0)
+        db.session.add(stored)
+    elif stored.filename != filename:
+        # El mismo contenido ya está guardado con otra extensión: se usa ese archivo
+        if created:
+            remove_file(current_app.config['UPLOAD_FOLDER'], filename)
+        filename = stored.filename
+    stored.ref_count += 1
+    return filename
+
+def release_uploaded_image(filename, variants, news_id):
+    """Quita la referencia de una noticia a su imagen.
+
+    Devuelve los archivos que quedaron sin uso; se borran con delete_upload_files()
+    solo después del commit, para no perder la imagen si la transacción falla.
+    """
+    if not filename or filename.startswith(('http://', 'https://')):
+        return []
+    if is_content_addressed(filename):
+        # Por hash: una noticia puede apuntar al mismo contenido con otra extensión
+        digest = content_digest(filename)
+        stored = db.session.get(UploadedFile, digest)
+        if stored is not None:
+            stored.ref_count -= 1
+            if stored.ref_count > 0:
+                return []
+            db.session.delete(stored)
+            if stored.filename != filename:
+                return [filename, stored.filename] + derivative_files(variants)
+        elif NewsArticle.query.filter(NewsArticle.image_filename.startswith(f'{digest[:2]}/{digest}.'),
+                                      NewsArticle.id != news_id).first():
+            # Sin fila en UploadedFile (p. ej. importada a mano) no hay contador:
+            # los derivados van por hash, así que se conservan si otra noticia lo usa
+            return []
+    elif NewsArticle.query.filter(NewsArticle.image_filename == filename, NewsArticle.id != news_id).first():
+        # Archivos antiguos guardados con su nombre original: se conservan si otra noticia los usa
+        return []
+    return [filename] + derivative_files(variants)
+
+def delete_upload_files(filenames):
+    for filename in filenames:
+        remove_file(current_app.config['UPLOAD_FOLDER'], filename)
+
+def process_article_image(app, news_id, filename):
+    """Genera los derivados de la imagen de una noticia. Corre en el pool de imágenes, fuera de la petición."""
+    try:
+        variants = build_derivatives(app.config['UPLOAD_FOLDER'], filename)
+    except Exception as e:
+        print(f"Error al procesar la imagen {filename}: {e}", file=sys.stderr)
+        return
+    if not variants:
+        return
+    with app.app_context():
+        news = db.session.get(NewsArticle, news_id)
+        # La imagen pudo cambiar o la noticia borrarse mientras se procesaba
+        if news is None or news.image_filename != filename:
+            return
+        news.image_variants = variants
+        db.session.commit()
+        invalidate_news_pages(news.id, news.category)
+
+def schedule_image_processing(news):
+    """Encola la generación de derivados sin bloquear la petición del administrador.
+
+    Se llama después del COMMIT de la noticia: si falla, se registra el error y
+    la noticia sigue guardada (se muestra sin derivados hasta el próximo guardado).
+    """
+    if not news.has_local_image:
+        return
+    try:
+        # Si otra noticia ya usa la misma imagen (mismo hash) se reutilizan sus derivados
+        shared = (NewsArticle.query.options(load_only(NewsArticle.image_variants))
+                  .filter(NewsArticle.image_filename == news.image_filename, NewsArticle.id != news.id,
+                          NewsArticle.image_variants.isnot(None))
+                  .first())
+        if shared is not None:
+            news.image_variants = shared.image_variants
+            db.session.commit()
+            invalidate_news_pages(news.id, news.category)
+        elif derivatives_available():
+            image_processor.submit(process_article_image, current_app._get_current_object(), news.id,
+                                   news.image_filename)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error al encolar los derivados de la noticia {news.id}: {e}", file=sys.stderr)
+
+@main.app_template_global()
+def image_srcset(news, extension):
+    """Construye el atributo srcset ('url 480w, url 1200w, ...') para un formato."""
+    variants = sorted((news.image_variants or {}).values(), key=lambda entry: entry['width'])
+    return ', '.join(f"{url_for('main.uploaded_file', filename=entry[extension])} {entry['width']}w"
+                     for entry in variants if extension in entry)
+
+def search_document(news):
+    """Fila del índice de búsqueda para una noticia (el cuerpo va en texto plano)."""
+    return {'id': news.id, 'title': news.title, 'excerpt': news.excerpt or '',
+            'body': html_to_text(news.content), 'author': news.author or ''}
+
+def update_search_index(news):
+    """Actualiza la noticia en el índice FTS5 dentro de la transacción en curso."""
+    if current_app.config['SEARCH_ENABLED']:
+        index_article(db.session, search_document(news))
+
+def remove_from_search_index(news_id):
+    if current_app.config['SEARCH_ENABLED']:
+        remove_article(db.session, news_id)
+
+# Parámetros que lee run_search(); forman la clave de la búsqueda en la caché de páginas
+SEARCH_PARAMS = ('q', 'categoria', 'pagina')
+
+def run_search():
+    """Ejecuta la búsqueda con los parámetros de la URL (?q=, ?categoria=, ?pagina=)."""
+    query = request.args.get('q', '').strip()[:200]
+    category_slug = request.args.get('categoria', '').lower()
+    category = CATEGORIES.get(category_slug)
+    page = max(1, min(request.args.get('pagina', 1, type=int), current_app.config['SEARCH_MAX_PAGES']))
+    page_size = current_app.config['SEARCH_PAGE_SIZE']
+
+    hits = []
+    if query and current_app.config['SEARCH_ENABLED']:
+        hits = search_articles(db.session, query, category, limit=page_size + 1, offset=(page - 1) * page_size)
+    has_next = len(hits) > page_size and page < current_app.config['SEARCH_MAX_PAGES']
+    hits = hits[:page_size]
+
+    articles = {}
+    if hits:
+        ids = [hit['id'] for hit in hits]
+        articles = {news.id: news for news in NewsArticle.query.options(listing_options()).filter(NewsArticle.id.in_(ids))}
+    results = [{'news': articles[hit['id']], 'snippet': hit['snippet'], 'score': hit['score']}
+               for hit in hits if hit['id'] in articles]
+
+    def page_url(endpoint, number):
+        return url_for(endpoint, q=query, categoria=category_slug or None, pagina=number)
+
+    return {
+        'query': query,
+        'category_slug': category_slug if category else '',
+        'page': page,
+        'results': results,
+        'page_url': page_url,
+        'has_next': has_next,
+    }
+
+def cached_page(namespace, params=()):
+    """Decorador que sirve la vista desde la caché de páginas a visitantes anónimos.
+
+    `namespace` es un texto o una función que recibe los argumentos de la ruta
+    y devuelve el espacio de nombres usado para invalidar la página. `params`
+    son los parámetros de la query string que lee la vista: solo ellos forman
+    la clave. Una petición con otros parámetros (?utm_source=...) recibe la
+    página guardada, pero si no la hay no se guarda: cualquier parámetro
+    inventado sería una entrada nueva en la caché.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Los administradores ven menús distintos y los mensajes flash son
+            # personales: esas respuestas nunca se guardan en caché.
+            if current_user.is_authenticated or session.get('_flashes'):
+                return conditional_response(make_response(f(*args, **kwargs)))
+
+            key = namespace(**kwargs) if callable(namespace) else namespace
+            variant = urlencode([(name, request.args[name]) for name in params if name in request.args])
+            storable = all(name in params for name in request.args)
+            page = page_cache.get(key, variant)
+            if page is not None:
+                response = current_app.response_class(page.body, mimetype=page.mimetype, headers=page.headers)
+                # El Compressor envía la variante ya comprimida que acepte el navegador
+                response.precompressed = page.encodings
+                response.headers['X-Cache'] = 'HIT'
+                return conditional_response(response)
+
+            # La versión se toma antes de renderizar: una invalidación durante el render gana
+            version = page_cache.version(key)
+            response = make_response(f(*args, **kwargs))
+            # Si la vista usó la sesión (por ejemplo, un flash de error) la página no es cacheable
+            if response.status_code == 200 and not session.modified and page_cache.enabled and storable:
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                body = response.get_data()
+                response.precompressed = compressor.encode_all(body, response.mimetype)
+                page_cache.set(key, variant, body, response.mimetype, headers or None, response.precompressed,
+                               version=version)
+            response.headers['X-Cache'] = 'MISS'
+            return conditional_response(response)
+        return decorated_function
+    return decorator
+
+# Cabeceras de la vista que se guardan junto con la página en caché
+CACHED_HEADERS = ('Link', 'ETag', 'Last-Modified', 'Cache-Control')
+
+def conditional_response(response):
+    """Responde 304 si la respuesta trae ETag/Last-Modified y el cliente ya la tiene."""
+    if 'ETag' in response.headers or 'Last-Modified' in response.headers:
+        return response.make_conditional(request)
+    return response
+
+def invalidate_news_pages(news_id=None, *categories):
+    """Invalida la portada, las categorías indicadas, la búsqueda y el detalle de una noticia."""
+    namespaces = ['index', 'search', 'search-api', 'feed', 'sitemap', 'sitemap-pages']
+    namespaces += [f'category:{CATEGORY_SLUGS[c]}' for c in categories if c in CATEGORY_SLUGS]
+    namespaces += [f'feed:{CATEGORY_SLUGS[c]}' for c in categories if c in CATEGORY_SLUGS]
+    if news_id is not None:
+        namespaces.append(f'news:{news_id}')
+    page_cache.invalidate(*namespaces)
+    if static_publisher.enabled:
+        # Mismas páginas en el sitio publicado (se regeneran en segundo plano)
+        paths = ['/'] + [f'/category/{CATEGORY_SLUGS[c]}' for c in categories if c in CATEGORY_SLUGS]
+        if news_id is not None:
+            paths.append(f'/news/{news_id}')
+        static_publisher.publish(paths)
+
+def xml_response(body, etag, last_modified, mimetype='application/xml'):
+    """Respuesta XML que el cliente debe revalidar (If-None-Match / If-Modified-Since) en cada consulta."""
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return revalidate(response)
+
+def atom_response(query, title, site_url):
+    """Feed Atom con las últimas FEED_SIZE noticias de `query`."""
+    articles = (query.options(listing_options())
+                .order_by(NewsArticle.date_posted.desc(), NewsArticle.id.desc())
+                .limit(current_app.config['FEED_SIZE']).all())
+    updated = articles[0].date_posted if articles else datetime(1970, 1, 1)
+    entries = [{
+        'url': url_for('main.news_detail', news_id=news.id, _external=True),
+        'title': news.title,
+        'updated': news.date_posted,
+        'author': news.author,
+        'summary': news.excerpt,
+        'category': news.category,
+    } for news in articles]
+    body = atom_feed(title, request.base_url, site_url, updated, entries)
+    # El ETag sale del contenido: una edición cambia el feed aunque no cambie la fecha
+    return xml_response(body, hashlib.sha1(body).hexdigest(), updated, mimetype='application/atom+xml')
+
 # ==============================================================================
 # 5. RUTAS DE LA APLICACIÓN
 # ==============================================================================
 
 # --- Rutas Públicas (visibles para todos) ---
 
-@app.route('/')
+@main.route('/')
+@cached_page('index')
 def index():
     """Página de inicio que muestra las últimas 4 noticias de cada categoría."""
     try:
-        region_news = NewsArticle.query.filter_by(category='LA REGION').order_by(NewsArticle.date_posted.desc()).limit(4).all()
-        politica_news = NewsArticle.query.filter_by(category='POLITICA').order_by(NewsArticle.date_posted.desc()).limit(4).all()
-        opinion_news = NewsArticle.query.filter_by(category='OPINION').order_by(NewsArticle.date_posted.desc()).limit(4).all()
-        ciencia_tecnologia_news = NewsArticle.query.filter_by(category='CIENCIA Y TECNOLOGIA').order_by(NewsArticle.date_posted.desc()).limit(4).all()
+        feed = homepage_feed(per_category=4)
     except Exception as e:
         print(f"Error al cargar noticias: {e}", file=sys.stderr)
         flash("No se pudieron cargar las noticias. La base de datos podría no estar disponible.", "danger")
-        region_news, politica_news, opinion_news, ciencia_tecnologia_news = [], [], [], []
-    return render_template('index.html', region_news=region_news, politica_news=politica_news, opinion_news=opinion_news, ciencia_tecnologia_news=ciencia_tecnologia_news)
+        feed = {name: [] for name in CATEGORIES.values()}
+    return render_template('index.html', region_news=feed['LA REGION'], politica_news=feed['POLITICA'], opinion_news=feed['OPINION'], ciencia_tecnologia_news=feed['CIENCIA Y TECNOLOGIA'],
+                           most_read=view_counter.top())
 
-@app.route('/category/<category_name>')
+@main.route('/category/<category_name>')
+@cached_page(lambda category_name: f'category:{category_name.lower()}', params=('after', 'before'))
 def category_page(category_name):
     """Página genérica para mostrar todas las noticias de una categoría."""
-    # Mapeo de URLs a nombres para mostrar y filtrar
-    categories = {
-        'region': 'LA REGION',
-        'politica': 'POLITICA',
-        'opinion': 'OPINION',
-        'ciencia-tecnologia': 'CIENCIA Y TECNOLOGIA'
-    }
-    
-    internal_category_name = categories.get(category_name.lower())
+    internal_category_name = CATEGORIES.get(category_name.lower())
     if not internal_category_name:
         return "Categoría no encontrada", 404
 
-    news_articles = NewsArticle.query.filter_by(category=internal_category_name).order_by(NewsArticle.date_posted.desc()).all()
+    news_articles, page_links = paginate_news(NewsArticle.query.options(listing_options()).filter_by(category=internal_category_name),
+                                              current_app.config['NEWS_PAGE_SIZE'], 'main.category_page',
+                                              category_name=category_name.lower())
     
     # Capitalizar para el título de la página
     display_name = internal_category_name.replace('_', ' ').title()
 
-    return render_template('category_news.html', news_articles=news_articles, category_name=display_name)
+    return with_link_header(render_template('category_news.html', news_articles=news_articles,
+                                            category_name=display_name, category_slug=category_name.lower(),
+                                            page_links=page_links, most_read=view_counter.top(internal_category_name)),
+                            page_links)
 
 
-@app.route('/news/<int:news_id>')
+@main.route('/news/<int:news_id>')
+@cached_page(lambda news_id: f'news:{news_id}')
 def news_detail(news_id):
     """Muestra el detalle completo de una noticia."""
     news_article = NewsArticle.query.get_or_404(news_id)
     return render_template('new_detail.html', news=news_article)
 
-@app.route('/uploads/<path:filename>')
+# --- Feeds y sitemaps (para agregadores y buscadores) ---
+
+@main.route('/feed.xml')
+@cached_page('feed')
+def feed():
+    """Feed Atom con las últimas noticias de todo el sitio."""
+    return atom_response(NewsArticle.query, 'Desconocido', url_for('main.index', _external=True))
+
+@main.route('/category/<category_name>/feed.xml')
+@cached_page(lambda category_name: f'feed:{category_name.lower()}')
+def category_feed(category_name):
+    """Feed Atom de una categoría."""
+    internal_category_name = CATEGORIES.get(category_name.lower())
+    if not internal_category_name:
+        abort(404)
+    return atom_response(NewsArticle.query.filter_by(category=internal_category_name),
+                         f'Desconocido - {internal_category_name.title()}',
+                         url_for('main.category_page', category_name=category_name.lower(), _external=True))
+
+@main.route('/sitemap.xml')
+@cached_page('sitemap')
+def sitemap():
+    """Índice de sitemaps: las páginas fijas y un sitemap por cada tramo de ids de noticias."""
+    chunk = (NewsArticle.id - 1) // SITEMAP_CHUNK_SIZE
+    rows = db.session.execute(select(chunk.label('chunk'), func.max(NewsArticle.date_posted).label('lastmod'))
+                              .group_by('chunk').order_by('chunk')).all()
+    newest = max((row.lastmod for row in rows), default=datetime(1970, 1, 1))
+    sitemaps = [(url_for('main.sitemap_pages', _external=True), newest)]
+    sitemaps += [(url_for('main.sitemap_news', chunk=row.chunk, _external=True), row.lastmod) for row in rows]
+    body = ''.join(sitemap_index(sitemaps)).encode('utf-8')
+    return xml_response(body, hashlib.sha1(body).hexdigest(), newest)
+
+@main.route('/sitemap-pages.xml')
+@cached_page('sitemap-pages')
+def sitemap_pages():
+    """Sitemap de la portada y las páginas de categoría."""
+    newest_by_category = dict(db.session.execute(
+        select(NewsArticle.category, func.max(NewsArticle.date_posted)).group_by(NewsArticle.category)).all())
+    newest = max(newest_by_category.values(), default=datetime(1970, 1, 1))
+    urls = [(url_for('main.index', _external=True), newest)]
+    urls += [(url_for('main.category_page', category_name=slug, _external=True), newest_by_category.get(name))
+             for slug, name in CATEGORIES.items()]
+    body = ''.join(sitemap_urlset(urls)).encode('utf-8')
+    return xml_response(body, hashlib.sha1(body).hexdigest(), newest)
+
+@main.route('/sitemap-news-<int:chunk>.xml')
+def sitemap_news(chunk):
+    """Sitemap de un tramo de SITEMAP_CHUNK_SIZE ids de noticias, generado en streaming."""
+    if chunk > MAX_SITEMAP_CHUNK:
+        abort(404)
+    first_id, last_id = chunk * SITEMAP_CHUNK_SIZE + 1, (chunk + 1) * SITEMAP_CHUNK_SIZE
+    in_chunk = NewsArticle.id.between(first_id, last_id)
+    # Una consulta agregada por la clave primaria basta para validar la caché del cliente
+    count, max_id, newest = db.session.execute(
+        select(func.count(), func.max(NewsArticle.id), func.max(NewsArticle.date_posted)).where(in_chunk)).one()
+    if not count:
+        abort(404)
+    etag = hashlib.sha1(f'{chunk}-{count}-{max_id}-{newest.isoformat()}'.encode()).hexdigest()
+    response = xml_response(None, etag, newest)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=newest):
+        return response.make_conditional(request)
+
+    # Todas las URLs comparten el prefijo; se calcula una vez en lugar de un url_for por fila
+    prefix = url_for('main.news_detail', news_id=0, _external=True)[:-1]
+
+    def urls():
+        rows = db.session.execute(select(NewsArticle.id, NewsArticle.date_posted).where(in_chunk)
+                                  .order_by(NewsArticle.id).execution_options(yield_per=1000))
+        for news_id, date_posted in rows:
+            yield f'{prefix}{news_id}', date_posted
+
+    response.response = stream_with_context(part.encode('utf-8') for part in sitemap_urlset(urls()))
+    return response
+
+@main.route('/buscar')
+@cached_page('search', params=SEARCH_PARAMS)
+def search_page():
+    """Búsqueda de noticias por texto, ordenada por relevancia."""
+    search = run_search()
+    if not current_app.config['SEARCH_ENABLED']:
+        flash('La búsqueda no está disponible en este servidor.', 'danger')
+    return render_template('search.html', categories=CATEGORIES, **search)
+
+@main.route('/api/buscar')
+@cached_page('search-api', params=SEARCH_PARAMS)
+def search_api():
+    """La misma búsqueda en formato JSON."""
+    search = run_search()
+    return jsonify({
+        'query': search['query'],
+        'category': search['category_slug'] or None,
+        'page': search['page'],
+        'next_page': search['page'] + 1 if search['has_next'] else None,
+        'results': [{
+            'id': result['news'].id,
+            'title': result['news'].title,
+            'category': result['news'].category,
+            'author': result['news'].author,
+            'date_posted': result['news'].date_posted.isoformat(),
+            'url': url_for('main.news_detail', news_id=result['news'].id),
+            'snippet': str(result['snippet']),
+            'score': result['score'],
+        } for result in search['results']],
+    })
+
+@main.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     """Sirve los archivos subidos desde la carpeta de uploads."""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Los archivos guardados por hash nunca cambian: se cachean un año con un ETag fuerte.
+    # send_from_directory resuelve If-None-Match (304) y Range (206).
+    etag = immutable_etag(filename)
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, etag=etag or True, conditional=True)
+    return cache_forever(response) if etag else revalidate(response)
 
-@app.route('/contacto', methods=['GET', 'POST'])
+@main.route('/contacto', methods=['GET', 'POST'])
 def contact_page():
     """Página de contacto que también procesa el envío del formulario."""
     if request.method == 'POST':
         try:
-            new_message = ContactMessage(
-                name=request.form['name'],
-                email=request.form['email'],
-                subject=request.form['subject'],
-                message=request.form['message']
-            )
-            db.session.add(new_message)
-            db.session.commit()
+            # Se encola; el hilo de contact_queue lo guarda junto con otros mensajes
+            contact_queue.submit({
+                'name': request.form['name'],
+                'email': request.form['email'],
+                'subject': request.form['subject'],
+                'message': request.form['message']
+            })
             flash('¡Gracias por tu mensaje! Lo revisaremos pronto.', 'success')
+        except QueueFull:
+            flash('Estamos recibiendo muchos mensajes en este momento. Por favor, inténtalo de nuevo en unos minutos.', 'warning')
         except Exception as e:
-            db.session.rollback()
             flash(f'Hubo un error al enviar tu mensaje: {e}', 'danger')
-        return redirect(url_for('contact_page'))
+        return redirect(url_for('main.contact_page'))
     
     return render_template('contact.html')
 
 # --- Rutas de Autenticación y Administración ---
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     """Página de inicio de sesión para administradores."""
     if current_user.is_authenticated:
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data) and user.is_admin:
             login_user(user)
-            return redirect(request.args.get('next') or url_for('admin_dashboard'))
+            return redirect(request.args.get('next') or url_for('main.admin_dashboard'))
         else:
             flash('Credenciales inválidas o no tienes permiso de administrador.', 'danger')
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     """Cierra la sesión del usuario."""
     logout_user()
     flash('Has cerrado sesión exitosamente.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/admin/dashboard')
+@main.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
     """Panel principal de administración."""
     total_news = NewsArticle.query.count()
     total_messages = ContactMessage.query.count()
-    return render_template('admin_dashboard.html', total_news=total_news, total_messages=total_messages)
+    return render_template('admin_dashboard.html', total_news=total_news, total_messages=total_messages,
+                           cache_stats=page_cache.stats(), contact_stats=contact_queue.stats())
+
+@main.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    """Latencias por endpoint, consultas SQL y registro de peticiones lentas (de este worker)."""
+    return render_template('admin_metrics.html', metrics=request_metrics.snapshot(), worker_pid=os.getpid())
+
+@main.route('/admin/metrics/reset', methods=['POST'])
+@admin_required
+def reset_metrics():
+    request_metrics.reset()
+    flash('Métricas reiniciadas.', 'success')
+    return redirect(url_for('main.admin_metrics'))
+
+@main.route('/admin/metrics/prometheus')
+def metrics_prometheus():
+    """Export en formato de texto de Prometheus (sesión de admin o 'Bearer METRICS_TOKEN')."""
+    token = current_app.config['METRICS_TOKEN']
+    authorized = current_user.is_authenticated and current_user.is_admin
+    # Comparación en tiempo constante: no revela cuántos caracteres del token acierta
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        authorized = True
+    if not authorized:
+        abort(403)
+    return Response(request_metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
 # --- Gestión de Noticias (CRUD) ---
 
-@app.route('/admin/news')
+@main.route('/admin/news')
 @admin_required
 def admin_news():
     """Muestra la tabla para gestionar noticias."""
-    news_articles = NewsArticle.query.order_by(NewsArticle.date_posted.desc()).all()
-    return render_template('admin_news.html', news_articles=news_articles)
+    news_articles, page_links = paginate_news(NewsArticle.query.options(listing_options()),
+                                              current_app.config['ADMIN_PAGE_SIZE'], 'main.admin_news')
+    view_counts = dict(db.session.execute(select(ArticleViewCount.news_id, ArticleViewCount.views)
+                                          .where(ArticleViewCount.news_id.in_([news.id for news in news_articles]))).all())
+    return with_link_header(render_template('admin_news.html', news_articles=news_articles, page_links=page_links,
+                                            view_counts=view_counts), page_links)
 
-@app.route('/admin/news/add', methods=['GET', 'POST'])
+@main.route('/admin/news/add', methods=['GET', 'POST'])
 @admin_required
 def add_news():
     """Formulario para añadir una nueva noticia."""
@@ -258,8 +961,7 @@ def add_news():
             if form.image_file.data:
                 file = form.image_file.data
                 if allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                    filename = save_uploaded_image(file)
                 else:
                     flash('Error: Tipo de archivo de imagen no permitido.', 'danger')
                     return render_template('admin_news_form.html', title='Añadir Noticia', form=form)
@@ -272,10 +974,15 @@ def add_news():
                 author=author_name, 
                 image_filename=filename
             )
+            new_article.refresh_excerpt()
             db.session.add(new_article)
+            db.session.flush()  # Asigna el id para el índice de búsqueda
+            update_search_index(new_article)
             db.session.commit()
+            invalidate_news_pages(new_article.id, new_article.category)
+            schedule_image_processing(new_article)
             flash('¡Noticia creada con éxito!', 'success')
-            return redirect(url_for('admin_news'))
+            return redirect(url_for('main.admin_news'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error al guardar en la base de datos: {e}', 'danger')
@@ -284,7 +991,7 @@ def add_news():
     return render_template('admin_news_form.html', title='Añadir Noticia', form=form, news=None)
 
 
-@app.route('/admin/news/edit/<int:news_id>', methods=['GET', 'POST'])
+@main.route('/admin/news/edit/<int:news_id>', methods=['GET', 'POST'])
 @admin_required
 def edit_news(news_id):
     """Formulario para editar una noticia existente."""
@@ -293,24 +1000,37 @@ def edit_news(news_id):
 
     if form.validate_on_submit():
         try:
+            old_category = news.category
             news.title = form.title.data
             news.category = form.category.data
             news.content = form.content.data
             news.author = form.author.data if form.author.data else "Equipo Desconocido"
+            news.refresh_excerpt()
             
+            image_changed = False
+            unused_files = []
             if form.image_file.data:
                 file = form.image_file.data
                 if allowed_file(file.filename):
-                    # Opcional: podrías querer borrar la imagen antigua del disco
-                    filename = secure_filename(file.filename)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    news.image_filename = filename
+                    # Primero se guarda la nueva imagen y después se libera la antigua:
+                    # si son idénticas, el contador nunca llega a cero.
+                    filename = save_uploaded_image(file)
+                    unused_files = release_uploaded_image(news.image_filename, news.image_variants, news.id)
+                    if filename != news.image_filename:
+                        news.image_filename = filename
+                        news.image_variants = None
+                        image_changed = True
                 else:
                     flash('Error: Tipo de archivo de imagen no permitido. No se actualizó la imagen.', 'danger')
 
+            update_search_index(news)
             db.session.commit()
+            delete_upload_files(unused_files)
+            invalidate_news_pages(news.id, old_category, news.category)
+            if image_changed:
+                schedule_image_processing(news)
             flash('Noticia actualizada con éxito!', 'success')
-            return redirect(url_for('admin_news'))
+            return redirect(url_for('main.admin_news'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error al actualizar la noticia: {e}', 'danger')
@@ -319,30 +1039,33 @@ def edit_news(news_id):
     return render_template('admin_news_form.html', title='Editar Noticia', form=form, news=news)
 
 
-@app.route('/admin/news/delete/<int:news_id>', methods=['POST'])
+@main.route('/admin/news/delete/<int:news_id>', methods=['POST'])
 @admin_required
 def delete_news(news_id):
     """Ruta para eliminar una noticia."""
     news_to_delete = NewsArticle.query.get_or_404(news_id)
+    category = news_to_delete.category
     try:
-        # Opcional: Eliminar el archivo de imagen del disco persistente
-        if news_to_delete.image_filename:
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], news_to_delete.image_filename)
-            if os.path.exists(image_path):
-                os.remove(image_path)
+        # La imagen se borra del disco persistente solo si ninguna otra noticia la usa
+        unused_files = release_uploaded_image(news_to_delete.image_filename, news_to_delete.image_variants, news_id)
 
+        remove_from_search_index(news_id)
+        db.session.execute(delete(ArticleViewCount).where(ArticleViewCount.news_id == news_id))
+        db.session.execute(delete(ArticleViewHour).where(ArticleViewHour.news_id == news_id))
         db.session.delete(news_to_delete)
         db.session.commit()
+        delete_upload_files(unused_files)
+        invalidate_news_pages(news_id, category)
         flash('Noticia eliminada correctamente.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error al eliminar la noticia: {e}', 'danger')
         print(f"Error en delete_news: {e}", file=sys.stderr)
-    return redirect(url_for('admin_news'))
+    return redirect(url_for('main.admin_news'))
 
 
 # --- Gestión de Mensajes ---
-@app.route('/admin/contacts')
+@main.route('/admin/contacts')
 @admin_required
 def admin_contacts():
     """Muestra la bandeja de entrada de mensajes de contacto."""
@@ -350,7 +1073,7 @@ def admin_contacts():
     return render_template('admin_contacts.html', contact_messages=messages)
 
 
-@app.route('/admin/contacts/delete/<int:message_id>', methods=['POST'])
+@main.route('/admin/contacts/delete/<int:message_id>', methods=['POST'])
 @admin_required
 def delete_contact_message(message_id):
     """Elimina un mensaje de contacto."""
@@ -362,17 +1085,17 @@ def delete_contact_message(message_id):
     except Exception as e:
         db.session.rollback()
         flash(f'Error al eliminar el mensaje: {e}', 'danger')
-    return redirect(url_for('admin_contacts'))
+    return redirect(url_for('main.admin_contacts'))
 
 # --- Gestión de Usuarios (CRUD) ---
-@app.route('/admin/users')
+@main.route('/admin/users')
 @admin_required
 def admin_users():
     """Muestra la tabla para gestionar usuarios administradores."""
     users = User.query.all()
     return render_template('admin_users.html', users=users)
 
-@app.route('/admin/users/add', methods=['GET', 'POST'])
+@main.route('/admin/users/add', methods=['GET', 'POST'])
 @admin_required
 def add_user():
     """Formulario para añadir un nuevo usuario."""
@@ -390,14 +1113,14 @@ def add_user():
                 db.session.add(new_user)
                 db.session.commit()
                 flash('Usuario creado con éxito.', 'success')
-                return redirect(url_for('admin_users'))
+                return redirect(url_for('main.admin_users'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error al crear el usuario: {e}', 'danger')
     return render_template('admin_user_form.html', form=form, title="Añadir Usuario")
 
 
-@app.route('/admin/users/edit/<int:user_id>', methods=['GET', 'POST'])
+@main.route('/admin/users/edit/<int:user_id>', methods=['GET', 'POST'])
 @admin_required
 def edit_user(user_id):
     """Formulario para editar un usuario existente."""
@@ -418,62 +1141,586 @@ def edit_user(user_id):
             if form.password.data:
                 user.set_password(form.password.data)
             db.session.commit()
+            # Los permisos nuevos (o retirados) valen desde la próxima petición en todos los workers
+            identity_cache.invalidate(user.id)
             flash('Usuario actualizado con éxito.', 'success')
-            return redirect(url_for('admin_users'))
+            return redirect(url_for('main.admin_users'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error al editar el usuario: {e}', 'danger')
     return render_template('admin_user_form.html', form=form, title="Editar Usuario")
 
 
-@app.route('/admin/users/delete/<int:user_id>', methods=['POST'])
+@main.route('/admin/users/delete/<int:user_id>', methods=['POST'])
 @admin_required
 def delete_user(user_id):
     """Elimina un usuario (protegiendo contra auto-eliminación)."""
     if user_id == current_user.id:
         flash('No puedes eliminar tu propia cuenta.', 'danger')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
     
     user_to_delete = User.query.get_or_404(user_id)
     try:
         db.session.delete(user_to_delete)
         db.session.commit()
+        identity_cache.invalidate(user_id)
         flash('Usuario eliminado correctamente.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error al eliminar el usuario: {e}', 'danger')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
 
 # ==============================================================================
 # 6. INICIALIZACIÓN DE LA BASE DE DATOS Y EJECUCIÓN
 # ==============================================================================
+def add_missing_columns(table):
+    """Añade con ALTER TABLE las columnas del modelo que aún no existen en la tabla."""
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+            added.append(column.name)
+    db.session.commit()
+    return added
+
+def backfill_excerpts(only_missing=True, batch_size=500):
+    """Calcula extracto y conteo de palabras para las noticias existentes, por lotes."""
+    updated, last_id = 0, 0
+    while True:
+        query = select(NewsArticle.id, NewsArticle.content).where(NewsArticle.id > last_id)
+        if only_missing:
+            query = query.where(NewsArticle.excerpt.is_(None))
+        rows = db.session.execute(query.order_by(NewsArticle.id).limit(batch_size)).all()
+        if not rows:
+            return updated
+        values = []
+        for row in rows:
+            plain_text = html_to_text(row.content)
+            values.append({'id': row.id, 'excerpt': make_excerpt(plain_text, 300), 'word_count': count_words(plain_text)})
+        db.session.execute(update(NewsArticle), values)
+        db.session.commit()
+        updated += len(values)
+        last_id = rows[-1].id
+
+def rebuild_search_index(batch_size=500):
+    """Vuelve a llenar la tabla FTS5 desde news_article, por lotes. Devuelve cuántas indexó."""
+    clear_index(db.session)
+    indexed, last_id = 0, 0
+    while True:
+        batch = (NewsArticle.query
+                 .options(load_only(NewsArticle.id, NewsArticle.title, NewsArticle.excerpt,
+                                    NewsArticle.content, NewsArticle.author))
+                 .filter(NewsArticle.id > last_id)
+                 .order_by(NewsArticle.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        index_articles(db.session, [search_document(news) for news in batch])
+        indexed += len(batch)
+        last_id = batch[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+    optimize_index(db.session)
+    db.session.commit()
+    return indexed
+
+# --- Importación y exportación masiva (flask import / flask export) ---
+def prepare_news_row(row):
+    """Valida una noticia importada y completa los valores por defecto."""
+    for field in ('title', 'category', 'content'):
+        if not row[field]:
+            raise ValueError(f'falta {field}')
+    # Se acepta el nombre interno ('POLITICA') o el slug de la URL ('politica')
+    row['category'] = CATEGORIES.get(row['category'], row['category'])
+    if row['category'] not in CATEGORY_SLUGS:
+        raise ValueError(f'categoría desconocida: {row["category"]!r}')
+    row['author'] = row['author'] or "Equipo Desconocido"
+    row['date_posted'] = row['date_posted'] or datetime.utcnow()
+    return row
+
+def prepare_contact_row(row):
+    """Valida un mensaje de contacto importado."""
+    for field in ('name', 'email', 'message'):
+        if not row[field]:
+            raise ValueError(f'falta {field}')
+    row['timestamp'] = row['timestamp'] or datetime.utcnow()
+    return row
+
+# Tipo de archivo -> (modelo, validación de cada fila)
+ARCHIVE_MODELS = {
+    'news': (NewsArticle, prepare_news_row),
+    'contacts': (ContactMessage, prepare_contact_row),
+}
+
+def export_rows(model, batch_size=1000):
+    """Genera las filas de `model` como dicts, por lotes ordenados por id (memoria constante)."""
+    columns = model.__table__.columns
+    last_id = 0
+    while True:
+        rows = db.session.execute(select(*columns).where(model.id > last_id)
+                                  .order_by(model.id).limit(batch_size)).mappings().all()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        last_id = rows[-1]['id']
+
+def exported_image_files():
+    """Archivos de uploads (originales y derivados) que usan las noticias, sin repetir."""
+    rows = db.session.execute(select(NewsArticle.image_filename, NewsArticle.image_variants)
+                              .where(NewsArticle.image_filename.isnot(None))
+                              .order_by(NewsArticle.image_filename)
+                              .execution_options(yield_per=1000))
+    previous = None
+    for filename, variants in rows:
+        # Ordenadas por nombre: las noticias que comparten imagen quedan seguidas
+        if filename == previous or filename.startswith(('http://', 'https://')):
+            continue
+        previous = filename
+        yield filename
+        yield from derivative_files(variants)
+
+def insert_archive_rows(model, rows, keep_ids=True):
+    """Inserta un lote con executemany. Devuelve (filas insertadas con su id, filas que ya existían).
+
+    Las filas con id que ya está en la tabla se saltan, así que repetir un lote
+    (p. ej. al retomar tras un corte) no duplica nada. Las filas sin id, o
+    todas si keep_ids es False, reciben un id nuevo.
+    """
+    with_id = [row for row in rows if keep_ids and row['id'] is not None]
+    without_id = [row for row in rows if not (keep_ids and row['id'] is not None)]
+    existing = set()
+    if with_id:
+        existing = set(db.session.scalars(select(model.id).where(model.id.in_([row['id'] for row in with_id]))))
+        with_id = [row for row in with_id if row['id'] not in existing]
+        if with_id:
+            # Insert de Core: un solo executemany (el bulk del ORM parte el lote según los None)
+            db.session.execute(insert(model.__table__), with_id)
+    if without_id:
+        values = [{name: value for name, value in row.items() if name != 'id'} for row in without_id]
+        new_ids = db.session.scalars(insert(model.__table__).returning(model.id, sort_by_parameter_order=True),
+                                     values).all()
+        for row, new_id in zip(without_id, new_ids):
+            row['id'] = new_id
+    return with_id + without_id, len(existing)
+
+def complete_news_rows(rows):
+    """Calcula extracto y conteo de palabras de las noticias importadas que no los traen."""
+    for row in rows:
+        if row['excerpt'] is None:
+            plain_text = html_to_text(row['content'])
+            row['excerpt'] = make_excerpt(plain_text, 300)
+            row['word_count'] = count_words(plain_text)
+        row['word_count'] = row['word_count'] or 0
+
+def register_imported_images(rows):
+    """Suma a UploadedFile las referencias de las noticias importadas con imagen por hash.
+
+    Se agrupa por hash: el mismo contenido puede llegar con dos nombres
+    (ab/....jpg y ab/....jpeg) y le corresponde una sola fila con todas sus
+    referencias (ver release_uploaded_image).
+    """
+    names = {}
+    for row in rows:
+        digest = content_digest(row['image_filename'])
+        if digest:
+            names.setdefault(digest, []).append(row['image_filename'])
+    if not names:
+        return
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    stored = {entry.digest: entry for entry in UploadedFile.query.filter(UploadedFile.digest.in_(names))}
+    for digest, filenames in names.items():
+        entry = stored.get(digest)
+        if entry is None:
+            # Nombre canónico: el que está en disco y, entre ellos, el de extensión normalizada
+            filename = min(set(filenames), key=lambda name: (
+                not os.path.exists(os.path.join(upload_folder, name)),
+                name != content_filename(digest, name.rsplit('.', 1)[1]),
+                name))
+            path = os.path.join(upload_folder, filename)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            entry = UploadedFile(digest=digest, filename=filename, size=size, ref_count=0)
+            db.session.add(entry)
+        entry.ref_count += len(filenames)
+
+def import_archive(kind, rows, batch_size=1000, keep_ids=True, checkpoint=None, state=None, progress=None):
+    """Importa filas (número, dict) de read_rows() en lotes, una transacción por lote.
+
+    Tras cada commit guarda en `checkpoint` cuántas filas del archivo se
+    procesaron. `state` es el estado guardado al retomar. Devuelve el estado
+    final: rows, inserted, existing, rejected.
+    """
+    model, prepare = ARCHIVE_MODELS[kind]
+    kinds = column_kinds(model.__table__)
+    state = dict(state or {'rows': 0, 'inserted': 0, 'existing': 0, 'rejected': 0})
+    for batch in batched(rows, batch_size):
+        prepared = []
+        for number, raw in batch:
+            try:
+                prepared.append(prepare(decode_row(raw, kinds)))
+            except ValueError as e:
+                print(f"Fila {number} rechazada: {e}", file=sys.stderr)
+                state['rejected'] += 1
+        if kind == 'news':
+            complete_news_rows(prepared)
+        inserted, existing = insert_archive_rows(model, prepared, keep_ids)
+        if kind == 'news':
+            if current_app.config['SEARCH_ENABLED']:
+                index_articles(db.session, [search_document(SimpleNamespace(**row)) for row in inserted])
+            register_imported_images(inserted)
+        db.session.commit()
+        state['rows'] = batch[-1][0]
+        state['inserted'] += len(inserted)
+        state['existing'] += existing
+        if checkpoint is not None:
+            checkpoint.save(state)
+        if progress is not None:
+            progress.advance(len(batch))
+    return state
+
+def migrate_database():
+    """Aplica los cambios de esquema que create_all() no hace sobre tablas existentes."""
+    added = add_missing_columns(NewsArticle.__table__)
+    # create_all() solo crea índices junto con tablas nuevas
+    for index in NewsArticle.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
+    if 'excerpt' in added:
+        backfill_excerpts()
+    try:
+        created = create_search_table(db.session)
+        db.session.commit()
+    except OperationalError as e:
+        db.session.rollback()
+        current_app.config['SEARCH_ENABLED'] = False
+        print(f"ADVERTENCIA: SQLite sin FTS5, la búsqueda queda desactivada: {e}", file=sys.stderr)
+    else:
+        if created:
+            rebuild_search_index()
+
 def initialize_database():
-    """Crea las tablas y el primer usuario administrador si no existen."""
-    with app.app_context():
-        db.create_all()
-        # Crear el primer usuario solo si no existe ninguno
-        if not User.query.first():
-            # ¡IMPORTANTE! Usa variables de entorno para las credenciales.
-            admin_username = os.environ.get('ADMIN_USER', 'admin')
-            admin_password = os.environ.get('ADMIN_PASS', 'defaultpassword')
-            
-            if admin_password == 'defaultpassword':
-                 print("ADVERTENCIA: Usando contraseña por defecto. Configura ADMIN_USER y ADMIN_PASS en tus variables de entorno.", file=sys.stderr)
+    """Crea las tablas y el primer usuario administrador si no existen (`flask init-db`)."""
+    db.create_all()
+    migrate_database()
+    # Crear el primer usuario solo si no existe ninguno
+    if not User.query.first():
+        # ¡IMPORTANTE! Usa variables de entorno para las credenciales.
+        admin_username = os.environ.get('ADMIN_USER', 'admin')
+        admin_password = os.environ.get('ADMIN_PASS', 'defaultpassword')
 
-            admin_user = User(username=admin_username, is_admin=True)
-            admin_user.set_password(admin_password)
-            db.session.add(admin_user)
-            db.session.commit()
-            print(f"Base de datos inicializada. Usuario '{admin_username}' creado.", file=sys.stdout)
+        if admin_password == 'defaultpassword':
+             print("ADVERTENCIA: Usando contraseña por defecto. Configura ADMIN_USER y ADMIN_PASS en tus variables de entorno.", file=sys.stderr)
+
+        admin_user = User(username=admin_username, is_admin=True)
+        admin_user.set_password(admin_password)
+        db.session.add(admin_user)
+        db.session.commit()
+        print(f"Base de datos inicializada. Usuario '{admin_username}' creado.", file=sys.stdout)
+
+# --- Comandos de consola (flask <comando>) ---
+@main.cli.command('init-db')
+def init_db_command():
+    """Crea las tablas que falten, aplica las migraciones y crea el primer administrador.
 
-# Llama a la inicialización antes de la primera solicitud
-@app.before_first_request
-def setup():
+    Se ejecuta una vez por despliegue, antes de arrancar gunicorn; repetirlo no cambia nada.
+    """
+    started = time.perf_counter()
     initialize_database()
+    click.echo(f'Base de datos lista en {time.perf_counter() - started:.2f} s '
+               f'({current_app.config["SQLALCHEMY_DATABASE_URI"]}).')
+
+@main.cli.command('backfill-excerpts')
+@click.option('--all', 'recompute_all', is_flag=True, help='Recalcular también las noticias que ya tienen extracto.')
+def backfill_excerpts_command(recompute_all):
+    """Calcula el extracto en texto plano y el conteo de palabras de las noticias."""
+    migrate_database()
+    updated = backfill_excerpts(only_missing=not recompute_all)
+    page_cache.clear()
+    click.echo(f'{updated} noticias actualizadas.')
+
+@main.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Reconstruye el índice de búsqueda FTS5 a partir de todas las noticias."""
+    migrate_database()
+    if not current_app.config['SEARCH_ENABLED']:
+        raise click.ClickException('Esta versión de SQLite no incluye FTS5.')
+    indexed = rebuild_search_index()
+    page_cache.invalidate('search', 'search-api')
+    click.echo(f'{indexed} noticias indexadas.')
+
+@main.cli.command('build-image-variants')
+@click.option('--all', 'rebuild_all', is_flag=True, help='Regenerar también las noticias que ya tienen derivados.')
+def build_image_variants_command(rebuild_all):
+    """Genera (en línea) los derivados de imagen que falten, p. ej. tras un reinicio."""
+    if not derivatives_available():
+        raise click.ClickException('Pillow no está instalado: pip install Pillow')
+    migrate_database()
+    query = NewsArticle.query.options(listing_options()).filter(NewsArticle.image_filename.isnot(None))
+    if not rebuild_all:
+        query = query.filter(NewsArticle.image_variants.is_(None))
+    pending = [(news.id, news.image_filename) for news in query if news.has_local_image]
+    for news_id, filename in pending:
+        process_article_image(current_app._get_current_object(), news_id, filename)
+    click.echo(f'{len(pending)} imágenes procesadas.')
+
+@main.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Solo informar qué se borraría y cuántos bytes se liberarían.')
+@click.option('--grace-minutes', default=60, show_default=True,
+              help='Ignorar archivos más recientes (subidas o derivados en curso).')
+def gc_uploads_command(dry_run, grace_minutes):
+    """Borra los archivos de uploads que ninguna noticia referencia."""
+    migrate_database()
+    referenced, ref_counts = set(), {}
+    rows = db.session.execute(select(NewsArticle.image_filename, NewsArticle.image_variants)
+                              .where(NewsArticle.image_filename.isnot(None)))
+    for filename, variants in rows:
+        referenced.add(filename)
+        referenced.update(derivative_files(variants))
+        digest = content_digest(filename)
+        if digest:
+            ref_counts[digest] = ref_counts.get(digest, 0) + 1
+
+    orphans = list(find_orphans(current_app.config['UPLOAD_FOLDER'], referenced, grace_seconds=grace_minutes * 60))
+    total_bytes = sum(size for _filename, size in orphans)
+    for filename, size in orphans:
+        click.echo(f'{size:>12}  {filename}')
+
+    if dry_run:
+        click.echo(f'{len(orphans)} archivos huérfanos; se liberarían {total_bytes} bytes ({total_bytes / 1024 / 1024:.2f} MB).')
+        return
+
+    delete_upload_files(filename for filename, _size in orphans)
+    # Los contadores se recalculan desde las noticias por si quedaron desfasados
+    for stored in UploadedFile.query.all():
+        refs = ref_counts.get(stored.digest, 0)
+        if refs:
+            stored.ref_count = refs
+        else:
+            db.session.delete(stored)
+    db.session.commit()
+    click.echo(f'{len(orphans)} archivos huérfanos borrados; {total_bytes} bytes ({total_bytes / 1024 / 1024:.2f} MB) liberados.')
+
+@main.cli.command('publish')
+@click.option('--workers', type=int, default=None, help='Procesos en paralelo (por defecto, PUBLISH_WORKERS).')
+def publish_command(workers):
+    """Reconstruye el sitio publicado completo en PUBLISH_DIR."""
+    if not static_publisher.enabled:
+        raise click.ClickException('Configura PUBLISH_DIR para usar el modo publicación.')
+    paths = ['/'] + [f'/category/{slug}' for slug in CATEGORIES]
+    paths += [f'/news/{news_id}' for news_id in db.session.scalars(select(NewsArticle.id).order_by(NewsArticle.id))]
+    db.session.remove()
+    started = time.perf_counter()
+    written, removed = static_publisher.rebuild(paths, workers=workers)
+    click.echo(f'{written} páginas publicadas y {removed} borradas en {time.perf_counter() - started:.1f} s '
+               f'({current_app.config["PUBLISH_DIR"]}).')
+
+@main.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(ARCHIVE_MODELS)))
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help='Formato del archivo (por defecto, según la extensión).')
+@click.option('--images', 'images_path', default=None, help='Tar donde guardar las imágenes de las noticias.')
+@click.option('--batch-size', default=1000, show_default=True, help='Filas leídas por consulta.')
+def export_command(kind, path, fmt, images_path, batch_size):
+    """Exporta noticias (news) o mensajes (contacts) a JSONL o CSV. PATH '-' es la salida estándar."""
+    if images_path and kind != 'news':
+        raise click.ClickException('--images solo se usa con noticias.')
+    try:
+        fmt = detect_format(path, fmt)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    migrate_database()
+    model, _prepare = ARCHIVE_MODELS[kind]
+    progress = Progress(f'Exportando {kind}')
+    with open_archive(path, 'w') as stream:
+        writer = RowWriter(stream, fmt, model.__table__.columns.keys())
+        for batch in batched(export_rows(model, batch_size), batch_size):
+            for row in batch:
+                writer.write(row)
+            progress.advance(len(batch))
+    progress.finish()
+    if images_path:
+        count, size, missing = write_images_tar(images_path, current_app.config['UPLOAD_FOLDER'], exported_image_files())
+        for filename in missing:
+            click.echo(f'Imagen no encontrada en uploads: {filename}', err=True)
+        click.echo(f'{count} imágenes ({size / 1024 / 1024:.2f} MB) guardadas en {images_path}.', err=True)
+
+@main.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(ARCHIVE_MODELS)))
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help='Formato del archivo (por defecto, según la extensión).')
+@click.option('--images', 'images_path', default=None, help='Tar con las imágenes de las noticias.')
+@click.option('--batch-size', default=1000, show_default=True, help='Filas por lote (una transacción por lote).')
+@click.option('--new-ids', is_flag=True, help='Ignorar los ids del archivo y asignar ids nuevos.')
+@click.option('--checkpoint', 'checkpoint_path', default=None,
+              help='Archivo del punto de control (por defecto, PATH.checkpoint).')
+@click.option('--restart', is_flag=True, help='Empezar desde el principio aunque haya un punto de control.')
+def import_command(kind, path, fmt, images_path, batch_size, new_ids, checkpoint_path, restart):
+    """Importa noticias (news) o mensajes (contacts) desde JSONL o CSV. PATH '-' es la entrada estándar.
+
+    Si se corta, volver a ejecutar el mismo comando retoma desde el último lote confirmado.
+    """
+    if images_path and kind != 'news':
+        raise click.ClickException('--images solo se usa con noticias.')
+    try:
+        fmt = detect_format(path, fmt)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.create_all()
+    migrate_database()
+    if images_path:
+        # Primero las imágenes: las noticias las referencian al insertarse
+        extracted, existing, rejected = extract_images_tar(images_path, current_app.config['UPLOAD_FOLDER'])
+        click.echo(f'Imágenes: {extracted} copiadas, {existing} ya existían, {rejected} rechazadas.', err=True)
+
+    checkpoint, state = None, None
+    if path != '-':
+        checkpoint = Checkpoint(checkpoint_path or f'{path}.checkpoint', path)
+        if restart:
+            checkpoint.clear()
+        try:
+            state = checkpoint.load()
+        except ValueError as e:
+            raise click.ClickException(f'{e} Usa --restart para empezar de nuevo.')
+        if state:
+            click.echo(f"Retomando después de la fila {state['rows']} ({checkpoint.path}).", err=True)
+
+    progress = Progress(f'Importando {kind}')
+    try:
+        with open_archive(path, 'r') as stream:
+            state = import_archive(kind, read_rows(stream, fmt, skip=state['rows'] if state else 0),
+                                   batch_size=batch_size, keep_ids=not new_ids,
+                                   checkpoint=checkpoint, state=state, progress=progress)
+    except (ValueError, SQLAlchemyError) as e:
+        db.session.rollback()
+        progress.finish()
+        hint = ' Corrige el archivo o vuelve a ejecutar el comando para retomar.' if checkpoint is not None else ''
+        raise click.ClickException(f'Importación detenida: {e}.{hint}')
+    progress.finish()
+    if checkpoint is not None:
+        checkpoint.clear()
+    page_cache.clear()
+    click.echo(f"{state['inserted']} filas importadas, {state['existing']} ya existían y "
+               f"{state['rejected']} rechazadas.")
+    if kind == 'news' and static_publisher.enabled:
+        click.echo('Ejecuta `flask publish` para regenerar el sitio publicado.')
+
+@main.cli.command('compress-static')
+def compress_static_command():
+    """Precomprime (gzip y brotli) los archivos de texto de static/ para servirlos sin comprimir en línea."""
+    if not brotli_available():
+        click.echo('Brotli no está instalado (pip install Brotli): solo se genera gzip.', err=True)
+    files = original_bytes = compressed_bytes = 0
+    for filename in static_assets.compressible_files():
+        path = os.path.join(current_app.static_folder, filename)
+        written = precompress_file(path, min_size=current_app.config['COMPRESS_MIN_SIZE'])
+        if written:
+            files += 1
+            original_bytes += os.path.getsize(path)
+            compressed_bytes += min(written.values())
+            click.echo(f"{filename}: {os.path.getsize(path)} -> " +
+                       ', '.join(f'{encoding} {size}' for encoding, size in written.items()))
+    click.echo(f'{files} archivos precomprimidos: {original_bytes / 1024:.1f} KB -> {compressed_bytes / 1024:.1f} KB.')
+
+# ==============================================================================
+# 7. FÁBRICA DE LA APLICACIÓN Y ARRANQUE (ver startup.py)
+# ==============================================================================
+def create_app(config=None):
+    """Crea la aplicación: configuración, extensiones y rutas. No abre la base de datos.
+
+    `config` sobrescribe valores leídos del entorno (pruebas, benchmarks). El
+    comando `flask` encuentra esta función solo; gunicorn usa wsgi.py.
+    """
+    app = Flask(__name__)
+    load_config(app)
+    if config:
+        app.config.update(config)
+    # Crear los directorios si no existen para evitar errores al iniciar
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    db.init_app(app)
+    # Se registra primero para que su before_request mida toda la petición
+    request_metrics.init_app(app)
+    with app.app_context():
+        # Antes de abrir ninguna conexión: cada conexión del pool nace con los PRAGMA
+        install_sqlite_tuning(db.engine, app.config['SQLITE_TUNING'])
+        request_metrics.instrument_engine(db.engine)
+    login_manager.init_app(app)
+    page_cache.init_app(app)
+    image_processor.init_app(app)
+    static_assets.init_app(app)
+    compressor.init_app(app)
+    static_publisher.init_app(app)
+    contact_queue.init_app(app)
+    view_counter.init_app(app)
+    app.register_blueprint(main)
+    identity_cache.init_app(app, login_manager)
+    return app
+
+def check_schema():
+    """True si existen todas las tablas. Sin la tabla FTS5 se desactiva la búsqueda."""
+    tables = set(inspect(db.engine).get_table_names())
+    missing = sorted(set(db.metadata.tables) - tables)
+    if missing:
+        print(f"ADVERTENCIA: faltan tablas ({', '.join(missing)}); ejecuta `flask init-db`.", file=sys.stderr)
+    if SEARCH_TABLE not in tables:
+        current_app.config['SEARCH_ENABLED'] = False
+    return not missing
+
+def prime_pages():
+    """Renderiza como visitante anónimo la portada, las categorías y las noticias más
+    leídas (o, sin ranking todavía, la más reciente): quedan en la caché de páginas."""
+    client = current_app.test_client()
+    paths = ['/'] + [f'/category/{slug}' for slug in CATEGORIES]
+    news_ids = [entry['id'] for entry in view_counter.top()] or db.session.scalars(
+        select(NewsArticle.id).order_by(NewsArticle.date_posted.desc(), NewsArticle.id.desc()).limit(1)).all()
+    paths += [f'/news/{news_id}' for news_id in news_ids]
+    for path in paths:
+        # RENDER_HEADER: sin pasar por el sitio publicado ni contar visitas
+        client.get(path, headers={RENDER_HEADER: '1'}).close()
+    return len(paths)
+
+def warm_up(app, report=None):
+    """Deja el proceso listo para servir: nada de lo que hace lo paga una petición.
+
+    Con `gunicorn --preload` corre una vez en el proceso maestro y los workers
+    heredan plantillas compiladas, ranking y caché de páginas con el fork.
+    Devuelve el StartupReport, que también queda en app.extensions.
+    """
+    report = report or StartupReport()
+    with app.app_context():
+        with report.phase('plantillas'):
+            precompile_templates(app.jinja_env)
+        with report.phase('esquema'):
+            schema_ready = check_schema()
+        if schema_ready:
+            with report.phase('lo más leído'):
+                view_counter.refresh_ranking(notify=False)
+            if app.config['WARMUP_PRIME_PAGES']:
+                with report.phase('caché de páginas'):
+                    prime_pages()
+        # Sin conexiones abiertas al hacer fork: cada worker abre las suyas
+        db.engine.dispose()
+    # Las peticiones del precalentamiento no cuentan en /admin/metrics
+    request_metrics.reset()
+    with report.phase('gc.freeze'):
+        freeze_heap()
+    report.finish()
+    app.extensions['startup_report'] = report
+    print(report.format(), file=sys.stderr)
+    return report
 
 if __name__ == '__main__':
-    # El servidor de producción como Gunicorn llamará a la app directamente.
+    # El servidor de producción (gunicorn) usa wsgi.py.
     # Este bloque es solo para desarrollo local.
+    app = create_app()
+    with app.app_context():
+        initialize_database()
+    warm_up(app)
+    start_worker(app)
     app.run(debug=True)
 
@@ -0,0 +1,346 @@
+# archive.py
+# ==============================================================================
+# IMPORTACIÓN Y EXPORTACIÓN MASIVA: JSONL / CSV + TAR DE IMÁGENES
+# ==============================================================================
+# `flask export` y `flask import` (app.py) mueven noticias y mensajes de
+# contacto entre la base de datos y archivos planos:
+#
+#     noticias.jsonl      una fila por línea, un objeto JSON por fila
+#     noticias.csv        cabecera con los nombres de columna
+#     imagenes.tar        archivos de uploads con su ruta relativa
+#
+# Todo se lee y se escribe en streaming (fila a fila, miembro a miembro del
+# tar), así que la memoria no depende del tamaño del archivo. Los archivos
+# terminados en .gz se comprimen/descomprimen al vuelo.
+#
+# Este módulo no conoce los modelos: convierte valores según el tipo de cada
+# columna, guarda el punto de control de una importación y muestra el avance.
+# La inserción por lotes está en app.py.
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from datetime import datetime, timezone
+
+from storage import CHUNK_SIZE
+
+FORMATS = ('jsonl', 'csv')
+
+
+def detect_format(path, explicit=None):
+    """'jsonl' o 'csv' según `explicit` o la extensión de `path` (ignorando .gz).
+
+    Para '-' (entrada o salida estándar) el formato por defecto es JSONL.
+    """
+    if explicit:
+        return explicit
+    if path == '-':
+        return 'jsonl'
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    raise ValueError(f'No se puede deducir el formato de {path!r}; usa --format.')
+
+
+def open_archive(path, mode):
+    """Abre un archivo de filas en texto UTF-8 ('r' o 'w'). '-' es stdin/stdout."""
+    if path == '-':
+        stream = sys.stdin.buffer if mode == 'r' else sys.stdout.buffer
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        # Nivel 6 (el de la herramienta gzip): el 9 triplica el tiempo y apenas reduce el tamaño
+        return gzip.open(path, mode + 't', compresslevel=6, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+# --- Tipos de columna ---
+
+def column_kinds(table):
+    """{columna: tipo} con tipo en int, float, bool, datetime, json o str."""
+    kinds = {}
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        if python_type is bool:
+            kinds[column.name] = 'bool'
+        elif python_type in (int, float):
+            kinds[column.name] = python_type.__name__
+        elif python_type is datetime:
+            kinds[column.name] = 'datetime'
+        elif python_type in (dict, list):
+            kinds[column.name] = 'json'
+        else:
+            kinds[column.name] = 'str'
+    return kinds
+
+
+def decode_row(raw, kinds):
+    """Convierte una fila leída (strings en CSV, tipos JSON en JSONL) a valores de Python.
+
+    Las columnas que faltan quedan en None; las desconocidas se ignoran. Lanza
+    ValueError si un valor no tiene el tipo de su columna.
+    """
+    row = {}
+    for name, kind in kinds.items():
+        value = raw.get(name)
+        if value == '' and kind != 'str':
+            value = None
+        if value is not None:
+            try:
+                value = _decode_value(value, kind)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'{name}: valor no válido ({e})') from None
+        row[name] = value
+    return row
+
+
+def _decode_value(value, kind):
+    if kind == 'int':
+        return int(value)
+    if kind == 'float':
+        return float(value)
+    if kind == 'bool':
+        return value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'si', 'sí')
+    if kind == 'datetime':
+        parsed = datetime.fromisoformat(value)
+        # La base de datos guarda UTC sin zona horaria
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    if kind == 'json':
+        return json.loads(value) if isinstance(value, str) else value
+    return str(value)
+
+
+def _encode_value(value, fmt):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if fmt == 'csv':
+        if value is None:
+            return ''
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return value
+
+
+# --- Lectura y escritura de filas ---
+
+class RowWriter:
+    """Escribe filas (dicts con las columnas `fields`) en JSONL o CSV."""
+
+    def __init__(self, stream, fmt, fields):
+        self.stream = stream
+        self.fmt = fmt
+        self.fields = list(fields)
+        self.count = 0
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=self.fields, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, row):
+        encoded = {name: _encode_value(row.get(name), self.fmt) for name in self.fields}
+        if self.fmt == 'csv':
+            self._csv.writerow(encoded)
+        else:
+            self.stream.write(json.dumps(encoded, ensure_ascii=False, separators=(',', ':')))
+            self.stream.write('\n')
+        self.count += 1
+
+
+def read_rows(stream, fmt, skip=0):
+    """Genera (número de fila, dict) desde la fila `skip` + 1.
+
+    Las filas saltadas (al retomar una importación) no se decodifican. Lanza
+    ValueError con el número de fila si una línea JSONL no es un objeto JSON.
+    """
+    number = 0
+    if fmt == 'csv':
+        # El contenido HTML de una noticia puede superar el límite por defecto (128 KB)
+        csv.field_size_limit(2 ** 31 - 1)
+        for raw in csv.DictReader(stream):
+            number += 1
+            if number > skip:
+                yield number, raw
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        if number <= skip:
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f'Fila {number}: JSON no válido ({e})') from None
+        if not isinstance(raw, dict):
+            raise ValueError(f'Fila {number}: se esperaba un objeto JSON')
+        yield number, raw
+
+
+def batched(iterable, size):
+    """Agrupa `iterable` en listas de hasta `size` elementos."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- Punto de control ---
+
+class Checkpoint:
+    """Avance de una importación, guardado en disco después de cada lote confirmado.
+
+    Identifica el archivo de origen por ruta, tamaño y fecha de modificación:
+    un punto de control de otro archivo (o del mismo archivo modificado) no se
+    usa para retomar.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        stat = os.stat(source)
+        self.fingerprint = {'source': os.path.abspath(source), 'size': stat.st_size,
+                            'mtime_ns': stat.st_mtime_ns}
+
+    def load(self):
+        """Estado guardado, o None si no hay. ValueError si es de otro archivo."""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            raise ValueError(f'El punto de control {self.path} está dañado.') from None
+        if saved.get('fingerprint') != self.fingerprint:
+            raise ValueError(f'El punto de control {self.path} corresponde a otro archivo o a otra versión de este.')
+        return saved['state']
+
+    def save(self, state):
+        # Escritura atómica: si el proceso muere, queda el punto de control anterior
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'state': state}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# --- Avance ---
+
+class Progress:
+    """Muestra filas procesadas y filas por segundo, como mucho una vez por `interval`."""
+
+    def __init__(self, label, stream=None, interval=1.0):
+        self.label = label
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self._tty = self.stream.isatty()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def advance(self, count):
+        self.count += count
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._report(end='\r' if self._tty else '\n')
+
+    def finish(self):
+        self._report(end='\n')
+        return self.elapsed
+
+    def _report(self, end):
+        print(f'{self.label}: {self.count} filas ({self.rate:.0f} filas/s)', end=end, file=self.stream, flush=True)
+
+
+# --- Tar de imágenes ---
+
+def safe_member_name(name):
+    """True si `name` es una ruta relativa que no sale de la carpeta de uploads."""
+    parts = name.split('/')
+    return bool(name) and not name.startswith('/') and '\\' not in name and not any(
+        part in ('', '.', '..') for part in parts)
+
+
+def write_images_tar(path, upload_folder, filenames):
+    """Escribe en un tar los archivos de uploads `filenames`, uno a uno.
+
+    Devuelve (archivos, bytes, nombres que faltan en disco).
+    """
+    mode = 'w|gz' if path.endswith(('.tar.gz', '.tgz')) else 'w|'
+    count = size = 0
+    missing = []
+    with tarfile.open(path, mode) as tar:
+        for filename in filenames:
+            full_path = os.path.join(upload_folder, filename)
+            if not safe_member_name(filename) or not os.path.isfile(full_path):
+                missing.append(filename)
+                continue
+            info = tar.gettarinfo(full_path, arcname=filename)
+            info.uid = info.gid = 0
+            info.uname = info.gname = ''
+            with open(full_path, 'rb') as f:
+                tar.addfile(info, f)
+            count += 1
+            size += info.size
+    return count, size, missing
+
+
+def extract_images_tar(path, upload_folder):
+    """Copia a uploads los archivos del tar que aún no existen, leyéndolo en streaming.
+
+    Solo se aceptan archivos regulares con rutas relativas seguras. Los que ya
+    existen se conservan (con nombres por hash, el contenido es el mismo).
+    Devuelve (copiados, ya existentes, rechazados).
+    """
+    extracted = existing = rejected = 0
+    with tarfile.open(path, 'r|*') as tar:
+        for member in tar:
+            if not member.isfile() or not safe_member_name(member.name):
+                rejected += 1
+                continue
+            target = os.path.join(upload_folder, member.name)
+            if os.path.exists(target):
+                existing += 1
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f'{target}.import.tmp'
+            source = tar.extractfile(member)
+            try:
+                with open(tmp_path, 'wb') as out:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                os.replace(tmp_path, target)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            extracted += 1
+    return extracted, existing, rejected
@@ -0,0 +1,112 @@
+# assets.py
+# ==============================================================================
+# ARCHIVOS ESTÁTICOS CON HUELLA (FINGERPRINT) Y CACHÉ HTTP
+# ==============================================================================
+# Al arrancar se calcula el hash de cada archivo de static/ y url_for('static')
+# añade ?v=<hash> a la URL. Como la URL cambia cuando cambia el archivo, el
+# navegador (y cualquier proxy) puede guardarlo un año sin volver a preguntar:
+#
+#     Cache-Control: public, max-age=31536000, immutable
+#
+# Las peticiones sin huella (o con una huella vieja) se sirven con no-cache y
+# un ETag fuerte, así que la revalidación cuesta un 304 sin cuerpo.
+#
+# Si existen style.css.br / style.css.gz (`flask compress-static`) se envían
+# directamente a los navegadores que los aceptan.
+import hashlib
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+from compression import COMPRESSIBLE_MIMETYPES, ENCODING_SUFFIXES, choose_encoding, mark_encoded, precompressed_variants
+
+ONE_YEAR = 31536000
+
+
+def fingerprint_folder(folder):
+    """Devuelve {ruta relativa: hash corto} de todos los archivos de `folder`."""
+    fingerprints = {}
+    if not folder or not os.path.isdir(folder):
+        return fingerprints
+    for root, _dirs, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            sha256 = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b''):
+                    sha256.update(chunk)
+            relative = os.path.relpath(path, folder).replace(os.sep, '/')
+            fingerprints[relative] = sha256.hexdigest()[:16]
+    return fingerprints
+
+
+def cache_forever(response):
+    """Marca una respuesta como inmutable durante un año."""
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = ONE_YEAR
+    response.cache_control.immutable = True
+    return response
+
+
+def revalidate(response):
+    """El cliente puede guardar la respuesta, pero debe revalidarla (If-None-Match) cada vez."""
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+class StaticAssets:
+    """Reemplaza la vista 'static' de Flask por una con huellas y ETags fuertes."""
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.fingerprints = {}
+        self.precompressed = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        # Se calcula una sola vez, al arrancar
+        self.fingerprints = fingerprint_folder(self.folder)
+        self.precompressed = {}
+        for filename in self.compressible_files():
+            variants = precompressed_variants(os.path.join(self.folder, filename))
+            if variants:
+                # Orden de preferencia del servidor: brotli antes que gzip
+                self.precompressed[filename] = tuple(encoding for encoding in ENCODING_SUFFIXES if encoding in variants)
+        app.url_defaults(self._add_fingerprint)
+        app.view_functions['static'] = self.serve
+        app.extensions['static_assets'] = self
+
+    def _add_fingerprint(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            version = self.fingerprints.get(values['filename'])
+            if version:
+                values.setdefault('v', version)
+
+    def compressible_files(self):
+        """Archivos de static/ de tipo texto (los candidatos a precomprimir)."""
+        suffixes = tuple(ENCODING_SUFFIXES.values())
+        return [filename for filename in self.fingerprints
+                if not filename.endswith(suffixes) and mimetypes.guess_type(filename)[0] in COMPRESSIBLE_MIMETYPES]
+
+    def serve(self, filename):
+        version = self.fingerprints.get(filename)
+        offered = self.precompressed.get(filename)
+        encoding = choose_encoding(request.accept_encodings, offered) if offered else None
+        if encoding:
+            # El archivo .br/.gz con el tipo del original; su propio ETag para cada codificación
+            response = send_from_directory(self.folder, filename + ENCODING_SUFFIXES[encoding],
+                                           mimetype=mimetypes.guess_type(filename)[0],
+                                           etag=f'{version}-{encoding}' if version else True, conditional=True)
+            mark_encoded(response, encoding)
+        else:
+            response = send_from_directory(self.folder, filename, etag=version or True, conditional=True)
+            if offered:
+                response.vary.add('Accept-Encoding')
+        if version and request.args.get('v') == version:
+            return cache_forever(response)
+        return revalidate(response)
@@ -0,0 +1,112 @@
+# benchmarks/bench_homepage_feed.py
+# ==============================================================================
+# Benchmark de la portada: 4 consultas por categoría vs. homepage_feed()
+# ==============================================================================
+# Crea una base de datos desechable con muchas noticias y mide cuánto tardan
+# las consultas de la portada sin ningún índice secundario en news_article
+# (la línea base) y con los índices del modelo (ix_news_article_category_date
+# e ix_news_article_date).
+#
+# Uso:
+#     python benchmarks/bench_homepage_feed.py --articles 100000 --repeat 50
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# La base de datos de prueba vive en una carpeta temporal, nunca en instance/
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='bench-feed-')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, text  # noqa: E402
+
+import app as news_app  # noqa: E402
+from app import CATEGORIES, NewsArticle, create_app, db, homepage_feed  # noqa: E402
+
+# La consulta con ROW_NUMBER() se mide solo como referencia: SQLite tiene que
+# calcular la ventana sobre toda la tabla antes de filtrar.
+WINDOW_SQL = text("""
+    SELECT a.* FROM news_article a
+    JOIN (SELECT id, ROW_NUMBER() OVER (PARTITION BY category ORDER BY date_posted DESC, id DESC) AS position
+          FROM news_article) ranked ON ranked.id = a.id
+    WHERE ranked.position <= :per_category
+    ORDER BY a.category, ranked.position
+""")
+
+
+def seed(total, batch_size=5000):
+    """Inserta `total` noticias con fechas aleatorias repartidas en varios años."""
+    categories = list(CATEGORIES.values())
+    start = datetime(2020, 1, 1)
+    body = '<p>' + 'Lorem ipsum dolor sit amet. ' * 60 + '</p>'
+    for offset in range(0, total, batch_size):
+        rows = [{
+            'title': f'Noticia de prueba {i}',
+            'category': random.choice(categories),
+            'content': body,
+            'author': 'Benchmark',
+            'date_posted': start + timedelta(seconds=random.randint(0, 5 * 365 * 24 * 3600)),
+        } for i in range(offset, min(offset + batch_size, total))]
+        db.session.execute(insert(NewsArticle), rows)
+        db.session.commit()
+
+
+def legacy_queries(per_category=4):
+    """Las cuatro consultas que hacía index() antes de homepage_feed()."""
+    return {name: NewsArticle.query.filter_by(category=name).order_by(NewsArticle.date_posted.desc()).limit(per_category).all()
+            for name in CATEGORIES.values()}
+
+
+def window_query(per_category=4):
+    return db.session.execute(WINDOW_SQL, {'per_category': per_category}).all()
+
+
+def measure(fn, repeat):
+    """Devuelve la mediana en milisegundos de `repeat` ejecuciones."""
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las consultas de la portada")
+    parser.add_argument('--articles', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f"Sembrando {args.articles} noticias en {app.config['SQLALCHEMY_DATABASE_URI']} ...")
+        seed(args.articles)
+
+        results = []
+        # Línea base: sin ningún índice secundario (migrate_database los vuelve a crear)
+        for index in NewsArticle.__table__.indexes:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+        db.session.commit()
+        results.append(('4 consultas, sin índice', measure(legacy_queries, max(3, args.repeat // 10))))
+        results.append(('homepage_feed, sin índice', measure(homepage_feed, max(3, args.repeat // 10))))
+
+        news_app.migrate_database()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        results.append(('4 consultas, con índice', measure(legacy_queries, args.repeat)))
+        results.append(('homepage_feed, con índice', measure(homepage_feed, args.repeat)))
+        results.append(('ROW_NUMBER(), con índice', measure(window_query, max(3, args.repeat // 10))))
+
+    print(f'\n{"Variante":<30} {"mediana (ms)":>14}')
+    for name, median in results:
+        print(f'{name:<30} {median:>14.3f}')
+
+
+if __name__ == '__main__':
+    main()
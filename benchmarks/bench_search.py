@@ -0,0 +1,111 @@
+# benchmarks/bench_search.py
+# ==============================================================================
+# Benchmark de la búsqueda FTS5 sobre un corpus sintético
+# ==============================================================================
+# Siembra una base desechable con noticias de texto aleatorio, construye el
+# índice news_search y mide la latencia de distintas búsquedas (una palabra,
+# varias palabras, prefijo, filtro por categoría, palabras muy comunes).
+#
+# Uso:
+#     python benchmarks/bench_search.py --articles 100000 --repeat 30
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='bench-search-')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import CATEGORIES, NewsArticle, create_app, db, migrate_database, rebuild_search_index  # noqa: E402
+from html_text import make_excerpt  # noqa: E402
+from search import search_articles  # noqa: E402
+
+SYLLABLES = ['ca', 'me', 'lo', 'ri', 'sa', 'to', 'na', 'pe', 'du', 'ven', 'gal', 'mar', 'cor', 'ta', 'bi', 'ro']
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(total, words, rng, batch_size=5000):
+    # Distribución sesgada (tipo Zipf): pocas palabras muy comunes y muchas raras
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    categories = list(CATEGORIES.values())
+    start = datetime(2020, 1, 1)
+    for offset in range(0, total, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, total)):
+            body = ' '.join(rng.choices(words, cum_weights=cum_weights, k=150))
+            rows.append({
+                'title': ' '.join(rng.choices(words, cum_weights=cum_weights, k=6)).capitalize(),
+                'category': rng.choice(categories),
+                'content': f'<p>{body}</p>',
+                'excerpt': make_excerpt(body, 300),
+                'word_count': 150,
+                'author': rng.choice(['Ana Pérez', 'Luis Soto', 'Equipo Desconocido']),
+                'date_posted': start + timedelta(minutes=i),
+            })
+        db.session.execute(insert(NewsArticle), rows)
+        db.session.commit()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la búsqueda FTS5')
+    parser.add_argument('--articles', type=int, default=100000)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    words = vocabulary(args.vocabulary, rng)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        migrate_database()
+        print(f'Sembrando {args.articles} noticias ...')
+        started = time.perf_counter()
+        seed(args.articles, words, rng)
+        print(f'  {time.perf_counter() - started:.1f} s')
+        print('Construyendo el índice FTS5 ...')
+        started = time.perf_counter()
+        rebuild_search_index()
+        print(f'  {time.perf_counter() - started:.1f} s')
+
+        rare, medium, common = words[-50:], words[500:550], words[:5]
+        scenarios = [
+            ('palabra rara', lambda: search_articles(db.session, rng.choice(rare))),
+            ('palabra media', lambda: search_articles(db.session, rng.choice(medium))),
+            ('dos palabras', lambda: search_articles(db.session, f'{rng.choice(medium)} {rng.choice(medium)}')),
+            ('prefijo', lambda: search_articles(db.session, rng.choice(medium)[:4])),
+            ('con categoría', lambda: search_articles(db.session, rng.choice(medium), category='POLITICA')),
+            ('palabra muy común', lambda: search_articles(db.session, rng.choice(common))),
+            ('página 5', lambda: search_articles(db.session, rng.choice(medium), offset=40)),
+        ]
+
+        print(f'\n{"Búsqueda":<20} {"p50 (ms)":>10} {"p95 (ms)":>10}')
+        for name, run in scenarios:
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f'{name:<20} {percentile(samples, 0.5):>10.2f} {percentile(samples, 0.95):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
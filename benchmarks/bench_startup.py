@@ -0,0 +1,115 @@
+# benchmarks/bench_startup.py
+# ==============================================================================
+# Benchmark del arranque: primera petición de un worker vs. las siguientes
+# ==============================================================================
+# Arranca gunicorn con un solo worker (así la primera petición es siempre la
+# primera de ese worker) en tres modos:
+#
+#     sin precalentar   gunicorn 'app:create_app()'
+#     wsgi              gunicorn wsgi:app             (cada worker llama a warm_up)
+#     wsgi --preload    gunicorn --preload wsgi:app   (warm_up en el maestro, antes del fork)
+#
+# y mide el tiempo hasta la primera respuesta, la latencia de la primera
+# petición a cada ruta y la mediana de las --repeat siguientes. Usa el corpus
+# de loadtest.py (se siembra si --data-dir no tiene uno).
+#
+# Uso:
+#     python benchmarks/bench_startup.py --data-dir /tmp/corpus --repeat 100
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import CORPUS_FILE, REPO_ROOT, HTTPClient, free_port, stop_gunicorn  # noqa: E402
+
+MODES = (
+    ('sin precalentar', ["app:create_app()"]),
+    ('wsgi', ['wsgi:app']),
+    ('wsgi --preload', ['--preload', 'wsgi:app']),
+)
+
+
+def ensure_corpus(args):
+    if os.path.exists(os.path.join(args.data_dir, CORPUS_FILE)):
+        return
+    print(f'Sembrando el corpus en {args.data_dir} ...', file=sys.stderr)
+    os.environ['DATA_DIR'] = args.data_dir
+    sys.path.insert(0, REPO_ROOT)
+    import loadtest
+    from app import create_app
+
+    corpus_args = argparse.Namespace(data_dir=args.data_dir, articles=args.articles, images=0, image_ratio=0,
+                                     messages=0, users=0, seed=1234)
+    loadtest.seed_corpus(corpus_args, create_app())
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn terminó al arrancar')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f'gunicorn no abrió el puerto en {timeout} s')
+
+
+def timed(client, path):
+    started = time.perf_counter()
+    status, _body = client.request('GET', path)
+    if status != 200:
+        raise RuntimeError(f'{path}: HTTP {status}')
+    return (time.perf_counter() - started) * 1000
+
+
+def run_mode(name, gunicorn_args, paths, args):
+    port = free_port()
+    log = open(os.path.join(args.data_dir, 'bench-startup.log'), 'ab')
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+         *gunicorn_args],
+        cwd=REPO_ROOT, env=dict(os.environ, DATA_DIR=args.data_dir), stdout=log, stderr=log,
+    )
+    try:
+        wait_for_port(port, process)
+        client = HTTPClient(port)
+        first = {path: timed(client, path) for path in paths}
+        ready_ms = (time.perf_counter() - started) * 1000
+        medians = {}
+        for path in paths:
+            samples = sorted(timed(client, path) for _ in range(args.repeat))
+            medians[path] = samples[len(samples) // 2]
+    finally:
+        stop_gunicorn(process)
+        log.close()
+    return ready_ms, first, medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del arranque en frío de un worker')
+    parser.add_argument('--data-dir', help='Corpus de loadtest.py (por defecto, uno nuevo en una carpeta temporal)')
+    parser.add_argument('--articles', type=int, default=5000, help='Noticias del corpus si hay que sembrarlo')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+    args.data_dir = os.path.abspath(args.data_dir or tempfile.mkdtemp(prefix='bench-startup-'))
+    ensure_corpus(args)
+    paths = ['/', '/category/politica', '/news/1']
+
+    print(f'\n{"Modo":<17} {"hasta servir (ms)":>18}  {"ruta":<20} {"1.ª (ms)":>9} {"mediana (ms)":>13}')
+    for name, gunicorn_args in MODES:
+        ready_ms, first, medians = run_mode(name, gunicorn_args, paths, args)
+        for index, path in enumerate(paths):
+            label, ready = (name, f'{ready_ms:.0f}') if index == 0 else ('', '')
+            print(f'{label:<17} {ready:>18}  {path:<20} {first[path]:>9.2f} {medians[path]:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,519 @@
+# benchmarks/loadtest.py
+# ==============================================================================
+# Prueba de carga reproducible con un corpus sintético de noticias
+# ==============================================================================
+# 1. Siembra una base SQLite desechable con noticias, imágenes (con sus
+#    derivados), mensajes de contacto y usuarios. Con --seed el corpus es
+#    siempre el mismo.
+# 2. Recorre los escenarios (portada, categoría, detalle, imágenes, POST de
+#    contacto, listados de administración y una mezcla ponderada) con N hilos
+#    concurrentes durante --duration segundos contra:
+#      - client:   el test client de Flask, en este mismo proceso;
+#      - gunicorn: un gunicorn local con --workers procesos, por HTTP.
+# 3. Escribe un JSON con peticiones por segundo y percentiles de latencia, más
+#    el commit de git y los parámetros del corpus. Con --compare se compara con
+#    un resultado anterior y el script termina con código 1 si algún escenario
+#    empeoró más que --tolerance.
+#
+# Uso:
+#     python benchmarks/loadtest.py --articles 5000 --concurrency 8 --duration 10 \
+#         --targets client,gunicorn --output bench-$(git rev-parse --short HEAD).json
+#     python benchmarks/loadtest.py ... --compare bench-main.json
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ADMIN_USER, ADMIN_PASS = 'bench-admin', 'bench-password'
+CORPUS_FILE = 'corpus.json'
+
+WORDS = ('región gobierno ciencia tecnología elecciones comunidad municipio proyecto '
+         'estudio universidad informe ministro alcalde vecinos ciudad campo agua energía '
+         'salud educación cultura deporte economía empleo ley congreso tribunal datos '
+         'investigación satélite clima lluvia cosecha puerto carretera hospital escuela').split()
+
+_CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+# ------------------------------------------------------------------------------
+# Corpus
+# ------------------------------------------------------------------------------
+def paragraph(rng, words=80):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def make_image(rng, index):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (1600, 900), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(1600), rng.randrange(900)
+        draw.ellipse((x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 300)),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    draw.text((40, 40), f'Imagen {index}', fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    buffer.seek(0)
+    return buffer
+
+
+def seed_corpus(args, app):
+    """Crea la base de datos del corpus (la aplicación se creó con DATA_DIR ya apuntando a ella)."""
+    from sqlalchemy import insert
+    from werkzeug.datastructures import FileStorage
+    from werkzeug.security import generate_password_hash
+
+    import app as news_app
+    from html_text import make_excerpt
+
+    db = news_app.db
+    rng = random.Random(args.seed)
+    if not news_app.derivatives_available():
+        print('Pillow no está instalado: el corpus no tendrá imágenes.', file=sys.stderr)
+        args.images = 0
+    with app.app_context():
+        news_app.initialize_database()
+        images = []
+        for index in range(args.images):
+            filename = news_app.save_uploaded_image(FileStorage(stream=make_image(rng, index), filename=f'seed-{index}.jpg'))
+            db.session.commit()
+            variants = news_app.build_derivatives(app.config['UPLOAD_FOLDER'], filename)
+            images.append((filename, variants))
+
+        categories = list(news_app.CATEGORIES.values())
+        start = datetime(2022, 1, 1)
+        references = {}
+        for offset in range(0, args.articles, 1000):
+            rows = []
+            for i in range(offset, min(offset + 1000, args.articles)):
+                paragraphs = [paragraph(rng) for _ in range(rng.randint(4, 12))]
+                body = ' '.join(paragraphs)
+                row = {
+                    'title': paragraph(rng, rng.randint(6, 12))[:-1],
+                    'category': rng.choice(categories),
+                    'content': ''.join(f'<p>{p}</p>' for p in paragraphs),
+                    'excerpt': make_excerpt(body, 300),
+                    'word_count': len(body.split()),
+                    'author': rng.choice(['Ana Pérez', 'Luis Soto', 'Equipo Desconocido']),
+                    'date_posted': start + timedelta(minutes=17 * i),
+                    'image_filename': None,
+                    'image_variants': None,
+                }
+                if images and rng.random() < args.image_ratio:
+                    filename, variants = rng.choice(images)
+                    row['image_filename'], row['image_variants'] = filename, variants
+                    references[filename] = references.get(filename, 0) + 1
+                rows.append(row)
+            db.session.execute(insert(news_app.NewsArticle), rows)
+            db.session.commit()
+        # Cada imagen suma una referencia por noticia que la usa (la de la subida sobra)
+        for stored in news_app.UploadedFile.query.all():
+            stored.ref_count = references.get(stored.filename, 0)
+        db.session.commit()
+
+        messages = [{
+            'name': f'Lector {i}', 'email': f'lector{i}@example.com', 'subject': paragraph(rng, 5)[:90],
+            'message': paragraph(rng, 60), 'timestamp': start + timedelta(minutes=i),
+        } for i in range(args.messages)]
+        for offset in range(0, len(messages), 1000):
+            db.session.execute(insert(news_app.ContactMessage), messages[offset:offset + 1000])
+        # Un solo hash para todos: generarlo es lento a propósito
+        password_hash = generate_password_hash('bench-user-password')
+        db.session.execute(insert(news_app.User), [
+            {'username': f'editor{i}', 'password_hash': password_hash, 'is_admin': True} for i in range(args.users)
+        ])
+        db.session.commit()
+        if app.config['SEARCH_ENABLED']:
+            news_app.rebuild_search_index()
+
+        image_urls = []
+        for filename, variants in images:
+            image_urls.append(f'/uploads/{filename}')
+            for size in (variants or {}).values():
+                image_urls.append(f"/uploads/{size['webp']}")
+        corpus = {
+            'seed': args.seed, 'articles': args.articles, 'images': args.images,
+            'image_ratio': args.image_ratio, 'messages': args.messages, 'users': args.users,
+            'article_ids': [row.id for row in db.session.execute(db.select(news_app.NewsArticle.id))],
+            'category_slugs': list(news_app.CATEGORIES),
+            'image_urls': image_urls,
+        }
+    with open(os.path.join(args.data_dir, CORPUS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(corpus, f)
+    return corpus
+
+
+# ------------------------------------------------------------------------------
+# Clientes: test client de Flask y HTTP contra gunicorn
+# ------------------------------------------------------------------------------
+class FlaskClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form)
+        body = response.get_data()
+        response.close()
+        return response.status_code, body
+
+
+class HTTPClient:
+    """Cliente HTTP mínimo con cookies (gunicorn sync cierra la conexión en cada respuesta)."""
+
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+        self.cookies = {}
+
+    def request(self, method, path, form=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            self.connection = None
+            raise
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                name, _, rest = value.partition('=')
+                self.cookies[name] = rest.split(';', 1)[0]
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status, data
+
+
+def login(client):
+    status, body = client.request('GET', '/login')
+    match = _CSRF.search(body.decode('utf-8', 'replace'))
+    form = {'username': ADMIN_USER, 'password': ADMIN_PASS}
+    if match:
+        form['csrf_token'] = match.group(1)
+    status, _body = client.request('POST', '/login', form=form)
+    if status != 302:
+        raise RuntimeError(f'No se pudo iniciar sesión como {ADMIN_USER} (HTTP {status})')
+
+
+# ------------------------------------------------------------------------------
+# Escenarios
+# ------------------------------------------------------------------------------
+def build_scenarios(corpus):
+    """{nombre: (necesita sesión, función(rng) -> (método, ruta, formulario))}."""
+    ids, slugs, images = corpus['article_ids'], corpus['category_slugs'], corpus['image_urls']
+    # Las noticias recientes reciben más visitas que las antiguas
+    recent = ids[-200:] or ids
+
+    def contact(rng):
+        return 'POST', '/contacto', {'name': 'Lector', 'email': 'lector@example.com',
+                                     'subject': 'Prueba de carga', 'message': paragraph(rng, 40)}
+
+    scenarios = {
+        'index': (False, lambda rng: ('GET', '/', None)),
+        'category_page': (False, lambda rng: ('GET', f'/category/{rng.choice(slugs)}', None)),
+        'news_detail': (False, lambda rng: ('GET', f'/news/{rng.choice(recent if rng.random() < 0.8 else ids)}', None)),
+        'contact_post': (False, contact),
+        'admin_news': (True, lambda rng: ('GET', '/admin/news', None)),
+        'admin_contacts': (True, lambda rng: ('GET', '/admin/contacts', None)),
+    }
+    if images:
+        scenarios['uploaded_file'] = (False, lambda rng: ('GET', rng.choice(images), None))
+
+    public = [(name, weight) for name, weight in (('index', 30), ('news_detail', 40), ('category_page', 20),
+                                                  ('uploaded_file', 8), ('contact_post', 2)) if name in scenarios]
+    names, weights = zip(*public)
+
+    def mix(rng):
+        return scenarios[rng.choices(names, weights)[0]][1](rng)
+
+    scenarios['mix'] = (False, mix)
+    return scenarios
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_scenario(make_client, needs_login, build_request, concurrency, duration, seed):
+    clients = [make_client() for _ in range(concurrency)]
+    if needs_login:
+        for client in clients:
+            login(client)
+    samples = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.monotonic() + duration
+    barrier = threading.Barrier(concurrency)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = clients[index]
+        barrier.wait()
+        while time.monotonic() < deadline:
+            method, path, form = build_request(rng)
+            started = time.perf_counter()
+            try:
+                status, _body = client.request(method, path, form)
+            except Exception:
+                errors[index] += 1
+                continue
+            samples[index].append((time.perf_counter() - started) * 1000)
+            statuses[index][status] = statuses[index].get(status, 0) + 1
+            if status >= 500:
+                errors[index] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    latencies = [sample for per_thread in samples for sample in per_thread]
+    status_counts = {}
+    for per_thread in statuses:
+        for status, count in per_thread.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': max(latencies, default=0.0),
+        'statuses': status_counts,
+    }
+
+
+def run_target(name, make_client, scenarios, args):
+    results = {}
+    for scenario, (needs_login, build_request) in scenarios.items():
+        if args.warmup:
+            run_scenario(make_client, needs_login, build_request, args.concurrency, args.warmup, args.seed)
+        result = run_scenario(make_client, needs_login, build_request, args.concurrency, args.duration, args.seed)
+        results[scenario] = result
+        print(f'  {name:<9} {scenario:<15} {result["rps"]:>9.1f} {result["p50_ms"]:>9.2f} '
+              f'{result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} {result["errors"]:>7}', flush=True)
+    return results
+
+
+# ------------------------------------------------------------------------------
+# gunicorn local
+# ------------------------------------------------------------------------------
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(args, environ):
+    port = free_port()
+    log = open(os.path.join(args.data_dir, 'gunicorn.log'), 'ab')
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}',
+               '--log-level', 'warning', args.wsgi_app]
+    if not args.no_preload:
+        command.insert(3, '--preload')
+    process = subprocess.Popen(
+        command,
+        cwd=REPO_ROOT, env=environ, stdout=log, stderr=log,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn terminó al arrancar; ver {log.name}')
+        try:
+            status, _body = HTTPClient(port).request('GET', '/')
+            if status < 500:
+                return process, port
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn no respondió en 60 s')
+
+
+def stop_gunicorn(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ------------------------------------------------------------------------------
+# Resultado y comparación
+# ------------------------------------------------------------------------------
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(baseline, current, tolerance):
+    """Imprime las diferencias y devuelve la lista de regresiones."""
+    regressions = []
+    print(f'\n{"Destino":<9} {"Escenario":<15} {"req/s":>16} {"p95 (ms)":>18}')
+    for target, scenarios in current['results'].items():
+        for scenario, result in scenarios.items():
+            before = baseline.get('results', {}).get(target, {}).get(scenario)
+            if not before:
+                continue
+            rps_change = (result['rps'] - before['rps']) / before['rps'] if before['rps'] else 0.0
+            p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            flag = ''
+            if rps_change < -tolerance or p95_change > tolerance:
+                flag = '  <-- regresión'
+                regressions.append((target, scenario))
+            print(f'{target:<9} {scenario:<15} {result["rps"]:>8.1f} ({rps_change:+6.1%}) '
+                  f'{result["p95_ms"]:>9.2f} ({p95_change:+6.1%}){flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga con un corpus sintético')
+    parser.add_argument('--data-dir', help='Carpeta del corpus (se reutiliza si ya existe)')
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--image-ratio', type=float, default=0.6, help='Fracción de noticias con imagen')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--targets', default='client,gunicorn', help='client, gunicorn o ambos separados por comas')
+    parser.add_argument('--scenarios', help='Lista separada por comas (por defecto, todos)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='Segundos por escenario')
+    parser.add_argument('--warmup', type=float, default=1, help='Segundos de calentamiento por escenario')
+    parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn')
+    parser.add_argument('--wsgi-app', default='wsgi:app', help='Aplicación WSGI para gunicorn')
+    parser.add_argument('--no-preload', action='store_true', help='Sin --preload: cada worker arranca por su cuenta')
+    parser.add_argument('--no-page-cache', action='store_true', help='Desactiva la caché de páginas')
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto, stdout)')
+    parser.add_argument('--compare', help='JSON de una ejecución anterior')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Empeoramiento admitido (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    throwaway = args.data_dir is None
+    args.data_dir = os.path.abspath(args.data_dir or tempfile.mkdtemp(prefix='loadtest-'))
+    os.makedirs(args.data_dir, exist_ok=True)
+    # El entorno se fija antes de importar app; gunicorn hereda el mismo
+    os.environ.update({
+        'DATA_DIR': args.data_dir,
+        'ADMIN_USER': ADMIN_USER,
+        'ADMIN_PASS': ADMIN_PASS,
+        'PAGE_CACHE_ENABLED': '0' if args.no_page_cache else os.environ.get('PAGE_CACHE_ENABLED', '1'),
+        'METRICS_SLOW_MS': os.environ.get('METRICS_SLOW_MS', '60000'),
+    })
+    sys.path.insert(0, REPO_ROOT)
+    import app as news_app
+    flask_app = news_app.create_app()
+
+    corpus_path = os.path.join(args.data_dir, CORPUS_FILE)
+    if os.path.exists(corpus_path):
+        with open(corpus_path, encoding='utf-8') as f:
+            corpus = json.load(f)
+        print(f'Reutilizando el corpus de {args.data_dir}', file=sys.stderr)
+    else:
+        print(f'Sembrando el corpus en {args.data_dir} ...', file=sys.stderr)
+        started = time.perf_counter()
+        corpus = seed_corpus(args, flask_app)
+        print(f'  {time.perf_counter() - started:.1f} s', file=sys.stderr)
+
+    scenarios = build_scenarios(corpus)
+    if args.scenarios:
+        wanted = args.scenarios.split(',')
+        scenarios = {name: scenarios[name] for name in wanted if name in scenarios}
+
+    commit, dirty = git_revision()
+    report = {
+        'meta': {
+            'commit': commit, 'dirty': dirty,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'concurrency': args.concurrency, 'duration': args.duration, 'workers': args.workers,
+            'preload': not args.no_preload,
+            'page_cache': not args.no_page_cache,
+            'corpus': {key: corpus[key] for key in ('seed', 'articles', 'images', 'image_ratio', 'messages', 'users')},
+        },
+        'results': {},
+    }
+
+    print(f'\n  {"Destino":<9} {"Escenario":<15} {"req/s":>9} {"p50 (ms)":>9} {"p95 (ms)":>9} {"p99 (ms)":>9} {"errores":>7}',
+          flush=True)
+    try:
+        for target in args.targets.split(','):
+            if target == 'client':
+                # Igual que wsgi.py: plantillas compiladas y caché precargada antes de medir
+                news_app.warm_up(flask_app)
+                report['results']['client'] = run_target(
+                    'client', lambda: FlaskClient(flask_app), scenarios, args)
+            elif target == 'gunicorn':
+                process, port = start_gunicorn(args, dict(os.environ))
+                try:
+                    report['results']['gunicorn'] = run_target(
+                        'gunicorn', lambda: HTTPClient(port), scenarios, args)
+                finally:
+                    stop_gunicorn(process)
+            else:
+                parser.error(f'Destino desconocido: {target}')
+    finally:
+        news_app.contact_queue.flush()
+        if throwaway:
+            shutil.rmtree(args.data_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'\nResultados en {args.output}', file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('corpus') != report['meta']['corpus']:
+            print('AVISO: el corpus de la ejecución anterior es distinto; la comparación no es fiable.',
+                  file=sys.stderr)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} escenarios empeoraron más de un {args.tolerance:.0%}.', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/stress_sqlite.py
+# ==============================================================================
+# Prueba de concurrencia de SQLite: N hilos lectores y M hilos escritores
+# ==============================================================================
+# Compara la configuración original (journal DELETE, sin PRAGMA, pool por
+# defecto) con el perfil de db_tuning.py sobre la misma carga:
+#
+# - lectores: el listado de una categoría y el conteo de mensajes de contacto;
+# - escritores: un mensaje de contacto nuevo y la edición de una noticia.
+#
+# Cada perfil usa una base desechable nueva (WAL queda grabado en el archivo).
+# Informa operaciones por segundo y cuántas fallaron con "database is locked".
+#
+# Si hay más hilos que conexiones en el pool (SQLITE_POOL_SIZE +
+# SQLITE_MAX_OVERFLOW) los escritores se quedan esperando una conexión libre
+# y las escrituras por segundo caen aunque SQLite no esté bloqueado.
+#
+# Uso:
+#     python benchmarks/stress_sqlite.py --readers 8 --writers 4 --seconds 10
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='stress-sqlite-')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import CATEGORIES, ContactMessage, NewsArticle, db  # noqa: E402
+from db_tuning import install_sqlite_tuning, sqlite_engine_options, sqlite_settings_from_env  # noqa: E402
+
+LISTING_SQL = text(
+    'SELECT id, title, author, date_posted, excerpt FROM news_article '
+    'WHERE category = :category ORDER BY date_posted DESC, id DESC LIMIT 12'
+)
+COUNT_SQL = text('SELECT COUNT(*) FROM contact_message')
+EDIT_SQL = text('UPDATE news_article SET title = :title, excerpt = :excerpt WHERE id = :id')
+
+
+def make_engine(profile, path):
+    url = f'sqlite:///{path}'
+    if profile == 'original':
+        return create_engine(url)
+    settings = sqlite_settings_from_env()
+    engine = create_engine(url, **sqlite_engine_options(settings))
+    install_sqlite_tuning(engine, settings)
+    return engine
+
+
+def seed(engine, articles):
+    db.metadata.create_all(engine)
+    categories = list(CATEGORIES.values())
+    start = datetime(2020, 1, 1)
+    rows = [{
+        'title': f'Noticia {i}',
+        'category': categories[i % len(categories)],
+        'content': '<p>' + 'texto ' * 200 + '</p>',
+        'excerpt': 'texto ' * 40,
+        'word_count': 200,
+        'author': 'Equipo Desconocido',
+        'date_posted': start + timedelta(minutes=i),
+    } for i in range(articles)]
+    with engine.begin() as connection:
+        connection.execute(insert(NewsArticle), rows)
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reads = self.writes = self.locked = self.other_errors = 0
+
+    def add(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+
+def reader(engine, counters, deadline, rng):
+    categories = list(CATEGORIES.values())
+    while time.monotonic() < deadline:
+        try:
+            with engine.connect() as connection:
+                connection.execute(LISTING_SQL, {'category': rng.choice(categories)}).all()
+                connection.execute(COUNT_SQL).scalar()
+            counters.add(reads=1)
+        except OperationalError as error:
+            counters.add(**({'locked': 1} if 'locked' in str(error) else {'other_errors': 1}))
+
+
+def writer(engine, counters, deadline, rng, articles):
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(ContactMessage), {
+                    'name': 'Lector', 'email': 'lector@example.com',
+                    'subject': 'Prueba', 'message': 'Mensaje de prueba ' * 10,
+                    'timestamp': datetime.utcnow(),
+                })
+            with engine.begin() as connection:
+                connection.execute(EDIT_SQL, {'id': rng.randint(1, articles),
+                                              'title': f'Editada {rng.random()}',
+                                              'excerpt': 'editado ' * 40})
+            counters.add(writes=2)
+        except OperationalError as error:
+            counters.add(**({'locked': 1} if 'locked' in str(error) else {'other_errors': 1}))
+
+
+def run_profile(profile, args):
+    path = os.path.join(tempfile.mkdtemp(prefix=f'stress-{profile}-'), 'site.db')
+    engine = make_engine(profile, path)
+    seed(engine, args.articles)
+    counters = Counters()
+    deadline = time.monotonic() + args.seconds
+    threads = [threading.Thread(target=reader, args=(engine, counters, deadline, random.Random(i)))
+               for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(engine, counters, deadline, random.Random(1000 + i), args.articles))
+                for i in range(args.writers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    with engine.connect() as connection:
+        journal_mode = connection.execute(text('PRAGMA journal_mode')).scalar()
+    engine.dispose()
+    return {
+        'profile': profile, 'journal_mode': journal_mode,
+        'reads_per_s': counters.reads / elapsed, 'writes_per_s': counters.writes / elapsed,
+        'locked': counters.locked, 'other_errors': counters.other_errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de concurrencia de SQLite (lectores y escritores)')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--articles', type=int, default=5000)
+    args = parser.parse_args()
+
+    settings = sqlite_settings_from_env()
+    print(f'{args.readers} lectores, {args.writers} escritores, {args.seconds:g} s por perfil; '
+          f'pool ajustado: {settings["pool_size"]} + {settings["max_overflow"]} conexiones\n')
+    print(f'{"Perfil":<10} {"journal":>8} {"lecturas/s":>11} {"escrituras/s":>13} {"bloqueos":>9} {"otros":>6}')
+    for profile in ('original', 'ajustado'):
+        result = run_profile(profile, args)
+        print(f'{result["profile"]:<10} {result["journal_mode"]:>8} {result["reads_per_s"]:>11.0f} '
+              f'{result["writes_per_s"]:>13.0f} {result["locked"]:>9} {result["other_errors"]:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+# cache.py
+# ==============================================================================
+# CACHÉ DE PÁGINAS RENDERIZADAS
+# ==============================================================================
+# Las páginas públicas (inicio, categorías y detalle de noticia) solo cambian
+# cuando un administrador crea, edita o elimina una noticia. Este módulo guarda
+# el HTML ya renderizado para que esas visitas no toquen SQLite ni Jinja.
+#
+# - LRUCache: caché en memoria del proceso, con límite de entradas y TTL.
+# - PageCache: usa LRUCache y, opcionalmente, un directorio en disco compartido
+#   por todos los workers de gunicorn (PAGE_CACHE_DIR).
+#
+# Junto con el HTML se guardan sus variantes gzip/brotli (compression.py), así
+# que cada página se comprime una vez por cambio de contenido, no por visita.
+#
+# Las entradas se agrupan por "espacio de nombres" ('index', 'category:region',
+# 'news:12'...). Cada espacio puede tener varias variantes (los parámetros que
+# lee la vista, ver cached_page en app.py), e invalidar un espacio borra todas
+# sus variantes.
+#
+# Invalidación entre workers: cada worker tiene su propio LRU en memoria, así
+# que invalidar en el worker que atendió la edición no basta. Con
+# PAGE_CACHE_VERSION_DIR, invalidate() reemplaza un archivo marcador por
+# espacio de nombres (y clear() uno global), como el archivo de versión de
+# identity.py. Cada acierto en memoria compara con un stat la marca que tenía
+# el marcador antes de renderizar la página; si cambió, la página se descarta.
+# Así una noticia editada o borrada deja de servirse en todos los workers en
+# la petición siguiente, no al vencer el TTL.
+#
+# En disco nada caduca solo: las entradas vencidas se borran al podar, y la
+# poda también quita las más antiguas cuando se supera PAGE_CACHE_DISK_MAX_ENTRIES
+# o PAGE_CACHE_DISK_MAX_BYTES. Sin ese límite, cada cursor o búsqueda distinta
+# dejaría un archivo para siempre en el disco persistente.
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Caché en memoria con política LRU y expiración por tiempo (TTL)."""
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Devuelve el valor guardado o None si no existe o ya expiró."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Elimina todas las entradas cuya clave cumpla el predicado."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CachedPage:
+    """Una respuesta renderizada lista para volver a enviarse."""
+
+    __slots__ = ('body', 'mimetype', 'headers', 'encodings', 'stamp', 'version')
+
+    def __init__(self, body, mimetype='text/html', headers=None, stamp=None, encodings=None, version=None):
+        self.body = body
+        self.mimetype = mimetype
+        # Cabeceras que forman parte de la página (por ejemplo, Link rel="next")
+        self.headers = headers or {}
+        # El cuerpo ya comprimido: {'gzip': bytes, 'br': bytes} (ver compression.py)
+        self.encodings = encodings or {}
+        # Marca del archivo en disco (mtime) para detectar invalidaciones
+        # hechas por otros workers. None si no hay backend en disco.
+        self.stamp = stamp
+        # Marca de los marcadores de versión (PAGE_CACHE_VERSION_DIR) cuando se renderizó
+        self.version = version
+
+
+class PageCache:
+    """Caché de páginas con LRU en memoria y backend opcional en disco.
+
+    Configuración (app.config):
+        PAGE_CACHE_ENABLED      Activa o desactiva la caché (por defecto True).
+        PAGE_CACHE_TTL          Segundos de vida de cada página (por defecto 300).
+        PAGE_CACHE_MAX_ENTRIES  Entradas máximas en memoria (por defecto 512).
+        PAGE_CACHE_DIR          Directorio compartido entre workers (opcional).
+        PAGE_CACHE_VERSION_DIR  Marcadores de invalidación entre workers (None: solo este proceso).
+        PAGE_CACHE_DISK_MAX_ENTRIES  Páginas máximas en disco (por defecto 5000).
+        PAGE_CACHE_DISK_MAX_BYTES    Bytes máximos en disco (por defecto 256 MB).
+    """
+
+    # Al podar se baja hasta esta fracción de los límites, para no podar en cada escritura
+    PRUNE_TARGET = 0.9
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.memory = LRUCache()
+        self.directory = None
+        self.version_dir = None
+        self.disk_max_entries = 5000
+        self.disk_max_bytes = 256 * 1024 * 1024
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Estimación del disco desde la última poda (solo cuenta lo que escribe este proceso)
+        self._disk_lock = threading.Lock()
+        self._disk_entries = 0
+        self._disk_bytes = 0
+        self._next_prune = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        ttl = app.config.setdefault('PAGE_CACHE_TTL', 300)
+        max_entries = app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 512)
+        self.directory = app.config.setdefault('PAGE_CACHE_DIR', None)
+        self.version_dir = app.config.setdefault('PAGE_CACHE_VERSION_DIR', None)
+        self.disk_max_entries = app.config.setdefault('PAGE_CACHE_DISK_MAX_ENTRIES', 5000)
+        self.disk_max_bytes = app.config.setdefault('PAGE_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024)
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        if self.version_dir:
+            os.makedirs(self.version_dir, exist_ok=True)
+        app.extensions['page_cache'] = self
+
+    # --- Marcadores de versión (invalidación entre workers) ----------------------
+    def _marker_path(self, name):
+        return os.path.join(self.version_dir, hashlib.sha1(name.encode('utf-8')).hexdigest())
+
+    def _marker_stamp(self, name):
+        try:
+            stat = os.stat(self._marker_path(name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _bump(self, name):
+        # Archivo nuevo con os.replace: cambia el inodo aunque el mtime sea grueso
+        path = self._marker_path(name)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w'):
+                pass
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def version(self, namespace):
+        """Marca de invalidación de un espacio de nombres (y la global).
+
+        Se toma antes de renderizar y se pasa a set(): si otro worker invalida
+        mientras tanto, la página guardada ya nace vieja y se descarta.
+        """
+        if not self.version_dir:
+            return None
+        return self._marker_stamp(''), self._marker_stamp(namespace)
+
+    # --- Rutas en disco ---------------------------------------------------------
+    def _namespace_dir(self, namespace):
+        digest = hashlib.sha1(namespace.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _entry_path(self, namespace, variant):
+        digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()
+        return os.path.join(self._namespace_dir(namespace), digest + '.page')
+
+    def _read_disk(self, namespace, variant):
+        path = self._entry_path(namespace, variant)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime + self.memory.ttl < time.time():
+                return None
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        # Las variantes comprimidas van a continuación del cuerpo, en el orden del encabezado
+        sizes = header.get('encodings', [])
+        offset = end = len(body) - sum(size for _encoding, size in sizes)
+        encodings = {}
+        for encoding, size in sizes:
+            encodings[encoding] = body[offset:offset + size]
+            offset += size
+        return CachedPage(body[:end], header.get('mimetype', 'text/html'), header.get('headers'),
+                          stat.st_mtime_ns, encodings)
+
+    def _write_disk(self, namespace, variant, page):
+        folder = self._namespace_dir(namespace)
+        tmp_path = None
+        try:
+            os.makedirs(folder, exist_ok=True)
+            # Escritura atómica: archivo temporal + os.replace
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                header = {'mimetype': page.mimetype, 'headers': page.headers,
+                          'encodings': [[encoding, len(data)] for encoding, data in page.encodings.items()]}
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                f.write(page.body)
+                for data in page.encodings.values():
+                    f.write(data)
+            path = self._entry_path(namespace, variant)
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+            page.stamp = stat.st_mtime_ns
+        except OSError:
+            # Otro worker pudo invalidar la carpeta mientras escribíamos
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._disk_lock:
+            self._disk_entries += 1
+            self._disk_bytes += stat.st_size
+            due = (time.monotonic() >= self._next_prune or self._disk_entries > self.disk_max_entries
+                   or self._disk_bytes > self.disk_max_bytes)
+        if due:
+            self.prune()
+
+    def _disk_is_current(self, namespace, variant, page):
+        """Comprueba (con un simple stat) que otro worker no invalidó la entrada."""
+        try:
+            return os.stat(self._entry_path(namespace, variant)).st_mtime_ns == page.stamp
+        except OSError:
+            return False
+
+    # --- API pública -------------------------------------------------------------
+    def get(self, namespace, variant=''):
+        """Devuelve la CachedPage guardada o None, actualizando los contadores."""
+        page = None
+        if self.enabled:
+            key = (namespace, variant)
+            page = self.memory.get(key)
+            if page is not None and self.version_dir and page.version != self.version(namespace):
+                self.memory.delete(key)
+                page = None
+            if page is not None and self.directory and not self._disk_is_current(namespace, variant, page):
+                self.memory.delete(key)
+                page = None
+            if page is None and self.directory:
+                page = self._read_disk(namespace, variant)
+                if page is not None:
+                    page.version = self.version(namespace)
+                    self.memory.set(key, page)
+        with self._stats_lock:
+            if page is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return page
+
+    def set(self, namespace, variant, body, mimetype='text/html', headers=None, encodings=None, version=False):
+        """Guarda una página. `version` es la de version() antes de renderizarla (por defecto, la actual)."""
+        if not self.enabled:
+            return
+        if version is False:
+            version = self.version(namespace)
+        page = CachedPage(body, mimetype, headers, encodings=encodings, version=version)
+        if self.directory:
+            self._write_disk(namespace, variant, page)
+        self.memory.set((namespace, variant), page)
+
+    def invalidate(self, *namespaces):
+        """Borra todas las variantes de los espacios de nombres indicados."""
+        namespaces = set(namespaces)
+        self.memory.delete_where(lambda key: key[0] in namespaces)
+        if self.version_dir:
+            for namespace in namespaces:
+                self._bump(namespace)
+        if self.directory:
+            for namespace in namespaces:
+                shutil.rmtree(self._namespace_dir(namespace), ignore_errors=True)
+
+    def prune(self):
+        """Borra del disco las páginas vencidas y, si sobra, las más antiguas.
+
+        Se llama sola al escribir, como mucho una vez por TTL salvo que se
+        superen los límites. Devuelve cuántos archivos borró.
+        """
+        if not self.directory:
+            return 0
+        with self._disk_lock:
+            self._next_prune = time.monotonic() + self.memory.ttl
+        now = time.time()
+        entries, removed = [], 0
+        try:
+            folders = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+        except OSError:
+            return 0
+        for folder in folders:
+            try:
+                files = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in files:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                # Temporales de una escritura interrumpida: se dejan un TTL de margen
+                expired = stat.st_mtime + self.memory.ttl < now
+                if expired or (entry.name.endswith('.tmp') and stat.st_mtime + 2 * self.memory.ttl < now):
+                    removed += self._remove(entry.path)
+                elif entry.name.endswith('.page'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        kept, total_bytes = len(entries), sum(size for _mtime, size, _path in entries)
+        if kept > self.disk_max_entries or total_bytes > self.disk_max_bytes:
+            max_entries = int(self.disk_max_entries * self.PRUNE_TARGET)
+            max_bytes = int(self.disk_max_bytes * self.PRUNE_TARGET)
+            for _mtime, size, path in sorted(entries):
+                if kept <= max_entries and total_bytes <= max_bytes:
+                    break
+                kept -= 1
+                total_bytes -= size
+                removed += self._remove(path)
+        with self._disk_lock:
+            self._disk_entries, self._disk_bytes = kept, total_bytes
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def clear(self):
+        self.memory.clear()
+        if self.version_dir:
+            self._bump('')
+        if self.directory:
+            for name in os.listdir(self.directory):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def stats(self):
+        """Contadores de aciertos y fallos para el panel de administración."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            'entries': len(self.memory),
+            'shared': bool(self.directory or self.version_dir),
+        }
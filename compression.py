@@ -0,0 +1,193 @@
+# compression.py
+# ==============================================================================
+# COMPRESIÓN DE RESPUESTAS (GZIP / BROTLI)
+# ==============================================================================
+# - Respuestas dinámicas: un after_request comprime el cuerpo según el
+#   Accept-Encoding del navegador si el tipo está en COMPRESS_MIMETYPES y el
+#   cuerpo mide al menos COMPRESS_MIN_SIZE bytes. El ETag pasa a débil
+#   (W/"...") porque el cuerpo enviado ya no es byte a byte el original;
+#   If-None-Match usa la comparación débil, así que los 304 siguen funcionando.
+# - Páginas en caché: se guardan ya comprimidas, una vez por cada cambio de
+#   contenido, y cada visita recibe la variante que acepta (ver cached_page en
+#   app.py). Lo mismo con las páginas del modo publicación (index.html.gz/.br).
+# - Archivos estáticos: `flask compress-static` escribe style.css.gz y
+#   style.css.br junto a cada archivo comprimible, con el nivel máximo, y
+#   StaticAssets los sirve directamente. Un servidor delante puede usar los
+#   mismos archivos (nginx: gzip_static on; brotli_static on;).
+#
+# Las imágenes (PNG, JPEG, WebP) ya vienen comprimidas y no se tocan.
+# Brotli es opcional (pip install Brotli): sin él solo se ofrece gzip.
+import gzip
+import os
+import tempfile
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli es una dependencia opcional
+    brotli = None
+
+# Tipos que vale la pena comprimir (texto)
+COMPRESSIBLE_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript', 'text/csv',
+    'application/javascript', 'application/json', 'application/xml', 'application/atom+xml',
+    'image/svg+xml',
+)
+
+# Extensión de los archivos precomprimidos -> Content-Encoding
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Niveles para la compresión previa: se hace una sola vez, así que se usa el máximo
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+
+
+def brotli_available():
+    return brotli is not None
+
+
+def supported_encodings():
+    """Codificaciones que puede producir el servidor, por orden de preferencia."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    # mtime=0: el mismo contenido produce siempre los mismos bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def choose_encoding(accept_encodings, offered):
+    """La codificación de `offered` (en orden de preferencia) que el cliente acepta con mayor q."""
+    best, best_quality = None, 0
+    for encoding in offered:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def precompressed_variants(path):
+    """{codificación: ruta} de los archivos .br/.gz de `path` que no son más viejos que él."""
+    variants = {}
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return variants
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        try:
+            if os.stat(path + suffix).st_mtime_ns >= mtime:
+                variants[encoding] = path + suffix
+        except OSError:
+            continue
+    return variants
+
+
+def precompress_file(path, levels=None, min_size=0, min_saving=0.05):
+    """Escribe `path`.br / `path`.gz (de forma atómica) si ahorran al menos `min_saving`.
+
+    `levels` es {codificación: nivel} (por defecto, STATIC_LEVELS). Borra las
+    variantes que ya no sirven. Devuelve {codificación: bytes} de las escritas.
+    """
+    levels = levels or STATIC_LEVELS
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = {}
+    for encoding in supported_encodings():
+        target = path + ENCODING_SUFFIXES[encoding]
+        body = compress(data, encoding, levels[encoding]) if len(data) >= min_size else None
+        if body is None or len(body) > len(data) * (1 - min_saving):
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(body)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        written[encoding] = len(body)
+    return written
+
+
+def remove_precompressed(path):
+    for suffix in ENCODING_SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def mark_encoded(response, encoding):
+    """Cabeceras de una respuesta cuyo cuerpo va comprimido con `encoding`."""
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+class Compressor:
+    """Negociación de gzip/brotli y compresión de las respuestas dinámicas.
+
+    Configuración (app.config):
+        COMPRESS_ENABLED        Comprime las respuestas (True).
+        COMPRESS_MIN_SIZE       Bytes mínimos del cuerpo para comprimir (500).
+        COMPRESS_MIMETYPES      Tipos que se comprimen (COMPRESSIBLE_MIMETYPES).
+        COMPRESS_GZIP_LEVEL     Nivel de gzip en línea (6).
+        COMPRESS_BROTLI_LEVEL   Nivel de brotli en línea (5; el 11 es demasiado lento por petición).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('COMPRESS_ENABLED', True)
+        self.min_size = app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        self.mimetypes = frozenset(app.config.setdefault('COMPRESS_MIMETYPES', COMPRESSIBLE_MIMETYPES))
+        self.levels = {'gzip': app.config.setdefault('COMPRESS_GZIP_LEVEL', 6),
+                       'br': app.config.setdefault('COMPRESS_BROTLI_LEVEL', 5)}
+        app.extensions['compressor'] = self
+        if self.enabled:
+            app.after_request(self._after_request)
+
+    def negotiate(self, offered=None):
+        """Mejor codificación para la petición actual entre `offered` (o todas las soportadas)."""
+        if not self.enabled:
+            return None
+        return choose_encoding(request.accept_encodings, offered or supported_encodings())
+
+    def compressible(self, mimetype, size):
+        return self.enabled and mimetype in self.mimetypes and size >= self.min_size
+
+    def encode_all(self, body, mimetype):
+        """{codificación: cuerpo comprimido} para guardar junto con una página en caché."""
+        if not self.compressible(mimetype, len(body)):
+            return {}
+        return {encoding: compress(body, encoding, self.levels[encoding]) for encoding in supported_encodings()}
+
+    def _after_request(self, response):
+        if response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or request.method == 'HEAD'):
+            return response
+        # Variantes ya comprimidas (páginas en caché): no se vuelve a comprimir
+        encoded = getattr(response, 'precompressed', None) or {}
+        encoding = self.negotiate(tuple(encoded) or None)
+        if encoding is None:
+            return response
+        if encoding in encoded:
+            response.set_data(encoded[encoding])
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            response.set_data(compress(body, encoding, self.levels[encoding]))
+        return mark_encoded(response, encoding)
@@ -0,0 +1,382 @@
+# contact_queue.py
+# ==============================================================================
+# COLA DE INGESTA DEL FORMULARIO DE CONTACTO
+# ==============================================================================
+# Antes cada envío del formulario hacía su propio INSERT + COMMIT (un fsync en
+# SQLite) en el hilo de la petición. Una ola de spam competía por el bloqueo de
+# escritura con el resto del sitio.
+#
+# Ahora la petición solo deja el mensaje en una cola acotada en memoria y un
+# hilo de fondo (uno por worker) lo escribe junto con otros en una sola
+# transacción cada CONTACT_BATCH_SIZE mensajes o CONTACT_FLUSH_MS milisegundos,
+# lo que ocurra antes. Si la cola está llena, la petición espera hasta
+# CONTACT_ENQUEUE_TIMEOUT_MS y después se rechaza (QueueFull).
+#
+# Con CONTACT_SPOOL_DIR cada mensaje se anota también en un archivo JSONL antes
+# de encolarlo. Tras cada COMMIT se anotan en un archivo hermano (.done) los
+# números de línea de los mensajes escritos, y el segmento se borra cuando
+# todos sus mensajes están en la base de datos. Los segmentos que quedan de un
+# worker que murió se recuperan al arrancar saltando las líneas anotadas
+# (entrega "al menos una vez": un corte justo entre el COMMIT y la anotación
+# duplica como mucho ese lote, CONTACT_BATCH_SIZE mensajes). El hilo, y con él
+# la recuperación, arranca con cada worker (start(), ver startup.start_worker y
+# gunicorn.conf.py) y no espera a que alguien vuelva a enviar el formulario.
+import atexit
+import fcntl
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Mensajes por segmento del spool antes de empezar uno nuevo
+SPOOL_SEGMENT_MESSAGES = 1000
+
+
+class QueueFull(Exception):
+    """La cola de mensajes está llena; el visitante debe intentarlo más tarde."""
+
+
+class _Segment:
+    """Archivo del spool abierto y bloqueado (flock) por el worker que lo escribe."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        self.done = None
+        self.written = 0
+        self.outstanding = 0
+
+    def append(self, message):
+        """Anota un mensaje y devuelve su número de línea en el segmento."""
+        self.file.write(json.dumps(message, default=_json_default, ensure_ascii=False) + '\n')
+        self.file.flush()
+        self.written += 1
+        self.outstanding += 1
+        return self.written - 1
+
+    def mark_done(self, lines):
+        """Anota las líneas que ya están en la base de datos (tras el COMMIT)."""
+        if self.done is None:
+            self.done = open(_done_path(self.path), 'a', encoding='utf-8')
+        self.done.write(' '.join(map(str, lines)) + '\n')
+        self.done.flush()
+
+    def truncate(self):
+        self.file.truncate(0)
+        if self.done is not None:
+            self.done.truncate(0)
+        self.written = 0
+
+    def remove(self):
+        for path in (self.path, _done_path(self.path)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if self.done is not None:
+            self.done.close()
+        self.file.close()
+
+
+def _done_path(path):
+    return path + '.done'
+
+
+def _read_done(path):
+    """Números de línea ya escritos de un segmento (una línea a medias se ignora)."""
+    lines = set()
+    try:
+        with open(_done_path(path), encoding='utf-8') as f:
+            for row in f:
+                try:
+                    lines.update(int(number) for number in row.split())
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return lines
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'No se puede serializar {type(value).__name__}')
+
+
+def _load_message(line):
+    message = json.loads(line)
+    if message.get('timestamp'):
+        message['timestamp'] = datetime.fromisoformat(message['timestamp'])
+    return message
+
+
+class ContactQueue:
+    """Cola acotada + hilo que escribe los mensajes de contacto por lotes.
+
+    `write_batch(messages)` recibe una lista de dicts con las columnas de
+    ContactMessage y debe guardarlos en una sola transacción; se llama dentro
+    de un contexto de aplicación.
+
+    Configuración (app.config):
+        CONTACT_QUEUE_SIZE          Mensajes en memoria como máximo (1000).
+        CONTACT_BATCH_SIZE          Mensajes por transacción (100).
+        CONTACT_FLUSH_MS            Espera máxima antes de escribir (500). Con 0 se escribe en línea.
+        CONTACT_ENQUEUE_TIMEOUT_MS  Cuánto espera una petición si la cola está llena (200).
+        CONTACT_SPOOL_DIR           Carpeta del spool en disco (desactivado si es None).
+    """
+
+    def __init__(self, app=None, write_batch=None):
+        self.app = None
+        self.write_batch = write_batch
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segments = []
+        self._segment_seq = 0
+        self._counters = {
+            'submitted': 0, 'rejected': 0, 'written': 0, 'failed_batches': 0,
+            'batches': 0, 'recovered': 0, 'max_depth': 0,
+            'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0,
+        }
+        if app is not None:
+            self.init_app(app, write_batch)
+
+    def init_app(self, app, write_batch=None):
+        self.app = app
+        if write_batch is not None:
+            self.write_batch = write_batch
+        self.max_size = app.config.setdefault('CONTACT_QUEUE_SIZE', 1000)
+        self.batch_size = app.config.setdefault('CONTACT_BATCH_SIZE', 100)
+        self.flush_ms = app.config.setdefault('CONTACT_FLUSH_MS', 500)
+        self.enqueue_timeout_ms = app.config.setdefault('CONTACT_ENQUEUE_TIMEOUT_MS', 200)
+        self.spool_dir = app.config.setdefault('CONTACT_SPOOL_DIR', None)
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        app.extensions['contact_queue'] = self
+
+    def start(self):
+        """Arranca el hilo de este proceso, que primero recupera el spool. Idempotente.
+
+        Llamar después del fork (en cada worker), nunca en el proceso maestro.
+        """
+        if self.flush_ms:
+            self._ensure_started()
+
+    # --- API para las rutas ---
+
+    def submit(self, message):
+        """Encola un mensaje (dict con name, email, subject, message).
+
+        Lanza QueueFull si la cola sigue llena tras CONTACT_ENQUEUE_TIMEOUT_MS.
+        """
+        message = dict(message)
+        message.setdefault('timestamp', datetime.utcnow())
+        if not self.flush_ms:
+            self._write([message])
+            self._count(submitted=1)
+            return
+        pending = self._ensure_started()
+        with self._lock:
+            spooled = self._spool(message)
+        try:
+            pending.put((message, spooled), timeout=self.enqueue_timeout_ms / 1000)
+        except queue.Full:
+            with self._lock:
+                self._release(spooled)
+            self._count(rejected=1)
+            raise QueueFull()
+        self._count(submitted=1)
+        depth = pending.qsize()
+        with self._lock:
+            self._counters['max_depth'] = max(self._counters['max_depth'], depth)
+
+    def flush(self):
+        """Escribe ya todo lo que haya en la cola (se usa al salir y en pruebas)."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            spooled = sum(segment.outstanding for segment in self._segments)
+        batches = stats['batches'] or 1
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / batches
+        stats['depth'] = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+        stats['capacity'] = self.max_size
+        stats['spooled'] = spooled
+        stats['durable'] = bool(self.spool_dir)
+        return stats
+
+    # --- Hilo de fondo ---
+
+    def _ensure_started(self):
+        # Igual que el pool de imágenes: un hilo por proceso, creado tras el fork
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_size)
+                self._segment, self._segments = None, []
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='contact-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            return self._queue
+
+    def _run(self):
+        self._recover_spool()
+        while True:
+            batch = self._take(block=True)
+            if batch:
+                self._write_batch(batch)
+
+    def _take(self, block):
+        """Junta hasta batch_size mensajes, esperando como mucho flush_ms desde el primero."""
+        pending = self._queue
+        try:
+            first = pending.get() if block else pending.get_nowait()
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_ms / 1000
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(pending.get(timeout=remaining) if block and remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        messages = [message for message, _spooled in batch]
+        if self._write(messages):
+            with self._lock:
+                self._mark_done([spooled for _message, spooled in batch])
+                for _message, spooled in batch:
+                    self._release(spooled)
+        else:
+            # Se reintenta más tarde; si la cola se llenó mientras tanto, los
+            # mensajes solo sobreviven en el spool (si está activado).
+            time.sleep(min(1.0, self.flush_ms / 1000))
+            for item in batch:
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    self._count(rejected=1)
+
+    def _write(self, messages):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                self.write_batch(messages)
+        except Exception as e:
+            print(f"Error al guardar {len(messages)} mensajes de contacto: {e}", file=sys.stderr)
+            self._count(failed_batches=1)
+            if not self.flush_ms:
+                raise
+            return False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            counters = self._counters
+            counters['written'] += len(messages)
+            counters['batches'] += 1
+            counters['last_flush_ms'] = elapsed_ms
+            counters['max_flush_ms'] = max(counters['max_flush_ms'], elapsed_ms)
+            counters['total_flush_ms'] += elapsed_ms
+        return True
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counters[name] += delta
+
+    # --- Spool en disco (llamar con self._lock tomado) ---
+
+    def _spool(self, message):
+        """Anota el mensaje en el segmento actual y devuelve (segmento, línea), o None sin spool."""
+        if not self.spool_dir:
+            return None
+        if self._segment is None or self._segment.written >= SPOOL_SEGMENT_MESSAGES:
+            self._segment_seq += 1
+            path = os.path.join(self.spool_dir, f'contact-{os.getpid()}-{int(time.time())}-{self._segment_seq}.jsonl')
+            self._segment = _Segment(path)
+            self._segments.append(self._segment)
+        return self._segment, self._segment.append(message)
+
+    def _mark_done(self, spooled):
+        lines = {}
+        for item in spooled:
+            if item is not None:
+                lines.setdefault(item[0], []).append(item[1])
+        for segment, numbers in lines.items():
+            try:
+                segment.mark_done(numbers)
+            except OSError as e:
+                print(f"Error al anotar mensajes escritos en {segment.path}: {e}", file=sys.stderr)
+
+    def _release(self, spooled):
+        if spooled is None:
+            return
+        segment = spooled[0]
+        segment.outstanding -= 1
+        if segment.outstanding > 0:
+            return
+        # Todos sus mensajes ya están en la base de datos
+        if segment is self._segment and segment.written < SPOOL_SEGMENT_MESSAGES:
+            # El segmento actual se vacía y se sigue usando
+            segment.truncate()
+            return
+        segment.remove()
+        self._segments.remove(segment)
+        if segment is self._segment:
+            self._segment = None
+
+    def _recover_spool(self):
+        """Escribe los segmentos que dejó un worker que terminó sin vaciar su cola."""
+        if not self.spool_dir:
+            return
+        for path in glob.glob(os.path.join(self.spool_dir, 'contact-*.jsonl.done')):
+            # Anotaciones de un segmento ya borrado (corte entre los dos os.remove)
+            if not os.path.exists(path[:-len('.done')]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, 'contact-*.jsonl'))):
+            try:
+                handle = open(path, 'r+', encoding='utf-8')
+            except OSError:
+                continue
+            with handle:
+                try:
+                    # Si otro worker vivo lo tiene bloqueado, es suyo
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                if any(path == segment.path for segment in self._segments):
+                    continue
+                done = _read_done(path)
+                pending = [(number, _load_message(line)) for number, line in enumerate(handle)
+                           if line.strip() and number not in done]
+                with open(_done_path(path), 'a', encoding='utf-8') as done_file:
+                    for start in range(0, len(pending), self.batch_size):
+                        batch = pending[start:start + self.batch_size]
+                        if not self._write([message for _number, message in batch]):
+                            break
+                        # Si este worker también muere, el siguiente no repite el lote
+                        done_file.write(' '.join(str(number) for number, _message in batch) + '\n')
+                        done_file.flush()
+                    else:
+                        os.remove(path)
+                        os.remove(_done_path(path))
+                        self._count(recovered=len(pending))
@@ -0,0 +1,88 @@
+# db_tuning.py
+# ==============================================================================
+# PERFIL DE CONCURRENCIA DE SQLITE PARA VARIOS WORKERS DE GUNICORN
+# ==============================================================================
+# Con el modo de journal por defecto (DELETE), un escritor (un mensaje de
+# contacto, una edición del administrador) bloquea a todos los lectores y
+# aparecen errores "database is locked". Con WAL los lectores nunca esperan a
+# los escritores y los escritores esperan su turno (busy_timeout) en vez de
+# fallar de inmediato.
+#
+# Cada PRAGMA se aplica en cada conexión nueva del pool y se puede cambiar con
+# variables de entorno:
+#
+#     SQLITE_JOURNAL_MODE     WAL
+#     SQLITE_SYNCHRONOUS      NORMAL  (seguro con WAL; solo FULL sincroniza cada commit)
+#     SQLITE_BUSY_TIMEOUT_MS  5000
+#     SQLITE_MMAP_SIZE        67108864 (64 MB leídos vía mmap)
+#     SQLITE_CACHE_SIZE_KB    16384    (caché de páginas por conexión)
+#     SQLITE_POOL_SIZE        5
+#     SQLITE_MAX_OVERFLOW     10
+#     SQLITE_POOL_TIMEOUT     30
+#
+# Se mantiene el modo de transacciones por defecto de pysqlite: las lecturas no
+# abren transacción y el BEGIN (diferido) llega justo antes del primer INSERT o
+# UPDATE, así que un escritor nunca tiene que "subir" un bloqueo de lectura que
+# ya tenía y busy_timeout siempre puede esperar por él.
+import os
+
+from sqlalchemy import event
+
+
+def sqlite_settings_from_env(environ=None):
+    """Lee la configuración de SQLite desde las variables de entorno."""
+    environ = os.environ if environ is None else environ
+    return {
+        'journal_mode': environ.get('SQLITE_JOURNAL_MODE', 'WAL').upper(),
+        'synchronous': environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper(),
+        'busy_timeout_ms': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024)),
+        'cache_size_kb': int(environ.get('SQLITE_CACHE_SIZE_KB', 16384)),
+        'pool_size': int(environ.get('SQLITE_POOL_SIZE', 5)),
+        'max_overflow': int(environ.get('SQLITE_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(environ.get('SQLITE_POOL_TIMEOUT', 30)),
+    }
+
+
+def sqlite_engine_options(settings):
+    """Opciones para SQLALCHEMY_ENGINE_OPTIONS: pool explícito y timeout del driver."""
+    return {
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': settings['pool_timeout'],
+        'connect_args': {
+            # El driver sqlite3 también reintenta mientras la base está bloqueada
+            'timeout': settings['busy_timeout_ms'] / 1000,
+            # Las conexiones pasan entre hilos a través del pool (y de los hilos de fondo)
+            'check_same_thread': False,
+        },
+    }
+
+
+def sqlite_pragmas(settings):
+    """Lista de sentencias PRAGMA que se ejecutan en cada conexión nueva."""
+    return [
+        f"PRAGMA journal_mode={settings['journal_mode']}",
+        f"PRAGMA synchronous={settings['synchronous']}",
+        f"PRAGMA busy_timeout={settings['busy_timeout_ms']}",
+        f"PRAGMA mmap_size={settings['mmap_size']}",
+        # Un valor negativo se interpreta en KiB en lugar de páginas
+        f"PRAGMA cache_size=-{settings['cache_size_kb']}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def install_sqlite_tuning(engine, settings):
+    """Registra los PRAGMA en el evento 'connect' del engine (solo si es SQLite)."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(settings)
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
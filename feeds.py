@@ -0,0 +1,89 @@
+# feeds.py
+# ==============================================================================
+# FEEDS ATOM Y SITEMAPS XML
+# ==============================================================================
+# Los agregadores y los buscadores consultan el sitio cada pocos minutos. En
+# lugar de volver a rastrear el HTML de la portada y de cada categoría, leen:
+#
+#     /feed.xml                       últimas noticias (Atom)
+#     /category/<slug>/feed.xml       últimas noticias de una categoría
+#     /sitemap.xml                    índice de sitemaps
+#     /sitemap-pages.xml              portada y categorías
+#     /sitemap-news-<n>.xml           noticias por tramos de id
+#
+# Este módulo solo genera el XML; las rutas, la caché y los GET condicionales
+# están en app.py.
+from datetime import timezone
+from xml.sax.saxutils import escape, quoteattr
+
+# Límite del protocolo: 50.000 URLs por sitemap. Usamos tramos más pequeños
+# para que cada archivo siga siendo liviano.
+SITEMAP_CHUNK_SIZE = 10000
+
+# Último tramo cuyos ids caben en un entero de SQLite: más allá no puede haber
+# noticias, y un número mayor ni siquiera se puede enlazar en la consulta
+MAX_SITEMAP_CHUNK = (2 ** 63 - 1) // SITEMAP_CHUNK_SIZE - 1
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def rfc3339(value):
+    """Fecha en formato Atom; las fechas de la base de datos están en UTC sin zona."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def atom_feed(title, feed_url, site_url, updated, entries):
+    """Devuelve el feed Atom completo (bytes).
+
+    `entries` son dicts con url, title, updated, author, summary y category.
+    """
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n',
+        f'<feed xmlns="{ATOM_NS}" xml:lang="es">\n',
+        f'  <title>{escape(title)}</title>\n',
+        f'  <id>{escape(feed_url)}</id>\n',
+        f'  <link rel="self" type="application/atom+xml" href={quoteattr(feed_url)}/>\n',
+        f'  <link rel="alternate" type="text/html" href={quoteattr(site_url)}/>\n',
+        f'  <updated>{rfc3339(updated)}</updated>\n',
+    ]
+    for entry in entries:
+        parts += [
+            '  <entry>\n',
+            f'    <title>{escape(entry["title"])}</title>\n',
+            f'    <id>{escape(entry["url"])}</id>\n',
+            f'    <link rel="alternate" type="text/html" href={quoteattr(entry["url"])}/>\n',
+            f'    <updated>{rfc3339(entry["updated"])}</updated>\n',
+            f'    <published>{rfc3339(entry["updated"])}</published>\n',
+            f'    <author><name>{escape(entry["author"] or "")}</name></author>\n',
+            f'    <category term={quoteattr(entry["category"])}/>\n',
+            f'    <summary type="text">{escape(entry["summary"] or "")}</summary>\n',
+            '  </entry>\n',
+        ]
+    parts.append('</feed>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def sitemap_index(sitemaps):
+    """Genera el índice de sitemaps a partir de pares (url, lastmod o None)."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for url, lastmod in sitemaps:
+        yield _url_element('sitemap', url, lastmod)
+    yield '</sitemapindex>\n'
+
+
+def sitemap_urlset(urls):
+    """Genera un sitemap a partir de pares (url, lastmod o None), sin tenerlos todos en memoria."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    for url, lastmod in urls:
+        yield _url_element('url', url, lastmod)
+    yield '</urlset>\n'
+
+
+def _url_element(tag, url, lastmod):
+    lastmod_xml = f'<lastmod>{rfc3339(lastmod)}</lastmod>' if lastmod else ''
+    return f'  <{tag}><loc>{escape(url)}</loc>{lastmod_xml}</{tag}>\n'
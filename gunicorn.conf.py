@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+# ==============================================================================
+# HOOKS DE GUNICORN (se carga solo al arrancar gunicorn desde la raíz del repo)
+# ==============================================================================
+# El proceso maestro no debe tener hilos al hacer fork (ver startup.py), así que
+# lo que necesita un hilo por worker arranca aquí, en cada worker recién creado:
+# también en los que gunicorn vuelve a crear cuando uno muere.
+from startup import start_worker
+
+
+def post_worker_init(worker):
+    start_worker(worker.wsgi)
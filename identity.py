@@ -0,0 +1,146 @@
+# identity.py
+# ==============================================================================
+# CACHÉ DE IDENTIDAD PARA FLASK-LOGIN
+# ==============================================================================
+# Flask-Login llama a user_loader en cada petición de un administrador con
+# sesión, y eso era un SELECT por petición. Aquí se guarda una instantánea del
+# usuario (id, username, is_admin) en un LRU con TTL por worker.
+#
+# Invalidación: edit_user/delete_user llaman a IdentityCache.invalidate(), que
+# incrementa un contador de versión guardado en un archivo compartido por todos
+# los workers (IDENTITY_VERSION_FILE). Cada petición autenticada compara el
+# mtime de ese archivo (un stat) con el último que vio el worker y, si cambió,
+# vacía su caché. Así retirar los permisos de administrador tiene efecto en la
+# petición siguiente en cualquier worker; el TTL es solo una red de seguridad.
+#
+# Las peticiones anónimas (sin cookie de sesión ni de "recuérdame") reciben el
+# usuario anónimo directamente, sin abrir la sesión ni pasar por Flask-Login.
+import os
+import threading
+
+from flask import g, request
+from flask_login import UserMixin
+
+from cache import LRUCache
+
+
+class UserSnapshot(UserMixin):
+    """Copia de solo lectura de los campos de User que usan las vistas y plantillas."""
+
+    def __init__(self, id, username, is_admin):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} {self.username!r}>'
+
+
+class IdentityCache:
+    """user_loader de Flask-Login con caché e invalidación entre workers.
+
+    `load(user_id)` devuelve el User de la base de datos (o None).
+
+    Configuración (app.config):
+        IDENTITY_CACHE_TTL      Segundos de vida de cada instantánea (60).
+        IDENTITY_CACHE_SIZE     Usuarios en memoria como máximo (256).
+        IDENTITY_VERSION_FILE   Archivo con el contador de versión (None: solo este proceso).
+    """
+
+    def __init__(self, app=None, login_manager=None, load=None):
+        self.memory = LRUCache()
+        self.load = load
+        self.version_file = None
+        self._lock = threading.Lock()
+        self._seen_stamp = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app, login_manager, load)
+
+    def init_app(self, app, login_manager, load=None):
+        if load is not None:
+            self.load = load
+        ttl = app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+        max_entries = app.config.setdefault('IDENTITY_CACHE_SIZE', 256)
+        self.version_file = app.config.setdefault('IDENTITY_VERSION_FILE', None)
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.session_cookie = app.config.get('SESSION_COOKIE_NAME', 'session')
+        self.remember_cookie = app.config.get('REMEMBER_COOKIE_NAME', 'remember_token')
+        self.anonymous_user = login_manager.anonymous_user
+        login_manager.user_loader(self.load_user)
+        app.before_request(self._skip_anonymous)
+        app.extensions['identity_cache'] = self
+
+    def _skip_anonymous(self):
+        # Flask-Login solo consulta g._login_user si ya existe
+        if self.session_cookie not in request.cookies and self.remember_cookie not in request.cookies:
+            g._login_user = self.anonymous_user()
+
+    # --- user_loader ---
+
+    def load_user(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        self._check_version()
+        snapshot = self.memory.get(user_id)
+        if snapshot is not None:
+            with self._lock:
+                self.hits += 1
+            return snapshot
+        with self._lock:
+            self.misses += 1
+        user = self.load(user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user.id, user.username, bool(user.is_admin))
+        self.memory.set(user_id, snapshot)
+        return snapshot
+
+    # --- Invalidación ---
+
+    def invalidate(self, user_id=None):
+        """Olvida un usuario (o todos) en este worker y avisa a los demás."""
+        if user_id is None:
+            self.memory.clear()
+        else:
+            self.memory.delete(user_id)
+        if self.version_file:
+            try:
+                version = self._read_version() + 1
+                tmp_path = f'{self.version_file}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.write(str(version))
+                os.replace(tmp_path, self.version_file)
+            except OSError:
+                pass
+
+    def _read_version(self):
+        try:
+            with open(self.version_file) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _stamp(self):
+        if not self.version_file:
+            return None
+        try:
+            stat = os.stat(self.version_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _check_version(self):
+        stamp = self._stamp()
+        if stamp != self._seen_stamp:
+            self.memory.clear()
+            self._seen_stamp = stamp
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'shared': bool(self.version_file)}
@@ -0,0 +1,136 @@
+# images.py
+# ==============================================================================
+# DERIVADOS DE IMÁGENES (MINIATURAS, TAMAÑOS RESPONSIVOS Y WEBP)
+# ==============================================================================
+# Al subir una imagen se generan versiones de ancho fijo en WebP y en JPEG
+# (como respaldo para navegadores antiguos), sin metadatos EXIF. Así una tarjeta
+# de la portada descarga unos pocos KB en lugar del archivo original.
+#
+# El trabajo pesado corre en un pool de hilos (ImageProcessor) para que el
+# administrador no espere al guardar la noticia. Pillow es opcional: si no
+# está instalado, las noticias siguen mostrando la imagen original.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow es una dependencia opcional
+    Image = None
+
+# Nombre del derivado -> ancho máximo en píxeles. Nunca se amplía la imagen.
+IMAGE_SIZES = {
+    'thumb': 480,      # Tarjetas de la portada y de las categorías
+    'hero': 1200,      # Imagen principal del detalle de la noticia
+    'original': 2400,  # Tamaño completo, recomprimido y sin metadatos
+}
+
+# Extensión -> (formato de Pillow, opciones de guardado)
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANTS_FOLDER = 'variants'
+
+
+def derivatives_available():
+    return Image is not None
+
+
+def derivative_name(filename, size_name, width, extension):
+    """Ruta (relativa a la carpeta de uploads) de un derivado."""
+    base = os.path.splitext(filename)[0]
+    return f'{VARIANTS_FOLDER}/{base}-{size_name}-{width}.{extension}'
+
+
+def _prepare(image):
+    """Aplica la orientación EXIF y convierte a RGB (JPEG no admite transparencia)."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_derivatives(upload_folder, filename):
+    """Genera todos los derivados de `filename` y devuelve su descripción.
+
+    El resultado se guarda en NewsArticle.image_variants:
+        {'thumb': {'width': 480, 'webp': 'variants/...webp', 'jpg': 'variants/...jpg'}, ...}
+    """
+    if Image is None:
+        return None
+    source_path = os.path.join(upload_folder, filename)
+    with Image.open(source_path) as source:
+        source.load()
+        image = _prepare(source)
+
+    variants = {}
+    for size_name, max_width in IMAGE_SIZES.items():
+        width = min(max_width, image.width)
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        entry = {'width': width}
+        for extension, (image_format, options) in IMAGE_FORMATS.items():
+            name = derivative_name(filename, size_name, width, extension)
+            path = os.path.join(upload_folder, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Se guarda sin exif ni icc_profile: los metadatos quedan eliminados
+            tmp_path = path + '.tmp'
+            resized.save(tmp_path, image_format, **options)
+            os.replace(tmp_path, path)
+            entry[extension] = name
+        variants[size_name] = entry
+    return variants
+
+
+def derivative_files(variants):
+    """Lista de archivos (relativos a uploads) descritos en `variants`."""
+    return [entry[extension]
+            for entry in (variants or {}).values()
+            for extension in IMAGE_FORMATS if entry.get(extension)]
+
+
+class ImageProcessor:
+    """Pool de hilos para generar derivados sin bloquear la petición.
+
+    Configuración (app.config):
+        IMAGE_WORKERS   Hilos del pool (por defecto 2). Con 0 se procesa en línea.
+    """
+
+    def __init__(self, app=None):
+        self.max_workers = 2
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_workers = app.config.setdefault('IMAGE_WORKERS', 2)
+        app.extensions['image_processor'] = self
+
+    def _get_executor(self):
+        # El pool se crea de forma perezosa y por proceso: los hilos no
+        # sobreviven al fork de los workers de gunicorn.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='image-worker')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        if not self.max_workers:
+            fn(*args, **kwargs)
+            return None
+        return self._get_executor().submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,293 @@
+# metrics.py
+# ==============================================================================
+# MÉTRICAS POR PETICIÓN: LATENCIA, SQL, PLANTILLAS Y TAMAÑO DE RESPUESTA
+# ==============================================================================
+# Por cada endpoint se guarda un histograma de latencia (de ahí salen p50, p95
+# y p99), cuántas consultas SQL hizo y cuánto tardaron (eventos del engine de
+# SQLAlchemy), el tiempo de render de plantillas (señales de Flask) y los bytes
+# enviados. Todo vive en memoria, por worker de gunicorn.
+#
+# Las peticiones que superan METRICS_SLOW_MS quedan en un registro de
+# peticiones lentas con las consultas que ejecutaron, y se avisan por stderr.
+# De los parámetros SQL solo se guarda el tipo: pueden ser hashes de
+# contraseñas o correos, y el registro se ve en el panel y en las capturas. Las métricas se exportan también en formato de texto de Prometheus.
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+# Límites superiores de los buckets del histograma, en milisegundos
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# Tope de consultas guardadas por petición (el conteo sigue aunque se supere)
+MAX_QUERIES_PER_REQUEST = 200
+MAX_STATEMENT_LENGTH = 2000
+
+
+def describe_parameters(parameters):
+    """Tipos de los parámetros de una consulta, sin sus valores: '(str, int)'."""
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {type(value).__name__}' for name, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters or ()) + ')'
+
+
+class Histogram:
+    """Histograma de buckets fijos; los percentiles se interpolan dentro del bucket."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max)
+            seen += bucket_count
+        return self.max
+
+    def cumulative(self):
+        """[(límite, conteo acumulado)] terminando en ('+Inf', total), como en Prometheus."""
+        running, result = 0, []
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), self.counts):
+            running += bucket_count
+            result.append((bound, running))
+        return result
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = {}
+        self.sql_queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.response_bytes = 0
+
+    def summary(self, endpoint):
+        count = self.latency.count or 1
+        return {
+            'endpoint': endpoint,
+            'requests': self.latency.count,
+            'p50_ms': self.latency.percentile(0.50),
+            'p95_ms': self.latency.percentile(0.95),
+            'p99_ms': self.latency.percentile(0.99),
+            'max_ms': self.latency.max,
+            'avg_sql_queries': self.sql_queries / count,
+            'avg_sql_ms': self.sql_ms / count,
+            'avg_template_ms': self.template_ms / count,
+            'avg_response_bytes': self.response_bytes / count,
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+class RequestMetrics:
+    """Middleware de métricas por petición.
+
+    Configuración (app.config):
+        METRICS_ENABLED    Activa la instrumentación (True).
+        METRICS_SLOW_MS    Umbral del registro de peticiones lentas (500).
+        METRICS_SLOW_LOG   Cuántas peticiones lentas se conservan (50).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._gauges = {}
+        self.slow_requests = deque(maxlen=50)
+        self.started_at = datetime.utcnow()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('METRICS_ENABLED', True)
+        self.slow_ms = app.config.setdefault('METRICS_SLOW_MS', 500)
+        self.slow_requests = deque(maxlen=app.config.setdefault('METRICS_SLOW_LOG', 50))
+        app.extensions['request_metrics'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def instrument_engine(self, engine):
+        """Cuenta y cronometra las consultas SQL de `engine` durante las peticiones."""
+        if not self.enabled:
+            return
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def register_gauge(self, name, help_text, collect):
+        """Añade un valor instantáneo al export de Prometheus (collect() -> número, o None si aún no hay).
+
+        Idempotente: registrar otra vez el mismo nombre reemplaza la métrica.
+        """
+        with self._lock:
+            self._gauges[name] = (help_text, collect)
+
+    # --- Ganchos de Flask ---
+
+    def _before_request(self):
+        g._metrics = {'started': time.perf_counter(), 'sql_count': 0, 'sql_ms': 0.0,
+                      'queries': [], 'template_ms': 0.0, 'render_stack': []}
+
+    def _after_request(self, response):
+        current = g.pop('_metrics', None)
+        if current is None:
+            return response
+        elapsed_ms = (time.perf_counter() - current['started']) * 1000
+        endpoint = request.endpoint or '<sin ruta>'
+        size = response.content_length or 0
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.latency.observe(elapsed_ms)
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+            stats.sql_queries += current['sql_count']
+            stats.sql_ms += current['sql_ms']
+            stats.template_ms += current['template_ms']
+            stats.response_bytes += size
+        if elapsed_ms >= self.slow_ms:
+            self._record_slow(endpoint, response, elapsed_ms, size, current)
+        return response
+
+    def _record_slow(self, endpoint, response, elapsed_ms, size, current):
+        entry = {
+            'time': datetime.utcnow(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'ms': elapsed_ms,
+            'bytes': size,
+            'sql_count': current['sql_count'],
+            'sql_ms': current['sql_ms'],
+            'template_ms': current['template_ms'],
+            'queries': current['queries'],
+        }
+        with self._lock:
+            self.slow_requests.appendleft(entry)
+        print(f"Petición lenta: {entry['method']} {entry['path']} {elapsed_ms:.0f} ms "
+              f"({entry['sql_count']} consultas SQL, {entry['sql_ms']:.0f} ms en SQL)", file=sys.stderr)
+
+    def _before_render(self, _app, template, context, **_extra):
+        current = g.get('_metrics') if has_request_context() else None
+        if current is not None:
+            current['render_stack'].append(time.perf_counter())
+
+    def _after_render(self, _app, template, context, **_extra):
+        current = g.get('_metrics') if has_request_context() else None
+        if current is not None and current['render_stack']:
+            started = current['render_stack'].pop()
+            # Solo cuenta el render más externo (una plantilla puede renderizar otra)
+            if not current['render_stack']:
+                current['template_ms'] += (time.perf_counter() - started) * 1000
+
+    # --- Eventos del engine ---
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['_metrics_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('_metrics_started', None)
+        if started is None:
+            return
+        # Solo se miden las consultas hechas desde una petición (no los hilos de fondo)
+        current = g.get('_metrics') if has_request_context() else None
+        if current is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        current['sql_count'] += 1
+        current['sql_ms'] += elapsed_ms
+        if len(current['queries']) < MAX_QUERIES_PER_REQUEST:
+            params = f'[{len(parameters)} filas]' if executemany else describe_parameters(parameters)
+            current['queries'].append((statement[:MAX_STATEMENT_LENGTH], params, elapsed_ms))
+
+    # --- Consulta y export ---
+
+    def snapshot(self):
+        """Resumen por endpoint ordenado por tiempo total, y el registro de lentas."""
+        with self._lock:
+            endpoints = [stats.summary(name) for name, stats in self._endpoints.items()]
+            totals = {name: stats.latency.total for name, stats in self._endpoints.items()}
+            slow = list(self.slow_requests)
+        endpoints.sort(key=lambda summary: totals[summary['endpoint']], reverse=True)
+        return {'endpoints': endpoints, 'slow_requests': slow,
+                'slow_ms': self.slow_ms, 'started_at': self.started_at}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.slow_requests.clear()
+            self.started_at = datetime.utcnow()
+
+    def prometheus(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                '# HELP app_request_duration_seconds Latencia de las peticiones por endpoint.',
+                '# TYPE app_request_duration_seconds histogram',
+            ]
+            for name, stats in endpoints:
+                label = _label(name)
+                for bound, running in stats.latency.cumulative():
+                    le = bound if bound == '+Inf' else f'{bound / 1000:g}'
+                    lines.append(f'app_request_duration_seconds_bucket{{endpoint="{label}",le="{le}"}} {running}')
+                lines.append(f'app_request_duration_seconds_sum{{endpoint="{label}"}} {stats.latency.total / 1000:.6f}')
+                lines.append(f'app_request_duration_seconds_count{{endpoint="{label}"}} {stats.latency.count}')
+            lines += ['# HELP app_requests_total Peticiones por endpoint y código de estado.',
+                      '# TYPE app_requests_total counter']
+            for name, stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'app_requests_total{{endpoint="{_label(name)}",status="{status}"}} {count}')
+            counters = (
+                ('app_sql_queries_total', 'Consultas SQL ejecutadas durante las peticiones.', lambda s: s.sql_queries, '{}'),
+                ('app_sql_seconds_total', 'Tiempo total en consultas SQL.', lambda s: s.sql_ms / 1000, '{:.6f}'),
+                ('app_template_seconds_total', 'Tiempo total renderizando plantillas.', lambda s: s.template_ms / 1000, '{:.6f}'),
+                ('app_response_bytes_total', 'Bytes enviados en el cuerpo de las respuestas.', lambda s: s.response_bytes, '{}'),
+            )
+            for metric, help_text, value, fmt in counters:
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+                for name, stats in endpoints:
+                    lines.append(f'{metric}{{endpoint="{_label(name)}"}} {fmt.format(value(stats))}')
+        with self._lock:
+            gauges = list(self._gauges.items())
+        for metric, (help_text, collect) in gauges:
+            try:
+                value = collect()
+            except Exception as e:
+                print(f"Error al leer la métrica {metric}: {e}", file=sys.stderr)
+                continue
+            if value is None:
+                continue
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} gauge', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,99 @@
+# pagination.py
+# ==============================================================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# ==============================================================================
+# En lugar de OFFSET (que obliga a SQLite a recorrer todas las filas anteriores),
+# cada página recuerda la última clave (fecha, id) que mostró y la siguiente
+# consulta empieza justo después. El costo de la página 500 es el mismo que el
+# de la página 1.
+#
+# La condición se escribe como comparación de filas, (fecha, id) < (f, i):
+# SQLite la resuelve con una búsqueda por rango en el índice (categoría, fecha)
+# o (fecha). La forma equivalente `fecha < f OR (fecha = f AND id < i)` no
+# usa el índice como rango y el costo vuelve a crecer con la profundidad.
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# Rango de los enteros de SQLite: un id mayor no se puede ni enlazar en la consulta
+MAX_ROW_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido en la URL no se pudo decodificar."""
+
+
+def encode_cursor(date_value, row_id):
+    """Convierte una clave (fecha, id) en un texto seguro para la URL."""
+    raw = f'{date_value.isoformat()}|{row_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token):
+    """Operación inversa de encode_cursor(). Lanza InvalidCursor si no es válido."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date_text, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        date_value, row_id = datetime.fromisoformat(date_text), int(row_id)
+        if abs(row_id) > MAX_ROW_ID:
+            raise OverflowError(row_id)
+        return date_value, row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError) as e:
+        raise InvalidCursor(token) from e
+
+
+class KeysetPage:
+    """Una página de resultados y los cursores para moverse a las vecinas."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate(query, date_column, id_column, page_size, after=None, before=None):
+    """Pagina `query` de más reciente a más antiguo usando (date_column, id_column).
+
+    `after` pide la página siguiente al cursor y `before` la anterior; si no se
+    indica ninguno se devuelve la primera página. Se pide una fila de más para
+    saber si existe otra página sin hacer un COUNT.
+    """
+    if before:
+        date_value, row_id = decode_cursor(before)
+        rows = (query
+                .filter(tuple_(date_column, id_column) > (date_value, row_id))
+                .order_by(date_column.asc(), id_column.asc())
+                .limit(page_size + 1)
+                .all())
+        has_prev = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        has_next = True
+    else:
+        if after:
+            date_value, row_id = decode_cursor(after)
+            query = query.filter(tuple_(date_column, id_column) < (date_value, row_id))
+        rows = (query
+                .order_by(date_column.desc(), id_column.desc())
+                .limit(page_size + 1)
+                .all())
+        has_next = len(rows) > page_size
+        items = rows[:page_size]
+        has_prev = bool(after)
+
+    if not items:
+        return KeysetPage(items)
+    first, last = items[0], items[-1]
+    date_attr, id_attr = date_column.key, id_column.key
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(getattr(last, date_attr), getattr(last, id_attr)) if has_next else None,
+        prev_cursor=encode_cursor(getattr(first, date_attr), getattr(first, id_attr)) if has_prev else None,
+    )
@@ -0,0 +1,208 @@
+# popularity.py
+# ==============================================================================
+# CONTADORES DE VISITAS Y "LO MÁS LEÍDO"
+# ==============================================================================
+# Sumar 1 a una columna en cada visita a una noticia convertiría cada lectura
+# en una escritura de SQLite, y todos los lectores harían cola detrás del
+# bloqueo de escritura.
+#
+# Aquí una visita solo incrementa un contador en memoria del worker. Un hilo de
+# fondo (uno por worker):
+#
+# - cada VIEWS_FLUSH_SECONDS suma lo acumulado a la base de datos en una sola
+#   transacción (UPSERT por lotes de las visitas totales y por hora);
+# - cada VIEWS_RANKING_SECONDS recalcula el top-N de cada categoría con
+#   decaimiento exponencial: con la vida media por defecto (24 h) una visita
+#   de ayer vale la mitad que una de ahora. El ranking queda en memoria y las
+#   plantillas lo leen sin consultar la base de datos.
+#
+# Las visitas por hora más antiguas que VIEWS_WINDOW_HOURS se borran (con los
+# valores por defecto ya pesan menos de 1/128). Si un worker muere se pierden,
+# como mucho, sus visitas de los últimos VIEWS_FLUSH_SECONDS.
+#
+# El hilo arranca con la primera visita contada. El ranking inicial lo calcula
+# warm_up() (app.py) sin arrancar el hilo: con gunicorn --preload se hace en el
+# proceso maestro y no debe quedar ningún hilo vivo al hacer fork.
+import atexit
+import os
+import re
+import sys
+import threading
+import time
+
+# Rastreadores de buscadores y agregadores: no cuentan como lectores
+_BOT_USER_AGENT = re.compile(r'bot|crawl|spider|slurp|feed|preview', re.IGNORECASE)
+
+
+def is_bot(user_agent):
+    return bool(_BOT_USER_AGENT.search(user_agent or ''))
+
+
+def current_hour():
+    """Horas completas desde 1970 (UTC): la clave de las visitas por hora."""
+    return int(time.time() // 3600)
+
+
+class ViewCounter:
+    """Visitas por noticia acumuladas en memoria, guardadas por lotes, y su ranking.
+
+    `save(rows, prune_before)` recibe [{'news_id', 'hour', 'views'}], los suma
+    en una transacción y borra las horas anteriores a `prune_before`.
+    `rank(weights, limit)` recibe {hora: peso} y devuelve {categoría: [noticias]}
+    con las `limit` de mayor puntuación de cada una (dicts con id, title,
+    category y score). Ambas se llaman dentro de un contexto de aplicación.
+    `on_change(categories)` se llama cuando cambia el top de esas categorías
+    (None es el top general).
+
+    Configuración (app.config):
+        VIEWS_ENABLED           Cuenta visitas y calcula el ranking (True).
+        VIEWS_FLUSH_SECONDS     Cada cuánto se escriben las visitas (10).
+        VIEWS_RANKING_SECONDS   Cada cuánto se recalcula el ranking (60).
+        VIEWS_HALF_LIFE_HOURS   Vida media de una visita en el ranking (24).
+        VIEWS_WINDOW_HOURS      Horas de visitas que se conservan para el ranking (168).
+        VIEWS_TOP_N             Noticias por ranking (5).
+    """
+
+    def __init__(self, app=None, save=None, rank=None, on_change=None):
+        self.app = None
+        self.save = save
+        self.rank = rank
+        self.on_change = on_change
+        self._pending = {}
+        self._ranking = {}
+        self._ranked_at = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {'recorded': 0, 'written': 0, 'flushes': 0, 'failed_flushes': 0,
+                          'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'last_ranking_ms': 0.0}
+        if app is not None:
+            self.init_app(app, save, rank, on_change)
+
+    def init_app(self, app, save=None, rank=None, on_change=None):
+        self.app = app
+        self.save = save or self.save
+        self.rank = rank or self.rank
+        self.on_change = on_change or self.on_change
+        self.enabled = app.config.setdefault('VIEWS_ENABLED', True)
+        self.flush_seconds = app.config.setdefault('VIEWS_FLUSH_SECONDS', 10)
+        self.ranking_seconds = app.config.setdefault('VIEWS_RANKING_SECONDS', 60)
+        self.half_life_hours = app.config.setdefault('VIEWS_HALF_LIFE_HOURS', 24)
+        self.window_hours = app.config.setdefault('VIEWS_WINDOW_HOURS', 168)
+        self.top_n = app.config.setdefault('VIEWS_TOP_N', 5)
+        app.extensions['view_counter'] = self
+
+    # --- API para las rutas y plantillas ---
+
+    def record(self, news_id):
+        """Cuenta una visita. Solo toca memoria."""
+        if not self.enabled:
+            return
+        key = (news_id, current_hour())
+        with self._lock:
+            self._ensure_started()
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._counters['recorded'] += 1
+
+    def top(self, category=None):
+        """Lo más leído de una categoría (nombre interno) o de todo el sitio."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            return self._ranking.get(category, [])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending'] = sum(self._pending.values())
+        return stats
+
+    # --- Escritura y ranking ---
+
+    def flush(self):
+        """Guarda las visitas acumuladas (se llama desde el hilo, al salir y en pruebas)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        rows = [{'news_id': news_id, 'hour': hour, 'views': views} for (news_id, hour), views in pending.items()]
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                self.save(rows, prune_before=current_hour() - self.window_hours)
+        except Exception as e:
+            print(f"Error al guardar {sum(pending.values())} visitas: {e}", file=sys.stderr)
+            # Se vuelven a sumar para el próximo intento
+            with self._lock:
+                for key, views in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + views
+                self._counters['failed_flushes'] += 1
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            counters = self._counters
+            counters['written'] += sum(pending.values())
+            counters['flushes'] += 1
+            counters['last_flush_ms'] = elapsed_ms
+            counters['max_flush_ms'] = max(counters['max_flush_ms'], elapsed_ms)
+
+    def decay_weights(self, hour=None):
+        """{hora: peso} de las horas de la ventana; la hora actual pesa 1."""
+        hour = current_hour() if hour is None else hour
+        return {hour - age: 0.5 ** (age / self.half_life_hours) for age in range(self.window_hours)}
+
+    def refresh_ranking(self, notify=True):
+        """Recalcula el top de cada categoría y el general; avisa a on_change si cambiaron.
+
+        Con notify=False (precalentamiento) no se invalida ni se republica nada.
+        """
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                ranking = self.rank(self.decay_weights(), self.top_n)
+        except Exception as e:
+            print(f"Error al calcular lo más leído: {e}", file=sys.stderr)
+            return
+        # El top general sale de los tops por categoría: ninguna noticia fuera de ellos puede superarlos
+        ranking[None] = sorted((entry for entries in ranking.values() for entry in entries),
+                               key=lambda entry: entry['score'], reverse=True)[:self.top_n]
+        with self._lock:
+            previous, self._ranking = self._ranking, ranking
+            self._ranked_at = time.monotonic()
+            self._counters['last_ranking_ms'] = (time.perf_counter() - started) * 1000
+        changed = [category for category in set(ranking) | set(previous)
+                   if _ids(ranking.get(category)) != _ids(previous.get(category))]
+        if changed and notify and self.on_change is not None:
+            try:
+                self.on_change(changed)
+            except Exception as e:
+                print(f"Error al invalidar las páginas de lo más leído: {e}", file=sys.stderr)
+
+    # --- Hilo de fondo ---
+
+    def _ensure_started(self):
+        # Llamar con self._lock tomado. Un hilo por proceso, creado tras el fork.
+        # El ranking heredado del proceso maestro se conserva hasta el primer recálculo.
+        if self._thread is None or self._pid != os.getpid():
+            self._pending = {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        # Un ranking reciente (el de warm_up, heredado con el fork) no se recalcula
+        # en la primera visita: le tocaría a la misma petición que arranca el hilo
+        with self._lock:
+            ranked_at = self._ranked_at
+        next_ranking = 0.0 if ranked_at is None else ranked_at + self.ranking_seconds
+        while True:
+            if time.monotonic() >= next_ranking:
+                self.refresh_ranking()
+                next_ranking = time.monotonic() + self.ranking_seconds
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+
+def _ids(entries):
+    return [entry['id'] for entry in entries or ()]
@@ -0,0 +1,248 @@
+# publish.py
+# ==============================================================================
+# MODO PUBLICACIÓN: PÁGINAS PÚBLICAS PRE-RENDERIZADAS EN DISCO
+# ==============================================================================
+# Con PUBLISH_DIR configurado, la portada, la primera página de cada categoría
+# y el detalle de cada noticia se escriben como HTML estático:
+#
+#     <PUBLISH_DIR>/index.html
+#     <PUBLISH_DIR>/category/<slug>/index.html
+#     <PUBLISH_DIR>/news/<id>/index.html
+#
+# Las páginas se generan con el test client de la propia aplicación (como las
+# vería un visitante anónimo), así que son idénticas a las dinámicas.
+#
+# - Publicación incremental: cada vez que se invalida la caché de una noticia
+#   se regeneran solo su detalle, su(s) categoría(s) y la portada, en un hilo
+#   de fondo. Si la página ya no existe (404) se borra el archivo.
+# - Reconstrucción completa (`flask publish`): reparte las páginas entre un
+#   pool de procesos (PUBLISH_WORKERS).
+# - Ruta rápida: si PUBLISH_SERVE está activo, Flask sirve el archivo
+#   publicado a los visitantes anónimos sin tocar la base de datos ni Jinja.
+#   Un servidor estático delante puede hacer lo mismo, p. ej. en nginx:
+#       try_files $uri $uri/index.html @flask;
+#
+# Las demás páginas de una categoría (/category/<slug>?after=... y ?before=...)
+# siguen siendo dinámicas. El archivo publicado solo se sirve sin query string;
+# un servidor estático delante debe pasar a Flask las peticiones que la
+# traigan, porque try_files la ignoraría (nginx: if ($args) { ... @flask }).
+#
+# Con la compresión activada, cada página se publica también como
+# index.html.gz / index.html.br (nginx: gzip_static on; brotli_static on;).
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import request, send_from_directory, session
+
+from assets import revalidate
+from compression import (ENCODING_SUFFIXES, choose_encoding, mark_encoded, precompress_file, precompressed_variants,
+                         remove_precompressed)
+
+# Cabecera con la que el publicador pide las páginas (evita servirse a sí mismo)
+RENDER_HEADER = 'X-Publish-Render'
+
+_PUBLISHABLE = re.compile(r'^/(?:category/[a-z0-9-]+|news/\d+)?$')
+
+# Publicador de la aplicación, para los procesos del pool (se heredan con fork)
+_publisher = None
+
+
+def output_path(path):
+    """Archivo relativo donde se publica la URL `path`: '/news/3' -> 'news/3/index.html'."""
+    path = path.strip('/')
+    return f'{path}/index.html' if path else 'index.html'
+
+
+class StaticPublisher:
+    """Escribe y sirve las páginas públicas pre-renderizadas.
+
+    Configuración (app.config):
+        PUBLISH_DIR       Carpeta de salida. Sin ella el modo está desactivado.
+        PUBLISH_WORKERS   Procesos para la reconstrucción completa (núcleos de la CPU).
+        PUBLISH_SERVE     Servir desde Flask los archivos publicados (True).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _publisher
+        self.app = app
+        self.directory = app.config.setdefault('PUBLISH_DIR', None)
+        self.workers = app.config.setdefault('PUBLISH_WORKERS', os.cpu_count() or 1)
+        self.serve = app.config.setdefault('PUBLISH_SERVE', True)
+        app.extensions['static_publisher'] = self
+        _publisher = self
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self.serve:
+            app.before_request(self._serve_published)
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    # --- Render y escritura ---
+
+    def render_paths(self, paths):
+        """Renderiza y escribe `paths`. Devuelve (escritas, borradas)."""
+        client = self.app.test_client()
+        written = removed = 0
+        for path in paths:
+            # Un contexto propio por página: sesión de SQLAlchemy y `g` limpios
+            with self.app.app_context():
+                response = client.get(path, headers={RENDER_HEADER: '1'})
+            target = os.path.join(self.directory, output_path(path))
+            if response.status_code == 200:
+                self._write(target, response.get_data())
+                self._compress(target)
+                written += 1
+            elif response.status_code == 404 and os.path.exists(target):
+                os.remove(target)
+                remove_precompressed(target)
+                removed += 1
+            elif response.status_code != 404:
+                print(f"Error al publicar {path}: HTTP {response.status_code}", file=sys.stderr)
+            response.close()
+        return written, removed
+
+    def _write(self, target, body):
+        folder = os.path.dirname(target)
+        os.makedirs(folder, exist_ok=True)
+        # Escritura atómica: un servidor estático nunca ve un archivo a medias
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _compress(self, target):
+        compressor = self.app.extensions.get('compressor')
+        if compressor is not None and compressor.enabled:
+            # Mismos niveles que en línea: una reconstrucción completa comprime miles de páginas
+            precompress_file(target, levels=compressor.levels, min_size=compressor.min_size)
+        else:
+            remove_precompressed(target)
+
+    # --- Publicación incremental ---
+
+    def publish(self, paths):
+        """Regenera `paths` en segundo plano (un hilo por proceso, en orden)."""
+        if not self.enabled:
+            return None
+        return self._get_executor().submit(self._publish_safely, list(paths))
+
+    def _publish_safely(self, paths):
+        try:
+            return self.render_paths(paths)
+        except Exception as e:
+            print(f"Error al publicar {', '.join(paths)}: {e}", file=sys.stderr)
+            return 0, 0
+
+    def _get_executor(self):
+        # Un solo hilo por worker de gunicorn: las publicaciones no se pisan
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='publisher')
+                self._pid = os.getpid()
+            return self._executor
+
+    # --- Reconstrucción completa ---
+
+    def rebuild(self, paths, workers=None, chunk_size=200):
+        """Publica todas las `paths` con un pool de procesos y borra las páginas que sobran.
+
+        Devuelve (escritas, borradas).
+        """
+        workers = workers or self.workers
+        paths = list(paths)
+        chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        written = removed = 0
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                w, r = self.render_paths(chunk)
+                written, removed = written + w, removed + r
+        else:
+            # fork: los procesos heredan la aplicación ya configurada
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker) as pool:
+                for w, r in pool.map(_render_chunk, chunks):
+                    written, removed = written + w, removed + r
+        removed += self._remove_stale(paths)
+        self._link_assets()
+        return written, removed
+
+    def _remove_stale(self, paths):
+        """Borra las páginas publicadas de noticias que ya no existen."""
+        expected = {output_path(path) for path in paths}
+        removed = 0
+        news_folder = os.path.join(self.directory, 'news')
+        if not os.path.isdir(news_folder):
+            return removed
+        for name in os.listdir(news_folder):
+            relative = f'news/{name}/index.html'
+            if relative not in expected and os.path.exists(os.path.join(self.directory, relative)):
+                shutil.rmtree(os.path.join(news_folder, name), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _link_assets(self):
+        """Enlaza static/ y uploads/ para que un servidor estático tenga el sitio completo."""
+        for name, source in (('static', self.app.static_folder), ('uploads', self.app.config.get('UPLOAD_FOLDER'))):
+            link = os.path.join(self.directory, name)
+            if source and not os.path.lexists(link):
+                os.symlink(os.path.abspath(source), link)
+
+    # --- Ruta rápida ---
+
+    def _serve_published(self):
+        if request.method not in ('GET', 'HEAD') or request.query_string or request.headers.get(RENDER_HEADER):
+            return None
+        if not _PUBLISHABLE.match(request.path):
+            return None
+        # Administradores y mensajes flash necesitan la página dinámica
+        if session.get('_user_id') or session.get('_flashes'):
+            return None
+        relative = output_path(request.path)
+        path = os.path.join(self.directory, relative)
+        if not os.path.isfile(path):
+            return None
+        variants = precompressed_variants(path)
+        encoding = choose_encoding(request.accept_encodings, [e for e in ENCODING_SUFFIXES if e in variants])
+        if encoding:
+            response = send_from_directory(self.directory, relative + ENCODING_SUFFIXES[encoding], mimetype='text/html',
+                                           etag=True, conditional=True)
+            mark_encoded(response, encoding)
+        else:
+            response = send_from_directory(self.directory, relative, mimetype='text/html', etag=True, conditional=True)
+        response.headers['X-Published'] = '1'
+        return revalidate(response)
+
+
+def _init_worker():
+    # Las conexiones SQLite heredadas del padre no se pueden usar en el hijo
+    app = _publisher.app
+    with app.app_context():
+        app.extensions['sqlalchemy'].engine.dispose(close=False)
+
+
+def _render_chunk(paths):
+    return _publisher.render_paths(paths)
@@ -0,0 +1,130 @@
+# search.py
+# ==============================================================================
+# BÚSQUEDA DE TEXTO COMPLETO CON SQLITE FTS5
+# ==============================================================================
+# Un LIKE '%término%' sobre news_article.content recorre toda la tabla en cada
+# búsqueda. En su lugar mantenemos una tabla virtual FTS5 (news_search) con el
+# título, el extracto, el cuerpo en texto plano y el autor de cada noticia. Su
+# rowid es el id de la noticia.
+#
+# La tabla se actualiza desde las rutas de administración (index_article /
+# remove_article) y se puede reconstruir entera con `flask rebuild-search`.
+# Los resultados se ordenan por BM25 y traen un fragmento con los términos
+# resaltados.
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+SEARCH_TABLE = 'news_search'
+
+# Pesos BM25 por columna: title, excerpt, body, author
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 2.0)
+
+# Letras mínimas de la última palabra para buscarla por prefijo
+MIN_PREFIX_LENGTH = 3
+
+# Marcadores que no pueden aparecer en el texto; se cambian por <mark> tras escapar
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def create_search_table(session):
+    """Crea la tabla FTS5 si no existe. Devuelve True si se acaba de crear."""
+    exists = session.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                             {'name': SEARCH_TABLE}).first()
+    if exists:
+        return False
+    # remove_diacritics: 'politica' encuentra 'política'
+    session.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "title, excerpt, body, author, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    return True
+
+
+def index_article(session, document):
+    """Inserta o reemplaza una noticia en el índice.
+
+    `document` es un dict con id, title, excerpt, body (texto plano) y author.
+    """
+    session.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': document['id']})
+    index_articles(session, [document])
+
+
+def index_articles(session, rows):
+    """Inserta muchos documentos de una vez (executemany), sin borrar los anteriores."""
+    if rows:
+        session.execute(
+            text(f'INSERT INTO {SEARCH_TABLE} (rowid, title, excerpt, body, author) '
+                 'VALUES (:id, :title, :excerpt, :body, :author)'),
+            rows,
+        )
+
+
+def remove_article(session, article_id):
+    session.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': article_id})
+
+
+def clear_index(session):
+    session.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+
+
+def optimize_index(session):
+    """Fusiona los segmentos internos de FTS5 (útil después de una reconstrucción)."""
+    session.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+
+
+def build_match_query(user_query):
+    """Convierte lo que escribe el visitante en una expresión MATCH segura.
+
+    Cada palabra va entre comillas (así no se interpretan operadores de FTS5) y
+    la última busca por prefijo, para que 'eleccio' encuentre 'elecciones'.
+    El prefijo solo se usa desde MIN_PREFIX_LENGTH letras: 'c*' recorre casi
+    todo el índice y su costo crece con el corpus. Devuelve None si no hay
+    palabras.
+    """
+    tokens = _TOKEN.findall(user_query or '')[:12]
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if len(tokens[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """Escapa el fragmento y convierte los marcadores en <mark>."""
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search_articles(session, user_query, category=None, limit=10, offset=0):
+    """Busca noticias ordenadas por relevancia (BM25).
+
+    Devuelve una lista de diccionarios {'id', 'snippet', 'score'}; el snippet es
+    Markup con los términos dentro de <mark>. Quien llama carga las noticias.
+    """
+    match = build_match_query(user_query)
+    if match is None:
+        return []
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    sql = (
+        "SELECT a.id, "
+        f"snippet({SEARCH_TABLE}, -1, :mark_start, :mark_end, '…', 24) AS snippet, "
+        f"bm25({SEARCH_TABLE}, {weights}) AS score "
+        f"FROM {SEARCH_TABLE} JOIN news_article a ON a.id = {SEARCH_TABLE}.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH :match"
+    )
+    params = {'match': match, 'mark_start': _MARK_START, 'mark_end': _MARK_END,
+              'limit': limit, 'offset': offset}
+    if category:
+        sql += ' AND a.category = :category'
+        params['category'] = category
+    sql += ' ORDER BY score LIMIT :limit OFFSET :offset'
+    results = []
+    for row in session.execute(text(sql), params).mappings():
+        result = dict(row)
+        result['snippet'] = highlight(row['snippet'])
+        results.append(result)
+    return results
@@ -0,0 +1,92 @@
+# startup.py
+# ==============================================================================
+# ARRANQUE: PRECALENTAMIENTO E INFORME DE TIEMPOS
+# ==============================================================================
+# Antes, initialize_database() colgaba de before_first_request: el primer
+# visitante de cada worker de gunicorn pagaba db.create_all(), la revisión del
+# esquema y, en una base nueva, el hash de la contraseña del administrador.
+# Ahora el arranque tiene tres partes (ver la sección 7 de app.py):
+#
+# - `flask init-db` crea las tablas y aplica las migraciones, una vez por
+#   despliegue y antes de arrancar gunicorn;
+# - create_app() solo configura la aplicación y no abre la base de datos;
+# - warm_up() compila las plantillas, calcula lo más leído y guarda en la
+#   caché las páginas más visitadas. Con `gunicorn --preload wsgi:app` se hace
+#   una vez en el proceso maestro y los workers lo heredan con el fork, así
+#   que la primera petición de un worker cuesta lo mismo que la centésima.
+#
+# Al final, freeze_heap() pasa los objetos del arranque a la generación
+# permanente del recolector: sin eso, la primera recolección de cada worker
+# recorre todo lo heredado, escribe en cada objeto y copia (copy-on-write) las
+# páginas de memoria compartidas con el maestro en mitad de una petición.
+#
+# Lo que sí necesita un hilo propio arranca en cada worker, después del fork:
+# start_worker() se llama desde el hook post_worker_init de gunicorn.conf.py.
+#
+# StartupReport mide cada fase; el resumen sale en el log de gunicorn y en el
+# export de Prometheus (app_startup_seconds).
+import gc
+import os
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """Duración de cada fase del arranque, en el orden en que se ejecutaron.
+
+    `started` es el instante (time.perf_counter) desde el que se cuenta el
+    total; por defecto, la creación del informe.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []
+        self.ready_ms = None
+        self.pid = os.getpid()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - started) * 1000))
+
+    def finish(self):
+        """Marca el proceso como listo para servir. Devuelve el total en milisegundos."""
+        self.ready_ms = (time.perf_counter() - self.started) * 1000
+        return self.ready_ms
+
+    def summary(self):
+        return {'pid': self.pid, 'ready_ms': self.ready_ms,
+                'phases': [{'name': name, 'ms': ms} for name, ms in self.phases]}
+
+    def format(self):
+        phases = ', '.join(f'{name} {ms:.0f} ms' for name, ms in self.phases)
+        total = f'{self.ready_ms:.0f} ms' if self.ready_ms is not None else 'en curso'
+        return f'Arranque (pid {self.pid}): listo en {total} ({phases})'
+
+
+def precompile_templates(jinja_env):
+    """Compila todas las plantillas y las deja en la caché de Jinja. Devuelve cuántas."""
+    names = jinja_env.list_templates(extensions=('html', 'xml', 'txt'))
+    for name in names:
+        jinja_env.get_template(name)
+    return len(names)
+
+
+def freeze_heap():
+    """Recoge la basura del arranque y congela el resto (gc.freeze) antes del fork."""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def start_worker(app):
+    """Arranca los hilos de fondo de un worker recién creado (tras el fork).
+
+    La cola de contacto recupera de inmediato el spool que dejó un worker caído.
+    """
+    contact_queue = app.extensions.get('contact_queue')
+    if contact_queue is not None:
+        contact_queue.start()
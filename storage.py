@@ -0,0 +1,130 @@
+# storage.py
+# ==============================================================================
+# ALMACENAMIENTO DE ARCHIVOS SUBIDOS DIRECCIONADO POR CONTENIDO
+# ==============================================================================
+# Cada imagen se guarda con el nombre de su hash SHA-256:
+#
+#     uploads/ab/ab12cd...ef.jpg
+#
+# - Dos archivos distintos con el mismo nombre ("image.jpg") ya no se pisan.
+# - Subir dos veces la misma imagen ocupa espacio una sola vez.
+# - Si el contenido cambia, cambia la URL, así que el navegador puede guardar
+#   el archivo en caché para siempre.
+#
+# Este módulo solo conoce el disco. Los contadores de referencias viven en el
+# modelo UploadedFile de app.py.
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+CHUNK_SIZE = 64 * 1024
+
+# Extensiones equivalentes: el mismo contenido debe tener un solo nombre en disco
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+# Original ('ab/ab12...ef.jpg') o derivado ('variants/ab/ab12...ef-thumb-480.webp')
+_CONTENT_ADDRESSED = re.compile(r'^(?:variants/)?([0-9a-f]{2})/(\1[0-9a-f]{62}(?:-[a-z]+-\d+)?)\.[a-z0-9]+$')
+
+
+def normalize_extension(extension):
+    """Extensión canónica en minúsculas ('JPEG' -> 'jpg')."""
+    extension = extension.lower()
+    return EXTENSION_ALIASES.get(extension, extension)
+
+
+def content_filename(digest, extension):
+    """Ruta relativa de un archivo a partir de su hash: 'ab/ab12...ef.jpg'."""
+    return f'{digest[:2]}/{digest}.{normalize_extension(extension)}'
+
+
+def is_content_addressed(filename):
+    """True si `filename` tiene la forma 'ab/<sha256>.<ext>'."""
+    folder, _, name = (filename or '').partition('/')
+    digest = name.split('.', 1)[0]
+    return len(folder) == 2 and len(digest) == 64 and digest.startswith(folder)
+
+
+def content_digest(filename):
+    """Hash de un archivo direccionado por contenido (o None si no lo es).
+
+    Es la clave de UploadedFile: no depende de la extensión con que se subió.
+    """
+    return filename.partition('/')[2].split('.', 1)[0] if is_content_addressed(filename) else None
+
+
+def immutable_etag(filename):
+    """ETag fuerte para archivos direccionados por contenido (o None si no lo son).
+
+    Su contenido nunca cambia para una misma URL, así que pueden cachearse para siempre.
+    """
+    match = _CONTENT_ADDRESSED.match(filename or '')
+    return match.group(2) if match else None
+
+
+def store_upload(file, upload_folder, extension):
+    """Guarda un FileStorage por su hash, leyéndolo por bloques.
+
+    Devuelve (filename, digest, size, created). `created` es False si ya había
+    un archivo idéntico en disco; en ese caso no se escribe nada nuevo.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.upload.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        digest = sha256.hexdigest()
+        filename = content_filename(digest, extension)
+        path = os.path.join(upload_folder, filename)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return filename, digest, size, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return filename, digest, size, True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_file(upload_folder, filename):
+    """Borra un archivo de uploads (si existe) y devuelve los bytes liberados."""
+    path = os.path.join(upload_folder, filename)
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+
+def find_orphans(upload_folder, referenced, grace_seconds=3600):
+    """Genera (filename, size) de los archivos de uploads que nadie referencia.
+
+    Se ignoran los archivos modificados hace menos de `grace_seconds`: pueden
+    pertenecer a una subida o a un derivado que aún no llegó a la base de datos.
+    """
+    cutoff = time.time() - grace_seconds
+    for root, _dirs, files in os.walk(upload_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, upload_folder).replace(os.sep, '/')
+            if filename in referenced:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            yield filename, stat.st_size
@@ -0,0 +1,37 @@
+# tests/conftest.py
+# ==============================================================================
+# Aplicación de prueba con una carpeta de datos desechable
+# ==============================================================================
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ADMIN_USER = 'admin'
+ADMIN_PASS = 'clave-de-prueba'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('ADMIN_USER', ADMIN_USER)
+    monkeypatch.setenv('ADMIN_PASS', ADMIN_PASS)
+    from app import create_app, db, initialize_database
+
+    app = create_app({'TESTING': True, 'WTF_CSRF_ENABLED': False, 'IMAGE_WORKERS': 0,
+                      'PAGE_CACHE_ENABLED': False, 'VIEWS_ENABLED': False})
+    with app.app_context():
+        initialize_database()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': ADMIN_USER, 'password': ADMIN_PASS})
+    assert response.status_code == 302
+    return client
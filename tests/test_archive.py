@@ -0,0 +1,35 @@
+# tests/test_archive.py
+# ==============================================================================
+# Importación masiva de noticias (flask import)
+# ==============================================================================
+import json
+import os
+
+from app import NewsArticle, UploadedFile, db
+
+DIGEST = 'ab' + 'c' * 62
+
+
+def test_import_groups_images_by_digest(app, tmp_path):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(os.path.join(upload_folder, 'ab'), exist_ok=True)
+    for extension in ('jpg', 'jpeg'):
+        with open(os.path.join(upload_folder, f'ab/{DIGEST}.{extension}'), 'wb') as f:
+            f.write(b'mismo contenido')
+    archive = tmp_path / 'news.jsonl'
+    with open(archive, 'w', encoding='utf-8') as f:
+        for number, extension in enumerate(('jpeg', 'jpg', 'jpeg'), start=1):
+            f.write(json.dumps({'id': number, 'title': f'Noticia importada {number}', 'category': 'POLITICA',
+                                'content': '<p>Texto</p>', 'author': 'Redacción',
+                                'date_posted': f'2024-01-0{number}T10:00:00',
+                                'image_filename': f'ab/{DIGEST}.{extension}'}) + '\n')
+
+    result = app.test_cli_runner().invoke(args=['import', 'news', str(archive)])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(NewsArticle)) == 3
+        stored = db.session.scalars(db.select(UploadedFile)).one()
+        assert stored.digest == DIGEST
+        assert stored.filename == f'ab/{DIGEST}.jpg'
+        assert stored.ref_count == 3
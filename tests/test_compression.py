@@ -0,0 +1,74 @@
+# tests/test_compression.py
+# ==============================================================================
+# Compresión gzip/brotli y cabeceras de caché de los archivos estáticos
+# ==============================================================================
+import gzip
+
+import pytest
+from flask import Flask, url_for
+
+from assets import StaticAssets
+from compression import brotli_available, precompress_file
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli es una dependencia opcional
+    brotli = None
+
+needs_brotli = pytest.mark.skipif(not brotli_available(), reason='Brotli no está instalado')
+
+
+@needs_brotli
+def test_dynamic_pages_negotiate_brotli_or_gzip(app):
+    client = app.test_client()
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == plain.get_data()
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip, br;q=0.5'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    static_folder = tmp_path / 'static'
+    static_folder.mkdir()
+    (static_folder / 'style.css').write_text('body { color: #222; }\n' * 200)
+    precompress_file(str(static_folder / 'style.css'))
+    app = Flask('estaticos', static_folder=str(static_folder))
+    app.config['SERVER_NAME'] = 'localhost'
+    StaticAssets(app)
+    return app
+
+
+@needs_brotli
+def test_static_files_with_fingerprint_are_immutable_and_precompressed(static_app):
+    with static_app.app_context():
+        url = url_for('static', filename='style.css')
+    assert '?v=' in url
+    client = static_app.test_client()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.cache_control.immutable and response.cache_control.max_age == 31536000
+    assert brotli.decompress(response.get_data()).startswith(b'body { color: #222; }')
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Type'].startswith('text/css')
+
+
+def test_static_files_without_fingerprint_are_revalidated(static_app):
+    client = static_app.test_client()
+    response = client.get('/static/style.css')
+    assert 'Content-Encoding' not in response.headers
+    assert response.cache_control.no_cache and not response.cache_control.immutable
+    etag = response.headers['ETag']
+
+    response = client.get('/static/style.css', headers={'If-None-Match': etag})
+    assert response.status_code == 304
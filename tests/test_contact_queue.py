@@ -0,0 +1,79 @@
+# tests/test_contact_queue.py
+# ==============================================================================
+# Cola del formulario de contacto: recuperación del spool
+# ==============================================================================
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+from flask import Flask
+
+from app import ContactMessage, db
+from contact_queue import ContactQueue
+from startup import start_worker
+
+# Worker que escribe los dos primeros lotes y muere (os._exit) con el último
+# mensaje: su segmento del spool queda con mensajes escritos y pendientes
+DYING_WORKER = textwrap.dedent('''
+    import os, sys, time
+    from flask import Flask
+    from contact_queue import ContactQueue
+
+    spool_dir, database = sys.argv[1], sys.argv[2]
+
+    def write_batch(messages):
+        if any(message['message'] == 'mensaje 4' for message in messages):
+            os._exit(0)
+        with open(database, 'a', encoding='utf-8') as f:
+            f.writelines(message['message'] + '\\n' for message in messages)
+
+    app = Flask('worker')
+    app.config.update(CONTACT_SPOOL_DIR=spool_dir, CONTACT_BATCH_SIZE=2, CONTACT_FLUSH_MS=200)
+    contact_queue = ContactQueue(app, write_batch)
+    for number in range(5):
+        contact_queue.submit({'name': 'Ana', 'email': 'ana@example.com', 'subject': 'Hola',
+                              'message': f'mensaje {number}'})
+    time.sleep(5)
+''')
+
+
+def test_worker_start_recovers_spool_without_new_messages(app):
+    spool_dir = app.config['CONTACT_SPOOL_DIR']
+    # Segmento que dejó un worker que murió sin vaciar su cola
+    with open(os.path.join(spool_dir, 'contact-999999-1-1.jsonl'), 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'name': 'Ana', 'email': 'ana@example.com', 'subject': 'Hola',
+                            'message': 'Mensaje pendiente', 'timestamp': '2024-01-01T10:00:00'}) + '\n')
+
+    start_worker(app)
+
+    # El segmento se borra justo después del COMMIT
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and os.listdir(spool_dir):
+        time.sleep(0.05)
+    assert os.listdir(spool_dir) == []
+    with app.app_context():
+        assert [m.message for m in db.session.scalars(db.select(ContactMessage))] == ['Mensaje pendiente']
+
+
+def test_recovery_skips_messages_committed_before_the_worker_died(tmp_path):
+    spool_dir, database = tmp_path / 'spool', tmp_path / 'database.txt'
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    subprocess.run([sys.executable, '-c', DYING_WORKER, str(spool_dir), str(database)], cwd=root,
+                   env=dict(os.environ, PYTHONPATH=root), check=True, timeout=30)
+    assert 0 < len(database.read_text().splitlines()) < 5
+
+    def write_batch(messages):
+        with open(database, 'a', encoding='utf-8') as f:
+            f.writelines(message['message'] + '\n' for message in messages)
+
+    app = Flask('recuperacion')
+    app.config.update(CONTACT_SPOOL_DIR=str(spool_dir), CONTACT_FLUSH_MS=10)
+    ContactQueue(app, write_batch).start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and os.listdir(spool_dir):
+        time.sleep(0.05)
+    assert os.listdir(spool_dir) == []
+    assert sorted(database.read_text().splitlines()) == [f'mensaje {number}' for number in range(5)]
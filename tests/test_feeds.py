@@ -0,0 +1,11 @@
+# tests/test_feeds.py
+# ==============================================================================
+# Feeds Atom y sitemaps
+# ==============================================================================
+from feeds import MAX_SITEMAP_CHUNK
+
+
+def test_sitemap_chunk_out_of_range_is_404(app):
+    client = app.test_client()
+    for chunk in (1, MAX_SITEMAP_CHUNK, MAX_SITEMAP_CHUNK + 1, 10 ** 30):
+        assert client.get(f'/sitemap-news-{chunk}.xml').status_code == 404
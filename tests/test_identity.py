@@ -0,0 +1,54 @@
+# tests/test_identity.py
+# ==============================================================================
+# Caché de identidad: retirar permisos de administrador vale en la petición siguiente
+# ==============================================================================
+from flask import Flask
+from flask_login import LoginManager
+
+from app import User, db
+from identity import IdentityCache
+
+EDITOR_USER = 'editora'
+EDITOR_PASS = 'clave-de-editora'
+
+
+def editor_client(app):
+    """Cliente con la sesión de un segundo administrador, ya en la caché de identidad."""
+    with app.app_context():
+        editor = User(username=EDITOR_USER, is_admin=True)
+        editor.set_password(EDITOR_PASS)
+        db.session.add(editor)
+        db.session.commit()
+        editor_id = editor.id
+    client = app.test_client()
+    assert client.post('/login', data={'username': EDITOR_USER, 'password': EDITOR_PASS}).status_code == 302
+    assert client.get('/admin/news').status_code == 200
+    return client, editor_id
+
+
+def test_removing_admin_in_edit_user_logs_out_on_next_request(app, admin_client):
+    client, editor_id = editor_client(app)
+
+    response = admin_client.post(f'/admin/users/edit/{editor_id}', data={'username': EDITOR_USER})
+    assert response.status_code == 302
+
+    response = client.get('/admin/news')
+    assert response.status_code == 302
+    assert response.location.endswith('/login')
+
+
+def test_version_file_bumped_by_another_worker_invalidates_snapshot(app):
+    client, editor_id = editor_client(app)
+    with app.app_context():
+        db.session.get(User, editor_id).is_admin = False
+        db.session.commit()
+    # Sin avisar, este worker sigue con la instantánea hasta el TTL
+    assert client.get('/admin/news').status_code == 200
+
+    worker_app = Flask('otro-worker')
+    worker_app.config.update(app.config)
+    IdentityCache(worker_app, LoginManager(worker_app)).invalidate(editor_id)
+
+    response = client.get('/admin/news')
+    assert response.status_code == 302
+    assert response.location.endswith('/login')
@@ -0,0 +1,46 @@
+# tests/test_metrics.py
+# ==============================================================================
+# Métricas: acceso al export de Prometheus y registro de peticiones lentas
+# ==============================================================================
+from app import create_app, db, request_metrics, warm_up
+
+
+def test_prometheus_export_requires_exact_token(app):
+    app.config['METRICS_TOKEN'] = 'secreto'
+    client = app.test_client()
+    assert client.get('/admin/metrics/prometheus').status_code == 403
+    assert client.get('/admin/metrics/prometheus', headers={'Authorization': 'Bearer secret'}).status_code == 403
+    response = client.get('/admin/metrics/prometheus', headers={'Authorization': 'Bearer secreto'})
+    assert response.status_code == 200
+
+
+def test_slow_request_log_keeps_statements_without_parameter_values(app, monkeypatch):
+    monkeypatch.setattr(request_metrics, 'slow_ms', 0)
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'admin', 'password': 'clave-de-prueba'}).status_code == 302
+
+    login = next(entry for entry in request_metrics.snapshot()['slow_requests'] if entry['path'] == '/login')
+    assert any('FROM user' in statement for statement, _params, _ms in login['queries'])
+    assert not any('admin' in params for _statement, params, _ms in login['queries'])
+
+
+def test_gauges_are_registered_once_and_startup_time_appears_after_warm_up(app):
+    app.config['METRICS_TOKEN'] = 'secreto'
+    client = app.test_client()
+
+    def export():
+        response = client.get('/admin/metrics/prometheus', headers={'Authorization': 'Bearer secreto'})
+        return response.get_data(as_text=True)
+
+    assert 'app_startup_seconds' not in export()
+    warm_up(app)
+    warm_up(app)
+    # Otra aplicación en el mismo proceso (como en las pruebas o en el maestro de gunicorn)
+    other = create_app({'TESTING': True, 'IMAGE_WORKERS': 0, 'PAGE_CACHE_ENABLED': False, 'VIEWS_ENABLED': False})
+    warm_up(other)
+    with other.app_context():
+        db.engine.dispose()
+    body = export()
+    assert body.count('# TYPE app_startup_seconds gauge') == 1
+    assert body.count('# TYPE app_page_cache_hit_ratio gauge') == 1
+    assert float(body.split('\napp_startup_seconds ')[1].split()[0]) > 0
@@ -0,0 +1,76 @@
+# tests/test_page_cache.py
+# ==============================================================================
+# Caché de páginas: aciertos e invalidación al editar, borrar o mover noticias
+# ==============================================================================
+from flask import Flask
+
+from app import NewsArticle, db, page_cache
+from cache import PageCache
+
+
+def add_news(app, client, title, category='POLITICA'):
+    response = client.post('/admin/news/add', data={
+        'title': title, 'category': category, 'content': f'<p>Texto de {title}</p>'})
+    assert response.status_code == 302
+    # Sin un contexto abierto entre peticiones: `g` (y el usuario de Flask-Login) es por petición
+    with app.app_context():
+        return db.session.scalars(db.select(NewsArticle).filter_by(title=title)).one().id
+
+
+def edit_news(client, news_id, title, category='POLITICA'):
+    response = client.post(f'/admin/news/edit/{news_id}', data={
+        'title': title, 'category': category, 'content': f'<p>Texto de {title}</p>'})
+    assert response.status_code == 302
+
+
+def other_worker(app):
+    """Otra PageCache con la misma configuración, como la de un segundo worker de gunicorn."""
+    worker_app = Flask('otro-worker')
+    worker_app.config.update(app.config, PAGE_CACHE_ENABLED=True)
+    return PageCache(worker_app)
+
+
+def test_hit_and_invalidation_on_edit_delete_and_category_move(app, admin_client, monkeypatch):
+    monkeypatch.setattr(page_cache, 'enabled', True)
+    visitor = app.test_client()
+    news_id = add_news(app, admin_client, 'Titular original')
+
+    assert visitor.get(f'/news/{news_id}').headers['X-Cache'] == 'MISS'
+    response = visitor.get(f'/news/{news_id}')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert 'Titular original' in response.get_data(as_text=True)
+    assert 'Titular original' in visitor.get('/category/politica').get_data(as_text=True)
+    assert visitor.get('/category/politica').headers['X-Cache'] == 'HIT'
+
+    edit_news(admin_client, news_id, 'Titular corregido', category='OPINION')
+    response = visitor.get(f'/news/{news_id}')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert 'Titular corregido' in response.get_data(as_text=True)
+    assert 'Titular' not in visitor.get('/category/politica').get_data(as_text=True)
+    assert 'Titular corregido' in visitor.get('/category/opinion').get_data(as_text=True)
+
+    assert 'Titular corregido' in visitor.get('/').get_data(as_text=True)
+    assert admin_client.post(f'/admin/news/delete/{news_id}').status_code == 302
+    assert 'Titular corregido' not in visitor.get('/').get_data(as_text=True)
+    assert visitor.get(f'/news/{news_id}').status_code == 404
+
+
+def test_edit_invalidates_pages_cached_by_another_worker(app, admin_client):
+    worker = other_worker(app)
+    news_id = add_news(app, admin_client, 'Titular original')
+    namespace = f'news:{news_id}'
+    worker.set(namespace, '', b'<h1>Titular original</h1>')
+    assert worker.get(namespace, '').body == b'<h1>Titular original</h1>'
+
+    edit_news(admin_client, news_id, 'Titular corregido')
+    assert worker.get(namespace, '') is None
+
+
+def test_page_rendered_during_invalidation_is_not_served(app):
+    first, second = other_worker(app), other_worker(app)
+    version = first.version('index')
+    second.invalidate('index')
+    first.set('index', '', b'portada vieja', version=version)
+    assert first.get('index', '') is None
+    first.set('index', '', b'portada nueva')
+    assert first.get('index', '').body == b'portada nueva'
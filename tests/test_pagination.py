@@ -0,0 +1,85 @@
+# tests/test_pagination.py
+# ==============================================================================
+# Paginación por cursor
+# ==============================================================================
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import NewsArticle, db
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    date_value = datetime(2024, 5, 1, 12, 30)
+    assert decode_cursor(encode_cursor(date_value, 42)) == (date_value, 42)
+
+
+@pytest.mark.parametrize('token', ['###', encode_cursor(datetime(2024, 1, 1), 10 ** 30)])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_category_page_with_overflowing_cursor_is_400(app):
+    token = encode_cursor(datetime(2024, 1, 1), 10 ** 30)
+    assert app.test_client().get(f'/category/politica?after={token}').status_code == 400
+
+
+def add_articles(app, count, category='POLITICA'):
+    """`count` noticias, de la más antigua a la más nueva (dos comparten fecha: desempata el id)."""
+    with app.app_context():
+        start = datetime(2024, 1, 1)
+        for number in range(count):
+            article = NewsArticle(title=f'Noticia {number:02d}', category=category, content='<p>x</p>',
+                                  date_posted=start + timedelta(days=min(number, count - 2)))
+            article.refresh_excerpt()
+            db.session.add(article)
+        db.session.commit()
+
+
+def link(response, rel):
+    match = re.search(rf'<([^>]+)>; rel="{rel}"', response.headers.get('Link', ''))
+    return match.group(1) if match else None
+
+
+def titles(response):
+    """Títulos en el orden en que aparecen (sin repetir)."""
+    return list(dict.fromkeys(re.findall(r'Noticia \d\d', response.get_data(as_text=True))))
+
+
+def walk(client, url):
+    """Recorre las páginas hacia delante con rel="next" y vuelve con rel="prev"."""
+    forward, backward, pages = [], [], []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response)
+        forward += titles(response)
+        url = link(response, 'next')
+    url = link(pages[-1], 'prev')
+    while url:
+        response = client.get(url)
+        backward = titles(response) + backward
+        url = link(response, 'prev')
+    return forward, backward, len(pages)
+
+
+def test_category_pages_follow_after_and_before_cursors(app):
+    app.config['NEWS_PAGE_SIZE'] = 2
+    add_articles(app, 5)
+    forward, backward, pages = walk(app.test_client(), '/category/politica')
+    expected = [f'Noticia {number:02d}' for number in range(4, -1, -1)]
+    assert pages == 3
+    assert forward == expected
+    assert backward == expected[:4]
+
+
+def test_admin_news_follows_after_and_before_cursors(app, admin_client):
+    app.config['ADMIN_PAGE_SIZE'] = 2
+    add_articles(app, 5)
+    forward, backward, pages = walk(admin_client, '/admin/news')
+    assert pages == 3
+    assert forward == [f'Noticia {number:02d}' for number in range(4, -1, -1)]
+    assert backward == forward[:4]
@@ -0,0 +1,45 @@
+# tests/test_popularity.py
+# ==============================================================================
+# Lo más leído: visitas por lotes y ranking con decaimiento
+# ==============================================================================
+from app import ArticleViewCount, NewsArticle, db, save_view_counts, view_counter
+from popularity import current_hour
+
+
+def add_article(title):
+    article = NewsArticle(title=title, category='POLITICA', content=f'<p>Texto de {title}</p>')
+    article.refresh_excerpt()
+    db.session.add(article)
+    db.session.commit()
+    return article.id
+
+
+def test_views_are_flushed_in_batches_and_ranked_with_decay(app, monkeypatch):
+    monkeypatch.setattr(view_counter, 'enabled', True)
+    # El hilo de fondo no llega a escribir durante la prueba: se vacía a mano
+    monkeypatch.setattr(view_counter, 'flush_seconds', 3600)
+    with app.app_context():
+        old_id, recent_id = add_article('Noticia de anteayer'), add_article('Noticia de hoy')
+    # Ranking recién calculado: el hilo no lo recalcula al arrancar
+    view_counter.refresh_ranking(notify=False)
+
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get(f'/news/{recent_id}').status_code == 200
+    assert client.get(f'/news/{recent_id}', headers={'User-Agent': 'Googlebot/2.1'}).status_code == 200
+    assert view_counter.stats()['pending'] == 3
+    with app.app_context():
+        assert db.session.get(ArticleViewCount, recent_id) is None
+
+    view_counter.flush()
+    assert view_counter.stats()['pending'] == 0
+    with app.app_context():
+        assert db.session.get(ArticleViewCount, recent_id).views == 3
+        # 10 visitas de hace 48 h con vida media de 24 h pesan 2,5: menos que 3 de ahora
+        save_view_counts([{'news_id': old_id, 'hour': current_hour() - 48, 'views': 10}],
+                         prune_before=current_hour() - view_counter.window_hours)
+
+    view_counter.refresh_ranking(notify=False)
+    assert [entry['id'] for entry in view_counter.top()] == [recent_id, old_id]
+    assert [entry['id'] for entry in view_counter.top('POLITICA')] == [recent_id, old_id]
+    assert view_counter.top()[1]['score'] == 2.5
@@ -0,0 +1,121 @@
+# tests/test_uploads.py
+# ==============================================================================
+# Uploads direccionados por contenido: deduplicación y referencias
+# ==============================================================================
+import io
+import os
+
+from app import NewsArticle, UploadedFile, db, derivative_files, image_processor
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - sin Pillow no hay derivados, pero el resto se prueba igual
+    Image = None
+
+
+def jpeg_bytes():
+    if Image is None:
+        return b'\xff\xd8\xff\xe0' + os.urandom(256)
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), (200, 30, 30)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def add_news(client, title, data, upload_name):
+    response = client.post('/admin/news/add', content_type='multipart/form-data', data={
+        'title': title, 'category': 'POLITICA', 'content': '<p>Contenido de prueba</p>',
+        'image_file': (io.BytesIO(data), upload_name),
+    })
+    assert response.status_code == 302
+    return db.session.scalars(db.select(NewsArticle).filter_by(title=title)).one()
+
+
+def test_same_image_with_jpg_and_jpeg_is_stored_once(app, admin_client):
+    data = jpeg_bytes()
+    upload_folder = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        first = add_news(admin_client, 'Primera noticia', data, 'a.jpg')
+        second = add_news(admin_client, 'Segunda noticia', data, 'a.jpeg')
+        third = add_news(admin_client, 'Tercera noticia', data, 'a.jpeg')
+        assert first.image_filename == second.image_filename == third.image_filename
+        assert first.image_filename.endswith('.jpg')
+
+        stored = db.session.scalars(db.select(UploadedFile)).one()
+        assert stored.filename == first.image_filename
+        assert stored.ref_count == 3
+        originals = [name for _root, _dirs, files in os.walk(upload_folder) for name in files
+                     if not name.endswith('.tmp') and '-' not in name]
+        assert len(originals) == 1
+
+        response = admin_client.post(f'/admin/news/delete/{second.id}')
+        assert response.status_code == 302
+        db.session.expire_all()
+        stored = db.session.scalars(db.select(UploadedFile)).one()
+        assert stored.ref_count == 2
+        first = db.session.get(NewsArticle, first.id)
+        assert first.image_variants or Image is None
+        for filename in [first.image_filename] + derivative_files(first.image_variants):
+            assert os.path.exists(os.path.join(upload_folder, filename)), filename
+
+
+def test_release_by_digest_removes_legacy_extension_with_last_reference(app, admin_client):
+    data = jpeg_bytes()
+    upload_folder = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        news = add_news(admin_client, 'Noticia con imagen', data, 'foto.jpg')
+        # Noticia guardada antes de normalizar la extensión: mismo hash, otro nombre
+        legacy_name = news.image_filename[:-len('.jpg')] + '.jpeg'
+        with open(os.path.join(upload_folder, news.image_filename), 'rb') as src, \
+                open(os.path.join(upload_folder, legacy_name), 'wb') as dst:
+            dst.write(src.read())
+        legacy = NewsArticle(title='Noticia antigua', category='POLITICA', content='<p>x</p>',
+                             image_filename=legacy_name)
+        legacy.refresh_excerpt()
+        db.session.add(legacy)
+        stored = db.session.scalars(db.select(UploadedFile)).one()
+        stored.ref_count += 1
+        db.session.commit()
+
+        assert admin_client.post(f'/admin/news/delete/{news.id}').status_code == 302
+        assert os.path.exists(os.path.join(upload_folder, legacy_name))
+        assert admin_client.post(f'/admin/news/delete/{legacy.id}').status_code == 302
+        assert not os.path.exists(os.path.join(upload_folder, legacy_name))
+        assert not os.path.exists(os.path.join(upload_folder, stored.filename))
+        assert db.session.scalars(db.select(UploadedFile)).first() is None
+
+
+def test_release_without_ledger_row_keeps_image_shared_by_hash(app, admin_client):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        first = add_news(admin_client, 'Primera noticia', jpeg_bytes(), 'a.jpg')
+        second = NewsArticle(title='Segunda noticia', category='POLITICA', content='<p>x</p>',
+                             image_filename=first.image_filename, image_variants=first.image_variants)
+        second.refresh_excerpt()
+        db.session.add(second)
+        # Sin fila en UploadedFile: imagen copiada a mano o de antes de los contadores
+        db.session.delete(db.session.scalars(db.select(UploadedFile)).one())
+        db.session.commit()
+        files = [first.image_filename] + derivative_files(first.image_variants)
+
+        assert admin_client.post(f'/admin/news/delete/{first.id}').status_code == 302
+        for filename in files:
+            assert os.path.exists(os.path.join(upload_folder, filename)), filename
+        assert admin_client.post(f'/admin/news/delete/{second.id}').status_code == 302
+        for filename in files:
+            assert not os.path.exists(os.path.join(upload_folder, filename)), filename
+
+
+def test_failed_image_scheduling_keeps_saved_article(app, admin_client, monkeypatch):
+    def broken_submit(*args, **kwargs):
+        raise RuntimeError('pool cerrado')
+
+    monkeypatch.setattr(image_processor, 'submit', broken_submit)
+    response = admin_client.post('/admin/news/add', content_type='multipart/form-data', follow_redirects=True, data={
+        'title': 'Noticia sin derivados', 'category': 'POLITICA', 'content': '<p>Contenido de prueba</p>',
+        'image_file': (io.BytesIO(jpeg_bytes()), 'foto.jpg'),
+    })
+    assert '¡Noticia creada con éxito!' in response.get_data(as_text=True)
+    assert 'Error al guardar' not in response.get_data(as_text=True)
+    with app.app_context():
+        news = db.session.scalars(db.select(NewsArticle).filter_by(title='Noticia sin derivados')).one()
+        assert news.image_filename and news.image_variants is None
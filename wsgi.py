@@ -0,0 +1,24 @@
+# wsgi.py
+# ==============================================================================
+# PUNTO DE ENTRADA PARA GUNICORN
+# ==============================================================================
+#     flask --app app init-db                  # una vez por despliegue
+#     gunicorn --preload --workers 2 wsgi:app
+#
+# Con --preload el proceso maestro importa este módulo, crea la aplicación y
+# la precalienta (warm_up) antes de crear los workers con fork. Sin --preload
+# cada worker hace lo mismo antes de aceptar conexiones. En ambos casos ninguna
+# petición paga el arranque, y el log muestra cuánto tardó cada fase. Los hilos
+# de cada worker arrancan después, en gunicorn.conf.py.
+import time
+
+started = time.perf_counter()
+
+from startup import StartupReport  # noqa: E402
+
+report = StartupReport(started)
+with report.phase('importación'):
+    from app import create_app, warm_up  # noqa: E402
+with report.phase('create_app'):
+    app = create_app()
+warm_up(app, report)